@@ -1,15 +1,18 @@
 from __future__ import annotations
 
 import json
+from typing import Tuple
 
 from app.agents.llm import get_llm_client
+from app.agents.llm_cache import with_cache_note
 from app.agents.types import AgentResult
 
 
 class CharacterAgent:
     name = "CharacterAgent"
+    cache_name = "characters"  # LLM_CACHE_AGENTS entry
 
-    def run(
+    def _messages(
         self,
         *,
         genre: str,
@@ -19,8 +22,7 @@ class CharacterAgent:
         audience: str,
         outline: str,
         constraints: str,
-    ) -> AgentResult:
-        llm = get_llm_client()
+    ) -> Tuple[str, str]:
         system = (
             "你是小说角色设定师与一致性审稿。请输出两部分："
             "1) 角色设定 JSON（严格 JSON）；2) 可读文本总结。"
@@ -43,8 +45,9 @@ class CharacterAgent:
 }}
 随后再输出一段可读总结。
 """
-        raw = llm.complete(system=system, prompt=prompt)
+        return system, prompt
 
+    def _result(self, raw: str) -> AgentResult:
         # Best-effort extract JSON block for storage; fallback to wrapper.
         characters_obj = {"raw": raw}
         try:
@@ -65,3 +68,52 @@ class CharacterAgent:
         ]
         return AgentResult(data={"characters": characters_obj, "characters_text": raw}, logs=logs)
 
+    def run(
+        self,
+        *,
+        genre: str,
+        setting: str,
+        style: str,
+        keywords: str,
+        audience: str,
+        outline: str,
+        constraints: str,
+    ) -> AgentResult:
+        system, prompt = self._messages(
+            genre=genre,
+            setting=setting,
+            style=style,
+            keywords=keywords,
+            audience=audience,
+            outline=outline,
+            constraints=constraints,
+        )
+        llm = get_llm_client(self.cache_name)
+        result = self._result(llm.complete(system=system, prompt=prompt))
+        with_cache_note(result.logs, llm)
+        return result
+
+    async def arun(
+        self,
+        *,
+        genre: str,
+        setting: str,
+        style: str,
+        keywords: str,
+        audience: str,
+        outline: str,
+        constraints: str,
+    ) -> AgentResult:
+        system, prompt = self._messages(
+            genre=genre,
+            setting=setting,
+            style=style,
+            keywords=keywords,
+            audience=audience,
+            outline=outline,
+            constraints=constraints,
+        )
+        llm = get_llm_client(self.cache_name)
+        result = self._result(await llm.acomplete(system=system, prompt=prompt))
+        with_cache_note(result.logs, llm)
+        return result
@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import json
 import re
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from app.agents.llm import get_llm_client
+from app.agents.llm_cache import cache_note
 from app.core.config import settings
 from app.db.models import Project
 from rag.types import Chunk
@@ -24,6 +25,10 @@ def _extract_names_from_project(project: Project) -> List[str]:
 
 class ConsistencyCriticAgent:
     name = "ConsistencyCriticAgent"
+    cache_name = "critic"  # LLM_CACHE_AGENTS entry
+
+    def _use_llm(self) -> bool:
+        return settings.critic_provider == "llm" and not settings.mock_llm
 
     def review(
         self,
@@ -34,10 +39,28 @@ class ConsistencyCriticAgent:
         constraints: List[Chunk],
         context_used: str,
     ) -> Dict[str, Any]:
-        if settings.critic_provider != "llm" or settings.mock_llm:
+        if not self._use_llm():
+            return self._mock_review(project=project, chapter_no=chapter_no, draft_text=draft_text, context_used=context_used)
+        system, prompt = self._messages(chapter_no=chapter_no, draft_text=draft_text, constraints=constraints)
+        llm = get_llm_client(self.cache_name)
+        return {**self._parse(llm.complete(system=system, prompt=prompt)), "llm_cache": cache_note(llm)}
+
+    async def areview(
+        self,
+        *,
+        project: Project,
+        chapter_no: int,
+        draft_text: str,
+        constraints: List[Chunk],
+        context_used: str,
+    ) -> Dict[str, Any]:
+        if not self._use_llm():
             return self._mock_review(project=project, chapter_no=chapter_no, draft_text=draft_text, context_used=context_used)
+        system, prompt = self._messages(chapter_no=chapter_no, draft_text=draft_text, constraints=constraints)
+        llm = get_llm_client(self.cache_name)
+        return {**self._parse(await llm.acomplete(system=system, prompt=prompt)), "llm_cache": cache_note(llm)}
 
-        llm = get_llm_client()
+    def _messages(self, *, chapter_no: int, draft_text: str, constraints: List[Chunk]) -> Tuple[str, str]:
         system = (
             "你是一致性审稿（Consistency Critic）。"
             "你只输出严格 JSON，不要输出额外解释。"
@@ -63,7 +86,9 @@ class ConsistencyCriticAgent:
   {', "revised_text":"..."' if settings.auto_revise else ''}
 }}
 """
-        raw = llm.complete(system=system, prompt=prompt)
+        return system, prompt
+
+    def _parse(self, raw: str) -> Dict[str, Any]:
         try:
             start = raw.find("{")
             end = raw.rfind("}")
@@ -1,18 +1,25 @@
 from __future__ import annotations
 
-import json
-from typing import Any, Dict, List, Tuple
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Tuple
 
 from sqlalchemy.orm import Session
 
 from app.agents.character_agent import CharacterAgent
 from app.agents.outline_agent import OutlineAgent
+from app.agents.types import AgentResult
 from app.agents.writer_agent import WriterAgent
 from app.db import crud
 from app.db.models import Project
+from app.db.unit_of_work import UnitOfWork
 
 
 class Coordinator:
+    """
+    Dispatches to the agents and persists their output. Every step has a sync form and an async
+    form (`a` prefix) that awaits the LLM and runs the blocking DB write in a worker thread.
+    """
+
     name = "Coordinator"
 
     def __init__(self) -> None:
@@ -20,43 +27,61 @@ class Coordinator:
         self.character_agent = CharacterAgent()
         self.writer_agent = WriterAgent()
 
-    def generate_outline(self, db: Session, project: Project, *, theme: str, total_words: int) -> Tuple[Project, List[Dict[str, Any]]]:
+    # ---- outline -------------------------------------------------------
+
+    def _outline_kwargs(self, project: Project, *, theme: str, total_words: int) -> Dict[str, Any]:
+        return {
+            "genre": project.genre,
+            "setting": project.setting,
+            "style": project.style,
+            "keywords": project.keywords,
+            "audience": project.audience,
+            "target_chapters": project.target_chapters,
+            "theme": theme,
+            "total_words": total_words,
+        }
+
+    def _save_outline(self, db: Session, project: Project, result: AgentResult) -> Tuple[Project, List[Dict[str, Any]]]:
         coordinator_log = {
             "agent": self.name,
             "action": "dispatch",
             "summary": "调度生成大纲：OutlineAgent",
             "output_preview": None,
         }
-        result = self.outline_agent.run(
-            genre=project.genre,
-            setting=project.setting,
-            style=project.style,
-            keywords=project.keywords,
-            audience=project.audience,
-            target_chapters=project.target_chapters,
-            theme=theme,
-            total_words=total_words,
-        )
         logs = [coordinator_log, *result.logs]
         project = crud.update_project_artifacts(db, project, outline=result.data["outline"], append_logs=logs)
         return project, logs
 
-    def generate_characters(self, db: Session, project: Project, *, constraints: str) -> Tuple[Project, List[Dict[str, Any]]]:
+    def generate_outline(self, db: Session, project: Project, *, theme: str, total_words: int) -> Tuple[Project, List[Dict[str, Any]]]:
+        result = self.outline_agent.run(**self._outline_kwargs(project, theme=theme, total_words=total_words))
+        return self._save_outline(db, project, result)
+
+    async def agenerate_outline(
+        self, db: Session, project: Project, *, theme: str, total_words: int
+    ) -> Tuple[Project, List[Dict[str, Any]]]:
+        result = await self.outline_agent.arun(**self._outline_kwargs(project, theme=theme, total_words=total_words))
+        return await asyncio.to_thread(self._save_outline, db, project, result)
+
+    # ---- characters ----------------------------------------------------
+
+    def _characters_kwargs(self, project: Project, *, constraints: str) -> Dict[str, Any]:
+        return {
+            "genre": project.genre,
+            "setting": project.setting,
+            "style": project.style,
+            "keywords": project.keywords,
+            "audience": project.audience,
+            "outline": project.outline,
+            "constraints": constraints,
+        }
+
+    def _save_characters(self, db: Session, project: Project, result: AgentResult) -> Tuple[Project, List[Dict[str, Any]]]:
         coordinator_log = {
             "agent": self.name,
             "action": "dispatch",
             "summary": "调度生成角色：CharacterAgent",
             "output_preview": None,
         }
-        result = self.character_agent.run(
-            genre=project.genre,
-            setting=project.setting,
-            style=project.style,
-            keywords=project.keywords,
-            audience=project.audience,
-            outline=project.outline,
-            constraints=constraints,
-        )
         logs = [coordinator_log, *result.logs]
         project = crud.update_project_artifacts(
             db,
@@ -67,6 +92,37 @@ class Coordinator:
         )
         return project, logs
 
+    def generate_characters(self, db: Session, project: Project, *, constraints: str) -> Tuple[Project, List[Dict[str, Any]]]:
+        result = self.character_agent.run(**self._characters_kwargs(project, constraints=constraints))
+        return self._save_characters(db, project, result)
+
+    async def agenerate_characters(
+        self, db: Session, project: Project, *, constraints: str
+    ) -> Tuple[Project, List[Dict[str, Any]]]:
+        result = await self.character_agent.arun(**self._characters_kwargs(project, constraints=constraints))
+        return await asyncio.to_thread(self._save_characters, db, project, result)
+
+    # ---- chapters ------------------------------------------------------
+
+    def _save_chapter(
+        self, db: Session, project: Project, chapter_number: int, result: AgentResult, uow: UnitOfWork | None
+    ) -> Tuple[Project, Dict[str, Any], List[Dict[str, Any]]]:
+        coordinator_log = {
+            "agent": self.name,
+            "action": "dispatch",
+            "summary": f"调度扩写章节：WriterAgent（第 {chapter_number} 章）",
+            "output_preview": None,
+        }
+        logs = [coordinator_log, *result.logs]
+        if uow is not None:
+            # Written with the rest of the request when the caller flushes.
+            uow.chapter(project.id, chapter_number, result.data["text"])
+            uow.append_logs(project.id, logs)
+            return project, result.data, logs
+        crud.upsert_chapter(db, project_id=project.id, chapter_no=chapter_number, text=result.data["text"])
+        project = crud.update_project_artifacts(db, project, append_logs=logs)
+        return project, result.data, logs
+
     def expand_chapter(
         self,
         db: Session,
@@ -75,21 +131,51 @@ class Coordinator:
         chapter_number: int,
         instruction: str,
         target_words: int,
+        uow: UnitOfWork | None = None,
     ) -> Tuple[Project, Dict[str, Any], List[Dict[str, Any]]]:
-        coordinator_log = {
-            "agent": self.name,
-            "action": "dispatch",
-            "summary": f"调度扩写章节：WriterAgent（第 {chapter_number} 章）",
-            "output_preview": None,
-        }
         result = self.writer_agent.run(
             chapter_number=chapter_number,
             context=instruction,
             target_words=target_words,
             style=project.style,
         )
-        chapters = json.loads(project.chapters_json or "{}")
-        chapters[str(chapter_number)] = result.data["text"]
-        logs = [coordinator_log, *result.logs]
-        project = crud.update_project_artifacts(db, project, chapters=chapters, append_logs=logs)
-        return project, result.data, logs
+        return self._save_chapter(db, project, chapter_number, result, uow)
+
+    async def aexpand_chapter(
+        self,
+        db: Session,
+        project: Project,
+        *,
+        chapter_number: int,
+        instruction: str,
+        target_words: int,
+        uow: UnitOfWork | None = None,
+    ) -> Tuple[Project, Dict[str, Any], List[Dict[str, Any]]]:
+        result = await self.writer_agent.arun(
+            chapter_number=chapter_number,
+            context=instruction,
+            target_words=target_words,
+            style=project.style,
+        )
+        return await asyncio.to_thread(self._save_chapter, db, project, chapter_number, result, uow)
+
+    def astream_chapter(
+        self,
+        project: Project,
+        *,
+        chapter_number: int,
+        instruction: str,
+        target_words: int,
+    ) -> AsyncIterator[str]:
+        return self.writer_agent.astream(
+            chapter_number=chapter_number,
+            context=instruction,
+            target_words=target_words,
+            style=project.style,
+        )
+
+    async def asave_streamed_chapter(
+        self, db: Session, project: Project, *, chapter_number: int, text: str, uow: UnitOfWork | None = None
+    ) -> Tuple[Project, Dict[str, Any], List[Dict[str, Any]]]:
+        result = self.writer_agent.result_from_text(chapter_number, text)
+        return await asyncio.to_thread(self._save_chapter, db, project, chapter_number, result, uow)
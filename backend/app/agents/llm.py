@@ -1,17 +1,124 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict
+import hashlib
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Tuple, TypeVar
 
+from app.agents.llm_resilience import CallPolicy, CallStats, backoff_s, call_with_policy, is_retryable, policy_for
 from app.core.config import settings
 
+T = TypeVar("T")
+
+
+class _BackgroundLoop:
+    """One event loop on a daemon thread; sync callers submit coroutines and block on the result."""
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop()).result()
+
+    async def submit(self, coro: Awaitable[T]) -> T:
+        """Await `coro` from any other event loop while it executes on this one."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop()))
+
+    async def stream(self, agen: AsyncIterator[T]) -> AsyncIterator[T]:
+        """Iterate `agen` on this loop and relay its items to the caller's event loop."""
+        caller = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump() -> None:
+            try:
+                async for item in agen:
+                    caller.call_soon_threadsafe(queue.put_nowait, (False, item))
+            except Exception as e:
+                caller.call_soon_threadsafe(queue.put_nowait, (True, e))
+            else:
+                caller.call_soon_threadsafe(queue.put_nowait, (True, None))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop())
+        try:
+            while True:
+                done, item = await queue.get()
+                if done:
+                    if item is not None:
+                        raise item
+                    return
+                yield item
+        finally:
+            future.cancel()  # consumer went away (e.g. client disconnected)
+
+
+_background_loop = _BackgroundLoop()
+
+# Long-lived OpenAI-compatible clients (each owns an HTTP connection pool), one per configuration.
+_model_clients: Dict[Tuple[Any, ...], Any] = {}
+_model_clients_lock = threading.Lock()
+
+
+def _http_client():
+    """Shared httpx pool limits for the OpenAI client; None when httpx is unavailable."""
+    try:
+        import httpx  # type: ignore
+    except Exception:  # pragma: no cover
+        return None
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=int(getattr(settings, "llm_max_connections", 20)),
+            max_keepalive_connections=int(getattr(settings, "llm_max_keepalive_connections", 10)),
+            keepalive_expiry=float(getattr(settings, "llm_keepalive_expiry_s", 60.0)),
+        ),
+        timeout=httpx.Timeout(float(getattr(settings, "llm_timeout_s", 120.0))),
+    )
+
 
 class LLMClient:
+    # Set by the completion cache wrapper ("hit" / "miss" / "bypass"); None when uncached.
+    cache_status: str | None = None
+
     def complete(self, *, system: str, prompt: str) -> str:
         raise NotImplementedError
 
+    async def acomplete(self, *, system: str, prompt: str) -> str:
+        # Default for blocking clients: keep the caller's event loop free.
+        return await asyncio.to_thread(self.complete, system=system, prompt=prompt)
+
+    async def astream(self, *, system: str, prompt: str) -> AsyncIterator[str]:
+        """Yield the completion in pieces as they arrive; default is one piece at the end."""
+        yield await self.acomplete(system=system, prompt=prompt)
+
 
 class MockLLMClient(LLMClient):
+    async def acomplete(self, *, system: str, prompt: str) -> str:
+        return self.complete(system=system, prompt=prompt)
+
+    async def astream(self, *, system: str, prompt: str) -> AsyncIterator[str]:
+        # Replays the mock text in small pieces so streaming UIs can be exercised offline.
+        text = self.complete(system=system, prompt=prompt)
+        size = max(1, int(getattr(settings, "mock_llm_stream_chunk_chars", 8)))
+        delay = max(0.0, float(getattr(settings, "mock_llm_stream_delay_ms", 20.0))) / 1000.0
+        for i in range(0, len(text), size):
+            if i and delay:
+                await asyncio.sleep(delay)
+            yield text[i : i + size]
+
     def complete(self, *, system: str, prompt: str) -> str:
         # Deterministic-ish placeholder so the app works without any LLM.
         return (
@@ -52,13 +159,18 @@ class AutoGenLLMClient(LLMClient):
             self._llm_config = {"temperature": settings.llm_temperature, "config_list": [config]}
             self._mode = "legacy"
 
-    def complete(self, *, system: str, prompt: str) -> str:
-        if self._mode == "v0_4":
-            try:
-                from autogen_ext.models.openai import OpenAIChatCompletionClient  # type: ignore
-                from autogen_ext.models.openai._model_info import ModelInfo  # type: ignore
-            except Exception as e:  # pragma: no cover
-                raise RuntimeError("AutoGen ext OpenAI client not available; install autogen-ext[openai]==0.7.5") from e
+    def _model_client(self):
+        try:
+            from autogen_ext.models.openai import OpenAIChatCompletionClient  # type: ignore
+            from autogen_ext.models.openai._model_info import ModelInfo  # type: ignore
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError("AutoGen ext OpenAI client not available; install autogen-ext[openai]==0.7.5") from e
+
+        key = (settings.llm_model, settings.llm_base_url, settings.llm_api_key)
+        with _model_clients_lock:
+            client = _model_clients.get(key)
+            if client is not None:
+                return client
 
             model_kwargs: Dict[str, Any] = {
                 "model": settings.llm_model,
@@ -66,6 +178,8 @@ class AutoGenLLMClient(LLMClient):
             }
             if settings.llm_base_url:
                 model_kwargs["base_url"] = settings.llm_base_url
+            # Retries/timeouts are handled per agent by llm_resilience; keep the SDK from retrying too.
+            model_kwargs["max_retries"] = 0
 
             # Many OpenAI-compatible gateways / non-OpenAI model IDs work better with explicit ModelInfo.
             model_kwargs["model_info"] = ModelInfo(
@@ -78,26 +192,56 @@ class AutoGenLLMClient(LLMClient):
                 structured_output=False,
             )
 
-            model_client = OpenAIChatCompletionClient(**model_kwargs)
-            agent = self._AssistantAgent(
-                name="AutogenAssistant",
-                system_message=system,
-                model_client=model_client,
-            )
+            http_client = _http_client()
+            try:
+                client = OpenAIChatCompletionClient(**model_kwargs, http_client=http_client)
+            except TypeError:
+                # Older autogen-ext builds do not forward http_client; keep the default pool.
+                client = OpenAIChatCompletionClient(**model_kwargs)
+            _model_clients[key] = client
+            return client
+
+    async def _complete_v0_4(self, *, system: str, prompt: str) -> str:
+        from autogen_core.models import SystemMessage, UserMessage  # type: ignore
+
+        # Single-turn completion on the shared client; a fresh AssistantAgent per call only
+        # added an agent wrapper around the same create().
+        result = await self._model_client().create(
+            [SystemMessage(content=system), UserMessage(content=prompt, source="user")]
+        )
+        content = getattr(result, "content", result)
+        return content if isinstance(content, str) else str(content)
+
+    async def _stream_v0_4(self, *, system: str, prompt: str) -> AsyncIterator[str]:
+        from autogen_core.models import SystemMessage, UserMessage  # type: ignore
+
+        # create_stream yields text deltas and finally the full CreateResult, which we skip.
+        async for item in self._model_client().create_stream(
+            [SystemMessage(content=system), UserMessage(content=prompt, source="user")]
+        ):
+            if isinstance(item, str) and item:
+                yield item
 
-            async def _run() -> str:
-                result = await agent.run(task=prompt)
-                messages = getattr(result, "messages", None)
-                if messages:
-                    last = messages[-1]
-                    content = getattr(last, "content", None)
-                    if content is not None:
-                        return str(content)
-                    return str(last)
-                return str(result)
+    def complete(self, *, system: str, prompt: str) -> str:
+        if self._mode == "v0_4":
+            return _background_loop.run(self._complete_v0_4(system=system, prompt=prompt))
+        return self._complete_legacy(system=system, prompt=prompt)
+
+    async def acomplete(self, *, system: str, prompt: str) -> str:
+        if self._mode == "v0_4":
+            # The pooled client lives on the background loop, so the request runs there too.
+            return await _background_loop.submit(self._complete_v0_4(system=system, prompt=prompt))
+        return await asyncio.to_thread(self._complete_legacy, system=system, prompt=prompt)
 
-            return asyncio.run(_run())
+    async def astream(self, *, system: str, prompt: str) -> AsyncIterator[str]:
+        if self._mode == "v0_4":
+            async for chunk in _background_loop.stream(self._stream_v0_4(system=system, prompt=prompt)):
+                yield chunk
+            return
+        # The legacy chat API has no token stream.
+        yield await self.acomplete(system=system, prompt=prompt)
 
+    def _complete_legacy(self, *, system: str, prompt: str) -> str:
         # legacy 0.2.x path
         agent = self._autogen.AssistantAgent(name="AutogenAssistant", system_message=system, llm_config=self._llm_config)
         user = self._autogen.UserProxyAgent(name="User", human_input_mode="NEVER", code_execution_config=False)
@@ -109,7 +253,298 @@ class AutoGenLLMClient(LLMClient):
         return ""
 
 
-def get_llm_client() -> LLMClient:
-    if settings.mock_llm or not settings.llm_api_key:
-        return MockLLMClient()
-    return AutoGenLLMClient()
+def completion_key(*, model: str, temperature: float, system: str, prompt: str) -> str:
+    """Content hash of one completion request (completion cache key, coalescing key)."""
+    payload = json.dumps([model, round(float(temperature), 4), system, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_llm_tokens(text: str) -> int:
+    # Chat models tokenize CJK at roughly one token per character; Latin text is cheaper, so this
+    # over-estimates, which is the safe side for a rate budget.
+    return len(text)
+
+
+# Lower runs first: interactive generation ahead of background write-back work.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+_AGENT_PRIORITY = {"writer": 0, "outline": 0, "characters": 0, "extractor": 1, "critic": 1}
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class LLMScheduler:
+    """
+    Process-wide admission control for upstream LLM calls. At most `max_in_flight` calls run
+    at once (0 = unlimited) and the tokens charged in the trailing minute stay under
+    `tpm_budget` (0 = unlimited). Waiting calls are served by priority, then arrival order.
+    Identical requests that are already in flight share the one upstream call.
+
+    All state lives on the background LLM loop; callers go through _background_loop.
+    """
+
+    def __init__(self, *, max_in_flight: int, tpm_budget: int, completion_tokens: int) -> None:
+        self.max_in_flight = int(max_in_flight)
+        self.tpm_budget = int(tpm_budget)
+        self.completion_tokens = int(completion_tokens)
+        self._heap: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._window: Deque[List[float]] = deque()  # [charged_at, tokens], trailing 60 s
+        self._window_tokens = 0
+        self._wakeup: asyncio.TimerHandle | None = None
+        self._coalescing: Dict[str, asyncio.Task] = {}
+        self._waits_ms: Deque[float] = deque(maxlen=1000)
+        self.admitted = 0
+        self.coalesced = 0
+        self.max_queue_depth = 0
+
+    # ---- admission -----------------------------------------------------
+
+    def _trim_window(self, now: float) -> None:
+        while self._window and now - self._window[0][0] >= 60.0:
+            self._window_tokens -= int(self._window.popleft()[1])
+
+    def _dispatch(self) -> None:
+        self._wakeup = None
+        now = time.monotonic()
+        self._trim_window(now)
+        while self._heap:
+            head = self._heap[0]
+            if head.future.done():  # caller gave up while queued
+                heapq.heappop(self._heap)
+                continue
+            if self.max_in_flight > 0 and self._in_flight >= self.max_in_flight:
+                return
+            # An oversized request is still admitted once the window is empty, or it would starve.
+            if self.tpm_budget > 0 and self._window and self._window_tokens + head.tokens > self.tpm_budget:
+                delay = max(0.05, 60.0 - (now - self._window[0][0]))
+                self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._heap)
+            self._in_flight += 1
+            entry = [now, float(head.tokens)]
+            self._window.append(entry)
+            self._window_tokens += head.tokens
+            self.admitted += 1
+            self._waits_ms.append((now - head.enqueued_at) * 1000.0)
+            head.future.set_result(entry)
+
+    async def acquire(self, *, priority: int, tokens: int) -> List[float]:
+        """Wait for a slot; returns the window entry to hand back to release()."""
+        waiter = _Waiter(
+            priority=priority,
+            seq=next(self._seq),
+            tokens=int(tokens),
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=time.monotonic(),
+        )
+        heapq.heappush(self._heap, waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._heap))
+        if self._wakeup is None:
+            self._dispatch()
+        return await waiter.future
+
+    def release(self, entry: List[float], *, actual_tokens: int | None = None) -> None:
+        self._in_flight -= 1
+        if actual_tokens is not None and any(e is entry for e in self._window):
+            # Replace the up-front completion allowance with what was actually produced.
+            self._window_tokens += int(actual_tokens) - int(entry[1])
+            entry[1] = float(actual_tokens)
+        if self._wakeup is None:
+            self._dispatch()
+
+    # ---- calls ---------------------------------------------------------
+
+    async def call(self, *, priority: int, prompt_tokens: int, call: Callable[[], Awaitable[str]]) -> str:
+        """One upstream request under admission control."""
+        entry = await self.acquire(priority=priority, tokens=prompt_tokens + self.completion_tokens)
+        text = ""
+        try:
+            text = await call()
+            return text
+        finally:
+            self.release(entry, actual_tokens=prompt_tokens + estimate_llm_tokens(text) if text else None)
+
+    async def run(self, *, key: str, call: Callable[[], Awaitable[str]]) -> str:
+        """Run `call` once per distinct in-flight `key`; concurrent duplicates await the same result."""
+        task = self._coalescing.get(key)
+        if task is None:
+            # The shared call is its own task, so one caller going away does not cancel it for the others.
+            task = asyncio.get_running_loop().create_task(call())
+            self._coalescing[key] = task
+            task.add_done_callback(lambda _t, k=key: self._coalescing.pop(k, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    # ---- metrics -------------------------------------------------------
+
+    def _stats(self) -> Dict[str, Any]:
+        self._trim_window(time.monotonic())
+        waits = sorted(self._waits_ms)
+
+        def pct(q: float) -> float | None:
+            return waits[min(len(waits) - 1, int(q * len(waits)))] if waits else None
+
+        return {
+            "max_in_flight": self.max_in_flight,
+            "tpm_budget": self.tpm_budget,
+            "in_flight": self._in_flight,
+            "queue_depth": sum(1 for w in self._heap if not w.future.done()),
+            "max_queue_depth": self.max_queue_depth,
+            "tokens_last_minute": self._window_tokens,
+            "admitted": self.admitted,
+            "coalesced": self.coalesced,
+            "calls": llm_call_stats.snapshot(),
+            "wait_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": waits[-1] if waits else None, "samples": len(waits)},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return _background_loop.run(self._a_stats())
+
+    async def _a_stats(self) -> Dict[str, Any]:
+        return self._stats()
+
+
+llm_scheduler = LLMScheduler(
+    max_in_flight=int(getattr(settings, "llm_max_in_flight", 8)),
+    tpm_budget=int(getattr(settings, "llm_tpm_budget", 0)),
+    completion_tokens=int(getattr(settings, "llm_tpm_completion_tokens", 2000)),
+)
+
+
+llm_call_stats = CallStats()
+
+
+class ScheduledLLMClient(LLMClient):
+    """
+    Routes one agent's calls through llm_scheduler under the agent's CallPolicy (deadline,
+    retries, hedging); created per call like the cache wrapper.
+    """
+
+    def __init__(
+        self, inner: LLMClient, *, agent: str, model: str, temperature: float, policy: CallPolicy | None = None
+    ) -> None:
+        self._inner = inner
+        self._agent = agent
+        self._priority = _AGENT_PRIORITY.get(agent, PRIORITY_BACKGROUND)
+        self._model = model
+        self._temperature = temperature
+        self._policy = policy or policy_for(agent)
+
+    async def _upstream(self, system: str, prompt: str, timeout: float) -> str:
+        llm_call_stats.counters["attempts"] += 1
+        started = time.monotonic()
+        text = await asyncio.wait_for(self._inner.acomplete(system=system, prompt=prompt), timeout)
+        llm_call_stats.record_latency(self._agent, time.monotonic() - started)
+        return text
+
+    async def _resilient(self, system: str, prompt: str) -> str:
+        prompt_tokens = estimate_llm_tokens(system) + estimate_llm_tokens(prompt)
+
+        def attempt(timeout: float) -> Awaitable[str]:
+            # Every attempt (retry or hedge) queues for its own slot and is charged to the budget.
+            return llm_scheduler.call(
+                priority=self._priority,
+                prompt_tokens=prompt_tokens,
+                call=lambda: self._upstream(system, prompt, timeout),
+            )
+
+        return await call_with_policy(attempt, agent=self._agent, policy=self._policy, stats=llm_call_stats)
+
+    def _run(self, system: str, prompt: str) -> Awaitable[str]:
+        # Runs on the background loop; the inner acomplete never blocks it (mock returns at once,
+        # AutoGen awaits its client there, the legacy path uses a worker thread).
+        return llm_scheduler.run(
+            key=completion_key(model=self._model, temperature=self._temperature, system=system, prompt=prompt),
+            call=lambda: self._resilient(system, prompt),
+        )
+
+    def complete(self, *, system: str, prompt: str) -> str:
+        return _background_loop.run(self._run(system, prompt))
+
+    async def acomplete(self, *, system: str, prompt: str) -> str:
+        return await _background_loop.submit(self._run(system, prompt))
+
+    async def _open_stream(self, system: str, prompt: str) -> Tuple[AsyncIterator[str], str | None]:
+        """Start a stream and wait for its first chunk; retried like a completion until then."""
+        started = time.monotonic()
+        retry = 0
+        while True:
+            agen = self._inner.astream(system=system, prompt=prompt)
+            timeout = min(self._policy.attempt_timeout_s, max(0.0, self._policy.deadline_s - (time.monotonic() - started)))
+            try:
+                llm_call_stats.counters["attempts"] += 1
+                return agen, await asyncio.wait_for(agen.__anext__(), timeout)
+            except StopAsyncIteration:
+                return agen, None
+            except Exception as e:
+                await agen.aclose()
+                if retry >= self._policy.max_retries or not is_retryable(e):
+                    raise
+                delay = backoff_s(self._policy, retry, e)
+                if time.monotonic() - started + delay >= self._policy.deadline_s:
+                    raise
+                retry += 1
+                llm_call_stats.counters["retries"] += 1
+                await asyncio.sleep(delay)
+
+    async def astream(self, *, system: str, prompt: str) -> AsyncIterator[str]:
+        # Streams hold a slot for their whole duration and are never coalesced or hedged; once
+        # text has been sent to the client a failure is final.
+        prompt_tokens = estimate_llm_tokens(system) + estimate_llm_tokens(prompt)
+        entry = await _background_loop.submit(
+            llm_scheduler.acquire(priority=self._priority, tokens=prompt_tokens + llm_scheduler.completion_tokens)
+        )
+        produced = 0
+        try:
+            agen, first = await self._open_stream(system, prompt)
+            if first is None:
+                return
+            produced += estimate_llm_tokens(first)
+            yield first
+            async for chunk in agen:
+                produced += estimate_llm_tokens(chunk)
+                yield chunk
+        finally:
+            _background_loop.loop().call_soon_threadsafe(
+                lambda: llm_scheduler.release(entry, actual_tokens=prompt_tokens + produced)
+            )
+
+
+_llm_clients: Dict[Tuple[Any, ...], LLMClient] = {}
+_llm_clients_lock = threading.Lock()
+
+
+def get_llm_client(agent: str | None = None) -> LLMClient:
+    """
+    Process-wide client for the current configuration (agents call this on every run). With
+    `agent` set, calls go through llm_scheduler and, if LLM_CACHE_ENABLED covers the agent,
+    the completion cache.
+    """
+    mock = bool(settings.mock_llm or not settings.llm_api_key)
+    key = ("mock",) if mock else ("autogen", settings.llm_model, settings.llm_base_url, settings.llm_api_key)
+    with _llm_clients_lock:
+        client = _llm_clients.get(key)
+        if client is None:
+            client = MockLLMClient() if mock else AutoGenLLMClient()
+            _llm_clients[key] = client
+
+    if agent is None:
+        return client
+    from app.agents.llm_cache import CachedLLMClient, cache_enabled_for
+
+    model, temperature = ("mock" if mock else str(settings.llm_model)), float(settings.llm_temperature)
+    # Cache in front of the scheduler, so hits never queue for an upstream slot.
+    client = ScheduledLLMClient(client, agent=agent, model=model, temperature=temperature)
+    if cache_enabled_for(agent):
+        client = CachedLLMClient(client, agent=agent, model=model, temperature=temperature)
+    return client
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+from sqlalchemy import text as sql_text
+
+from app.agents.llm import LLMClient, completion_key
+from app.core.config import settings
+from app.db.session import engine, read_engine
+
+# Set per request by the API middleware (header `X-LLM-Cache: bypass`); copied into worker
+# threads and tasks together with the rest of the context.
+bypass_llm_cache: contextvars.ContextVar[bool] = contextvars.ContextVar("bypass_llm_cache", default=False)
+
+
+def cache_enabled_for(agent: str) -> bool:
+    if not getattr(settings, "llm_cache_enabled", False):
+        return False
+    agents = str(getattr(settings, "llm_cache_agents", "extractor,critic"))
+    return agent in {a.strip() for a in agents.split(",") if a.strip()}
+
+
+class LLMCompletionCache:
+    """
+    Completions keyed by sha256 of (model, temperature, system, prompt), in the `llm_cache`
+    table. Lookups only read (read_engine), so hits never queue behind the writer; the hit
+    times are kept in memory and written to last_used_at by the next put(), before it evicts
+    the least recently used rows once the stored texts exceed `max_bytes` (max_bytes <= 0
+    leaves the table unbounded).
+    """
+
+    def __init__(self, *, max_bytes: int) -> None:
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._pending_touches: Dict[str, float] = {}  # cache_key -> last hit, not yet written
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*, model: str, temperature: float, system: str, prompt: str) -> str:
+        return completion_key(model=model, temperature=temperature, system=system, prompt=prompt)
+
+    def get(self, key: str) -> str | None:
+        with read_engine.connect() as conn:
+            row = conn.execute(sql_text("SELECT response FROM llm_cache WHERE cache_key = :k"), {"k": key}).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._pending_touches[key] = time.time()
+        return None if row is None else str(row[0])
+
+    def _write_touches(self, conn) -> None:
+        with self._lock:
+            touches, self._pending_touches = self._pending_touches, {}
+        if touches:
+            conn.execute(
+                sql_text("UPDATE llm_cache SET last_used_at = :t WHERE cache_key = :k AND last_used_at < :t"),
+                [{"k": k, "t": t} for k, t in touches.items()],
+            )
+
+    def put(self, key: str, *, model: str, agent: str, response: str) -> None:
+        now = time.time()
+        with engine.begin() as conn:
+            conn.execute(
+                sql_text(
+                    "INSERT INTO llm_cache(cache_key, model_name, agent, response, bytes, created_at, last_used_at) "
+                    "VALUES(:k,:m,:a,:r,:b,:t,:t) "
+                    "ON CONFLICT(cache_key) DO UPDATE SET model_name = excluded.model_name, agent = excluded.agent, "
+                    "response = excluded.response, bytes = excluded.bytes, created_at = excluded.created_at, "
+                    "last_used_at = excluded.last_used_at"
+                ),
+                {"k": key, "m": model, "a": agent, "r": response, "b": len(response.encode("utf-8")), "t": now},
+            )
+            # Eviction ranks by last_used_at, so the hits since the last put go in first.
+            self._write_touches(conn)
+            self._evict(conn)
+
+    def _evict(self, conn) -> None:
+        if self.max_bytes <= 0:
+            return
+        total = int(conn.execute(sql_text("SELECT COALESCE(SUM(bytes), 0) FROM llm_cache")).scalar() or 0)
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        victims: List[str] = []
+        for cache_key, size in conn.execute(sql_text("SELECT cache_key, bytes FROM llm_cache ORDER BY last_used_at ASC")):
+            victims.append(cache_key)
+            excess -= int(size)
+            if excess <= 0:
+                break
+        conn.execute(sql_text("DELETE FROM llm_cache WHERE cache_key = :k"), [{"k": k} for k in victims])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            out: Dict[str, Any] = {"hits": self.hits, "misses": self.misses, "hit_rate": (self.hits / total) if total else 0.0}
+        with read_engine.connect() as conn:
+            rows, size = conn.execute(sql_text("SELECT COUNT(1), COALESCE(SUM(bytes), 0) FROM llm_cache")).fetchone()
+        out.update({"rows": int(rows), "bytes": int(size), "max_bytes": self.max_bytes})
+        return out
+
+
+llm_completion_cache = LLMCompletionCache(max_bytes=int(getattr(settings, "llm_cache_max_bytes", 256 * 1024 * 1024)))
+
+
+class CachedLLMClient(LLMClient):
+    """
+    Read-through cache in front of another client for one agent. Created per call, so
+    `cache_status` ("hit" / "miss" / "bypass") describes this agent's last completion.
+    A bypassed call skips the lookup but still stores the fresh answer.
+    """
+
+    def __init__(self, inner: LLMClient, *, agent: str, model: str, temperature: float) -> None:
+        self._inner = inner
+        self._agent = agent
+        self._model = model
+        self._temperature = temperature
+        self._cache = llm_completion_cache
+
+    def _key(self, system: str, prompt: str) -> str:
+        return self._cache.key(model=self._model, temperature=self._temperature, system=system, prompt=prompt)
+
+    def _lookup(self, key: str) -> str | None:
+        if bypass_llm_cache.get():
+            self.cache_status = "bypass"
+            return None
+        cached = self._cache.get(key)
+        self.cache_status = "miss" if cached is None else "hit"
+        return cached
+
+    def _store(self, key: str, text: str) -> None:
+        self._cache.put(key, model=self._model, agent=self._agent, response=text)
+
+    def complete(self, *, system: str, prompt: str) -> str:
+        key = self._key(system, prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        text = self._inner.complete(system=system, prompt=prompt)
+        self._store(key, text)
+        return text
+
+    async def acomplete(self, *, system: str, prompt: str) -> str:
+        key = self._key(system, prompt)
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            return cached
+        text = await self._inner.acomplete(system=system, prompt=prompt)
+        await asyncio.to_thread(self._store, key, text)
+        return text
+
+    async def astream(self, *, system: str, prompt: str) -> AsyncIterator[str]:
+        key = self._key(system, prompt)
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            yield cached
+            return
+        pieces: List[str] = []
+        async for chunk in self._inner.astream(system=system, prompt=prompt):
+            pieces.append(chunk)
+            yield chunk
+        await asyncio.to_thread(self._store, key, "".join(pieces))
+
+
+def cache_note(llm: LLMClient) -> str:
+    """Suffix for agent log summaries; empty when the call did not go through the cache."""
+    status = getattr(llm, "cache_status", None)
+    if status is None:
+        return ""
+    s = llm_completion_cache
+    return f"（llm_cache={status} hits={s.hits} misses={s.misses}）"
+
+
+def with_cache_note(logs: List[Dict[str, Any]], llm: LLMClient) -> List[Dict[str, Any]]:
+    note = cache_note(llm)
+    if note:
+        for log in logs:
+            log["summary"] = f"{log.get('summary', '')}{note}"
+    return logs
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, fields, replace
+from typing import Any, Awaitable, Callable, Deque, Dict
+
+from app.core.config import settings
+
+# HTTP statuses worth another attempt: timeouts, conflicts, rate limits, upstream/gateway failures.
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+# openai / httpx exception classes, matched by name so neither package has to be importable here.
+_RETRYABLE_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError",
+    "TransportError",
+    "TimeoutException",
+    "ConnectError",
+    "ReadTimeout",
+    "RemoteProtocolError",
+}
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    deadline_s: float = 300.0  # whole call: queueing, attempts, backoff
+    attempt_timeout_s: float = 120.0  # one upstream request (first chunk for streams)
+    max_retries: int = 2
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 8.0
+    hedge: bool = False
+    hedge_percentile: float = 0.95
+    hedge_min_delay_s: float = 2.0  # also the delay until enough latency samples exist
+
+
+def policy_for(agent: str) -> CallPolicy:
+    """Global LLM_* defaults, overridden per agent by LLM_AGENT_POLICIES."""
+    base = CallPolicy(
+        deadline_s=float(getattr(settings, "llm_deadline_s", 300.0)),
+        attempt_timeout_s=float(getattr(settings, "llm_attempt_timeout_s", 120.0)),
+        max_retries=int(getattr(settings, "llm_max_retries", 2)),
+        backoff_base_s=float(getattr(settings, "llm_backoff_base_s", 0.5)),
+        backoff_max_s=float(getattr(settings, "llm_backoff_max_s", 8.0)),
+        hedge=bool(getattr(settings, "llm_hedge", False)),
+        hedge_percentile=float(getattr(settings, "llm_hedge_percentile", 0.95)),
+        hedge_min_delay_s=float(getattr(settings, "llm_hedge_min_delay_s", 2.0)),
+    )
+    overrides = (getattr(settings, "llm_agent_policies", None) or {}).get(agent) or {}
+    known = {f.name for f in fields(CallPolicy)}
+    return replace(base, **{k: v for k, v in overrides.items() if k in known})
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in _RETRYABLE_STATUS
+    return any(cls.__name__ in _RETRYABLE_NAMES for cls in type(exc).__mro__)
+
+
+def _retry_after_s(exc: BaseException) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    try:
+        value = headers.get("retry-after") if headers is not None else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_s(policy: CallPolicy, retry: int, exc: BaseException | None = None) -> float:
+    """Full-jitter exponential backoff, never shorter than a server-sent Retry-After."""
+    cap = min(policy.backoff_max_s, policy.backoff_base_s * (2**retry))
+    delay = random.uniform(0.0, cap)
+    hinted = _retry_after_s(exc) if exc is not None else None
+    return max(delay, min(hinted, policy.backoff_max_s)) if hinted else delay
+
+
+class CallStats:
+    """Per-agent latency samples (hedge delay) and retry/hedge counters. Used on one event loop."""
+
+    def __init__(self, samples: int = 200) -> None:
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._samples = samples
+        self.counters: Dict[str, int] = {
+            "attempts": 0,
+            "retries": 0,
+            "attempt_timeouts": 0,
+            "deadline_exceeded": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+        }
+
+    def record_latency(self, agent: str, seconds: float) -> None:
+        self._latencies.setdefault(agent, deque(maxlen=self._samples)).append(seconds)
+
+    def hedge_delay_s(self, agent: str, policy: CallPolicy) -> float:
+        lat = sorted(self._latencies.get(agent) or [])
+        if len(lat) < 20:
+            return policy.hedge_min_delay_s
+        p = lat[min(len(lat) - 1, int(policy.hedge_percentile * len(lat)))]
+        return max(policy.hedge_min_delay_s, p)
+
+    def snapshot(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self.counters)
+        out["latency_p95_s"] = {
+            agent: sorted(lat)[min(len(lat) - 1, int(0.95 * len(lat)))] for agent, lat in self._latencies.items() if lat
+        }
+        return out
+
+
+async def _hedged(
+    attempt: Callable[[float], Awaitable[str]], *, agent: str, policy: CallPolicy, timeout: float, stats: CallStats
+) -> str:
+    primary = asyncio.ensure_future(attempt(timeout))
+    delay = stats.hedge_delay_s(agent, policy)
+    done, _ = await asyncio.wait({primary}, timeout=min(delay, timeout))
+    if done:
+        return primary.result()
+
+    stats.counters["hedges"] += 1
+    backup = asyncio.ensure_future(attempt(max(0.0, timeout - delay)))
+    pending = {primary, backup}
+    first_error: BaseException | None = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        stats.counters["hedge_wins"] += 1
+                    return task.result()
+                first_error = first_error or task.exception()
+        assert first_error is not None
+        raise first_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _retrying(
+    attempt: Callable[[float], Awaitable[str]], *, agent: str, policy: CallPolicy, stats: CallStats, started: float
+) -> str:
+    retry = 0
+    while True:
+        timeout = min(policy.attempt_timeout_s, max(0.0, policy.deadline_s - (time.monotonic() - started)))
+        try:
+            if policy.hedge:
+                return await _hedged(attempt, agent=agent, policy=policy, timeout=timeout, stats=stats)
+            return await attempt(timeout)
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                stats.counters["attempt_timeouts"] += 1
+            if retry >= policy.max_retries or not is_retryable(e):
+                raise
+            delay = backoff_s(policy, retry, e)
+            if time.monotonic() - started + delay >= policy.deadline_s:
+                raise
+            retry += 1
+            stats.counters["retries"] += 1
+            await asyncio.sleep(delay)
+
+
+async def call_with_policy(
+    attempt: Callable[[float], Awaitable[str]], *, agent: str, policy: CallPolicy, stats: CallStats
+) -> str:
+    """
+    Run `attempt(timeout_s)` (one upstream request; the timeout starts once it holds a
+    scheduler slot) under `policy`: retry retryable failures with jittered exponential backoff, optionally hedge a
+    slow request with a duplicate, and stop everything once the overall deadline is spent.
+    """
+    started = time.monotonic()
+    try:
+        async with asyncio.timeout(policy.deadline_s) as deadline:
+            return await _retrying(attempt, agent=agent, policy=policy, stats=stats, started=started)
+    except TimeoutError as e:
+        if not deadline.expired():
+            raise
+        stats.counters["deadline_exceeded"] += 1
+        raise TimeoutError(f"LLM call for {agent} exceeded its {policy.deadline_s:.0f}s deadline") from e
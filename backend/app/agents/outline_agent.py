@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+from typing import Tuple
+
 from app.agents.llm import get_llm_client
+from app.agents.llm_cache import with_cache_note
 from app.agents.types import AgentResult
 
 
 class OutlineAgent:
     name = "OutlineAgent"
+    cache_name = "outline"  # LLM_CACHE_AGENTS entry
 
-    def run(
+    def _messages(
         self,
         *,
         genre: str,
@@ -18,8 +22,7 @@ class OutlineAgent:
         target_chapters: int,
         theme: str,
         total_words: int,
-    ) -> AgentResult:
-        llm = get_llm_client()
+    ) -> Tuple[str, str]:
         system = (
             "你是小说策划编辑。你擅长把用户需求拆成清晰的大纲（分卷/分章），"
             "并且章节之间有因果推进、伏笔与回收。输出可读的大纲文本。"
@@ -34,7 +37,9 @@ class OutlineAgent:
 - 主题：{theme}
 - 目标总字数：{total_words}
 """
-        outline = llm.complete(system=system, prompt=prompt)
+        return system, prompt
+
+    def _result(self, outline: str, target_chapters: int) -> AgentResult:
         logs = [
             {
                 "agent": self.name,
@@ -45,3 +50,56 @@ class OutlineAgent:
         ]
         return AgentResult(data={"outline": outline}, logs=logs)
 
+    def run(
+        self,
+        *,
+        genre: str,
+        setting: str,
+        style: str,
+        keywords: str,
+        audience: str,
+        target_chapters: int,
+        theme: str,
+        total_words: int,
+    ) -> AgentResult:
+        system, prompt = self._messages(
+            genre=genre,
+            setting=setting,
+            style=style,
+            keywords=keywords,
+            audience=audience,
+            target_chapters=target_chapters,
+            theme=theme,
+            total_words=total_words,
+        )
+        llm = get_llm_client(self.cache_name)
+        result = self._result(llm.complete(system=system, prompt=prompt), target_chapters)
+        with_cache_note(result.logs, llm)
+        return result
+
+    async def arun(
+        self,
+        *,
+        genre: str,
+        setting: str,
+        style: str,
+        keywords: str,
+        audience: str,
+        target_chapters: int,
+        theme: str,
+        total_words: int,
+    ) -> AgentResult:
+        system, prompt = self._messages(
+            genre=genre,
+            setting=setting,
+            style=style,
+            keywords=keywords,
+            audience=audience,
+            target_chapters=target_chapters,
+            theme=theme,
+            total_words=total_words,
+        )
+        llm = get_llm_client(self.cache_name)
+        result = self._result(await llm.acomplete(system=system, prompt=prompt), target_chapters)
+        with_cache_note(result.logs, llm)
+        return result
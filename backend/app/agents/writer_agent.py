@@ -1,21 +1,17 @@
 from __future__ import annotations
 
+from typing import AsyncIterator, Tuple
+
 from app.agents.llm import get_llm_client
+from app.agents.llm_cache import with_cache_note
 from app.agents.types import AgentResult
 
 
 class WriterAgent:
     name = "WriterAgent"
+    cache_name = "writer"  # LLM_CACHE_AGENTS entry
 
-    def run(
-        self,
-        *,
-        chapter_number: int,
-        context: str,
-        target_words: int,
-        style: str,
-    ) -> AgentResult:
-        llm = get_llm_client()
+    def _messages(self, *, chapter_number: int, context: str, target_words: int, style: str) -> Tuple[str, str]:
         system = (
             "你是小说作者。你严格遵守大纲与角色设定，保持人物语言与动机一致，"
             "并且注意伏笔与前后呼应。输出正文，不要输出分析过程。"
@@ -33,7 +29,10 @@ class WriterAgent:
 3) 不要无缘由新增硬设定/关键道具
 4) 与前文呼应、为后文埋伏笔
 """
-        text = llm.complete(system=system, prompt=prompt)
+        return system, prompt
+
+    def result_from_text(self, chapter_number: int, text: str) -> AgentResult:
+        """The AgentResult for a finished chapter text, e.g. the joined pieces of astream()."""
         logs = [
             {
                 "agent": self.name,
@@ -43,3 +42,44 @@ class WriterAgent:
             }
         ]
         return AgentResult(data={"chapter_number": chapter_number, "text": text}, logs=logs)
+
+    def run(
+        self,
+        *,
+        chapter_number: int,
+        context: str,
+        target_words: int,
+        style: str,
+    ) -> AgentResult:
+        system, prompt = self._messages(chapter_number=chapter_number, context=context, target_words=target_words, style=style)
+        llm = get_llm_client(self.cache_name)
+        result = self.result_from_text(chapter_number, llm.complete(system=system, prompt=prompt))
+        with_cache_note(result.logs, llm)
+        return result
+
+    async def arun(
+        self,
+        *,
+        chapter_number: int,
+        context: str,
+        target_words: int,
+        style: str,
+    ) -> AgentResult:
+        system, prompt = self._messages(chapter_number=chapter_number, context=context, target_words=target_words, style=style)
+        llm = get_llm_client(self.cache_name)
+        result = self.result_from_text(chapter_number, await llm.acomplete(system=system, prompt=prompt))
+        with_cache_note(result.logs, llm)
+        return result
+
+    async def astream(
+        self,
+        *,
+        chapter_number: int,
+        context: str,
+        target_words: int,
+        style: str,
+    ) -> AsyncIterator[str]:
+        """Chapter text as it is generated; the caller joins the pieces and passes them to result_from_text()."""
+        system, prompt = self._messages(chapter_number=chapter_number, context=context, target_words=target_words, style=style)
+        async for chunk in get_llm_client(self.cache_name).astream(system=system, prompt=prompt):
+            yield chunk
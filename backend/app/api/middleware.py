@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from app.agents.llm_cache import bypass_llm_cache
+from rag.service import rag_notes
+
+
+class LLMCacheBypassMiddleware:
+    """`X-LLM-Cache: bypass` (or `no-cache` / `refresh`) skips cached LLM answers for this request."""
+
+    _VALUES = {b"bypass", b"no-cache", b"refresh"}
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        value = dict(scope.get("headers") or []).get(b"x-llm-cache", b"").strip().lower()
+        token = bypass_llm_cache.set(value in self._VALUES)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            bypass_llm_cache.reset(token)
+
+
+class RAGNotesMiddleware:
+    """Gives each request its own RAG fallback-notes list (see rag.service.rag_notes)."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = rag_notes.set([])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            rag_notes.reset(token)
@@ -1,19 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import json
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.agents.coordinator import Coordinator
 from app.db import crud
-from app.db.session import get_db
+from app.db.session import SessionLocal, get_db
 from app.schemas import (
+    AgentLogPage,
     APIResponse,
     RagPreviewResponse,
     RagStatsItem,
     CharactersRequest,
+    ChapterContent,
+    ChapterMeta,
     CriticIssue,
     ExpandChapterRequest,
     ExpandChapterResponse,
@@ -32,7 +37,7 @@ projects = ProjectService()
 rag = RAGService()
 
 
-def _project_state(project) -> ProjectState:
+def _project_state(db: Session, project) -> ProjectState:
     return ProjectState(
         id=project.id,
         genre=project.genre,
@@ -44,15 +49,15 @@ def _project_state(project) -> ProjectState:
         outline=project.outline or "",
         characters=json.loads(project.characters_json or "{}"),
         characters_text=project.characters_text or "",
-        chapters=json.loads(project.chapters_json or "{}"),
+        chapters={str(m["chapter_number"]): ChapterMeta(**m) for m in crud.list_chapter_meta(db, project.id)},
         created_at=project.created_at,
         updated_at=project.updated_at,
     )
 
 
-def _logs_tail(project, limit: int = 50) -> List[Dict[str, Any]]:
-    logs = json.loads(project.agent_logs_json or "[]")
-    return logs[-limit:]
+def _logs_tail(db: Session, project_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+    logs, _ = crud.list_agent_logs(db, project_id, limit=limit)
+    return logs
 
 def _project_or_404(db: Session, project_id: str):
     try:
@@ -72,7 +77,7 @@ def create_project(payload: ProjectCreateRequest, db: Session = Depends(get_db))
         audience=payload.audience,
         target_chapters=int(payload.target_chapters),
     )
-    return APIResponse(data=_project_state(project), error=None, agent_logs=logs)
+    return APIResponse(data=_project_state(db, project), error=None, agent_logs=logs)
 
 
 @router.get("/projects/{project_id}", response_model=APIResponse)
@@ -80,38 +85,75 @@ def get_project(project_id: str = Path(min_length=1), db: Session = Depends(get_
     project = crud.get_project(db, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="project not found")
-    return APIResponse(data=_project_state(project), error=None, agent_logs=_logs_tail(project))
+    return APIResponse(data=_project_state(db, project), error=None, agent_logs=_logs_tail(db, project.id))
+
+
+@router.get("/projects/{project_id}/chapters/{chapter_number}", response_model=APIResponse)
+def get_chapter(project_id: str, chapter_number: int = Path(ge=1, le=200), db: Session = Depends(get_db)):
+    _ = _project_or_404(db, project_id)
+    chapter = crud.get_chapter(db, project_id, chapter_number)
+    if chapter is None:
+        raise HTTPException(status_code=404, detail="chapter not found")
+    data = ChapterContent(
+        chapter_number=chapter.chapter_no,
+        length=chapter.char_count,
+        content_hash=chapter.content_hash,
+        updated_at=chapter.updated_at,
+        text=chapter.text,
+    )
+    return APIResponse(data=data, error=None, agent_logs=[])
+
+
+@router.get("/projects/{project_id}/logs", response_model=APIResponse)
+def list_logs(
+    project_id: str,
+    cursor: int | None = Query(default=None, ge=1, description="next_cursor of the previous page"),
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    _ = _project_or_404(db, project_id)
+    items, next_cursor = crud.list_agent_logs(db, project_id, before_id=cursor, limit=limit)
+    page = AgentLogPage(items=items, next_cursor=next_cursor)
+    return APIResponse(data=page, error=None, agent_logs=[])
+
+
+# The generation routes are async so a slow LLM call parks a coroutine instead of a threadpool
+# worker; blocking DB / index work inside the service runs via asyncio.to_thread.
 
 
 @router.post("/projects/{project_id}/outline", response_model=APIResponse)
-def generate_outline(project_id: str, payload: OutlineRequest, db: Session = Depends(get_db)):
-    project = _project_or_404(db, project_id)
-    project, logs = projects.generate_outline(db, project, theme=payload.theme, total_words=payload.total_words)
-    return APIResponse(data=_project_state(project), error=None, agent_logs=logs)
+async def generate_outline(project_id: str, payload: OutlineRequest, db: Session = Depends(get_db)):
+    project = await asyncio.to_thread(_project_or_404, db, project_id)
+    project, logs = await projects.agenerate_outline(db, project, theme=payload.theme, total_words=payload.total_words)
+    return APIResponse(data=await asyncio.to_thread(_project_state, db, project), error=None, agent_logs=logs)
 
 
 @router.post("/projects/{project_id}/characters", response_model=APIResponse)
-def generate_characters(project_id: str, payload: CharactersRequest, db: Session = Depends(get_db)):
-    project = _project_or_404(db, project_id)
+async def generate_characters(project_id: str, payload: CharactersRequest, db: Session = Depends(get_db)):
+    project = await asyncio.to_thread(_project_or_404, db, project_id)
     if not (project.outline or "").strip():
         raise HTTPException(status_code=400, detail="outline is empty; generate outline first")
-    project, logs = projects.generate_characters(db, project, constraints=payload.constraints)
-    return APIResponse(data=_project_state(project), error=None, agent_logs=logs)
+    project, logs = await projects.agenerate_characters(db, project, constraints=payload.constraints)
+    return APIResponse(data=await asyncio.to_thread(_project_state, db, project), error=None, agent_logs=logs)
+
+
+def _require_outline_and_characters(project) -> None:
+    if not (project.outline or "").strip():
+        raise HTTPException(status_code=400, detail="outline is empty; generate outline first")
+    if not (project.characters_json or "").strip() or project.characters_json.strip() == "{}":
+        raise HTTPException(status_code=400, detail="characters are empty; generate characters first")
 
 
 @router.post("/projects/{project_id}/chapters/{chapter_number}/expand", response_model=APIResponse)
-def expand_chapter(
+async def expand_chapter(
     project_id: str,
     chapter_number: int = Path(ge=1, le=200),
     payload: ExpandChapterRequest = ...,
     db: Session = Depends(get_db),
 ):
-    project = _project_or_404(db, project_id)
-    if not (project.outline or "").strip():
-        raise HTTPException(status_code=400, detail="outline is empty; generate outline first")
-    if not (project.characters_json or "").strip() or project.characters_json.strip() == "{}":
-        raise HTTPException(status_code=400, detail="characters are empty; generate characters first")
-    project, data, logs = projects.expand_chapter(
+    project = await asyncio.to_thread(_project_or_404, db, project_id)
+    _require_outline_and_characters(project)
+    project, data, logs = await projects.aexpand_chapter(
         db,
         project,
         chapter_number=chapter_number,
@@ -121,6 +163,48 @@ def expand_chapter(
     return APIResponse(data=data, error=None, agent_logs=logs)
 
 
+def _sse(event: str, payload: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/projects/{project_id}/chapters/{chapter_number}/expand/stream")
+async def expand_chapter_stream(
+    project_id: str,
+    chapter_number: int = Path(ge=1, le=200),
+    payload: ExpandChapterRequest = ...,
+    db: Session = Depends(get_db),
+):
+    # Validate up front so 404/400 still come back as plain HTTP errors.
+    project = await asyncio.to_thread(_project_or_404, db, project_id)
+    _require_outline_and_characters(project)
+
+    async def events():
+        # The request-scoped session is closed once the response starts, so the stream owns one.
+        stream_db = SessionLocal()
+        try:
+            stream_project = await asyncio.to_thread(_project_or_404, stream_db, project_id)
+            async for event, data in projects.astream_expand_chapter(
+                stream_db,
+                stream_project,
+                chapter_number=chapter_number,
+                instruction=payload.instruction,
+                target_words=payload.target_words,
+            ):
+                if event == "done":
+                    data = APIResponse(data=data["data"], error=None, agent_logs=data["agent_logs"]).model_dump(mode="json")
+                yield _sse(event, data)
+        except Exception as e:
+            yield _sse("error", {"code": "internal_error", "message": f"{type(e).__name__}: {e}"})
+        finally:
+            await asyncio.to_thread(stream_db.close)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/projects/{project_id}/rag/stats", response_model=APIResponse)
 def rag_stats(project_id: str, db: Session = Depends(get_db)):
     _ = _project_or_404(db, project_id)
@@ -128,6 +212,12 @@ def rag_stats(project_id: str, db: Session = Depends(get_db)):
     return APIResponse(data=stats, error=None, agent_logs=[])
 
 
+@router.get("/projects/{project_id}/rag/cache", response_model=APIResponse)
+def rag_cache_stats(project_id: str, db: Session = Depends(get_db)):
+    _ = _project_or_404(db, project_id)
+    return APIResponse(data=rag.cache_stats(project_id), error=None, agent_logs=[])
+
+
 @router.get("/projects/{project_id}/rag/preview", response_model=APIResponse)
 def rag_preview(
     project_id: str,
@@ -167,5 +257,7 @@ def rag_preview(
             for t in sorted({c.type for c in debug.final_selected})
         },
         context_string=(debug.context_string + "\n\n## user instruction\n" + q).strip(),
+        rerank_scores=debug.rerank_scores,
+        timings_ms=debug.timings_ms,
     ).model_dump()
     return APIResponse(data=payload, error=None, agent_logs=[])
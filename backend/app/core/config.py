@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Any, Dict, List
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -9,26 +9,107 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=(".env", "../.env"), extra="ignore")
 
     db_path: str = "/data/app.db"
+    # Empty: SQLite at db_path (+ Chroma/numpy vectors). A postgresql+psycopg:// URL moves the
+    # tables, the keyword index (tsvector) and the vectors (pgvector) into PostgreSQL; the
+    # sqlite_* and vector_backend settings are then unused.
+    database_url: str = ""
+    pg_pool_size: int = 10
+    pg_max_overflow: int = -1  # -1 = uncapped (nested sessions deadlock a capped pool); bound it with max_connections
+    pg_hnsw_ef_search: int = 100  # HNSW candidate list; filters apply after it, so keep it above top_k
+    # production: WAL + tuned pragmas, reads on a reader pool, writes on one writer connection.
+    # default: a single plain engine (SQLite defaults, rollback journal).
+    sqlite_profile: str = "production"  # production|default
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_synchronous: str = "NORMAL"  # safe with WAL; FULL additionally survives power loss
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024  # per connection
+    sqlite_read_pool_size: int = 8
+    sqlite_write_wait_s: float = 60.0  # how long a writer may queue for the writer connection
     backend_cors_origins: str = "http://localhost:3000"
 
     mock_llm: bool = True
+    # Mock streaming (SSE expand endpoint): piece size and pause between pieces
+    mock_llm_stream_chunk_chars: int = 8
+    mock_llm_stream_delay_ms: float = 20.0
     llm_provider: str = "openai_compatible"
     llm_api_key: str | None = None
     llm_base_url: str | None = None
     llm_model: str = "gpt-4o-mini"
     llm_temperature: float = 0.7
+    # Shared HTTP pool of the long-lived OpenAI-compatible client
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    llm_keepalive_expiry_s: float = 60.0
+    llm_timeout_s: float = 120.0
+    # Process-wide LLM scheduler: concurrent upstream calls and tokens/minute (0 = unlimited);
+    # each call is charged prompt length + this completion allowance until its real size is known.
+    llm_max_in_flight: int = 8
+    llm_tpm_budget: int = 0
+    llm_tpm_completion_tokens: int = 2000
+    # Per-call resilience (app/agents/llm_resilience.py): overall deadline, per-attempt timeout,
+    # jittered exponential backoff on retryable errors, optional hedging after the p95 latency.
+    llm_deadline_s: float = 300.0
+    llm_attempt_timeout_s: float = 120.0
+    llm_max_retries: int = 2
+    llm_backoff_base_s: float = 0.5
+    llm_backoff_max_s: float = 8.0
+    llm_hedge: bool = False
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_delay_s: float = 2.0
+    # Per-agent overrides of the fields above (without the llm_ prefix), JSON in the env var.
+    # Writer calls are long and costly: generous timeout, one retry, never hedged.
+    llm_agent_policies: Dict[str, Dict[str, Any]] = {
+        "writer": {"attempt_timeout_s": 240.0, "deadline_s": 420.0, "max_retries": 1, "hedge": False},
+        "extractor": {"attempt_timeout_s": 90.0, "deadline_s": 200.0},
+        "critic": {"attempt_timeout_s": 90.0, "deadline_s": 200.0},
+    }
+    # Completion cache (llm_cache table), off by default; agents: outline,characters,writer,extractor,critic.
+    # Requests can skip the lookup with the header `X-LLM-Cache: bypass`.
+    llm_cache_enabled: bool = False
+    llm_cache_agents: str = "extractor,critic"
+    llm_cache_max_bytes: int = 256 * 1024 * 1024  # LRU eviction past this many response bytes; 0 = unbounded
 
     # RAG
     chroma_persist_dir: str = "data/chroma"
-    embeddings_provider: str = "mock"  # local_bge_m3|mock
+    vector_backend: str = "chroma"  # chroma|numpy
+    vector_index_dir: str = "data/vectors"  # numpy backend: per-project memory-mapped matrices
+    embeddings_provider: str = "mock"  # local_bge_m3|onnx_bge_m3|hashing_ngram|mock
     bge_m3_model_name: str = "BAAI/bge-m3"
-    rerank_provider: str = "mock"  # local_bge|mock
+    rerank_provider: str = "mock"  # local_bge|onnx_bge|mock
     bge_rerank_model_name: str = "BAAI/bge-reranker-v2-m3"
     rag_device: str | None = None  # e.g. "cpu" or "cuda"
+    rag_warmup_models: bool = False  # load embedder/reranker at startup instead of on first request
+    rag_model_idle_unload_s: float = 0.0  # drop shared models unused for this long; 0 = keep loaded
+    model_server_socket: str | None = None  # Unix socket of `python -m rag.model_server`; None = load models in-process
+    model_server_timeout_s: float = 30.0
+    model_server_batch_wait_ms: float = 5.0  # server side: merge requests arriving within this window
+    model_server_batch_max_items: int = 256
+    rag_batch_token_budget: int = 8192  # local models: max batch_size * padded length per forward pass
+    rag_batch_max_size: int = 64
+    rag_torch_threads: int = 0  # cap torch intra-op threads (process-wide); 0 = torch default
+    hashing_ngram_dim: int = 1024  # hashing_ngram: buckets per vector
+    hashing_ngram_max_n: int = 3  # character 1..N-grams
+    hashing_ngram_sublinear_tf: bool = True  # log(1 + tf) instead of raw counts
+    hashing_ngram_normalize: bool = True  # L2-normalize
+    onnx_quantized: bool = True  # onnx providers: prefer <model>/onnx/model_int8.onnx over model.onnx
+    onnx_num_threads: int = 0  # ONNX Runtime intra-op threads per session; 0 = runtime default
+    embeddings_cache_dtype: str = "float32"  # float32|float16 (BLOB encoding in embeddings_cache)
     rag_max_chunk_chars: int = 1400
     rag_overlap_ratio: float = 0.2
     rag_top_k_v: int = 10
     rag_top_k_kw: int = 10
+    rag_channel_workers: int = 8  # shared pool running vector/keyword retrieval concurrently
+    rag_vector_timeout_s: float = 10.0
+    rag_keyword_timeout_s: float = 5.0
+    rag_query_cache_size: int = 512  # LRU of query embeddings keyed by (model, query); 0 disables
+    rag_result_cache_size: int = 256  # LRU of retrieval results keyed by index generation; 0 disables
+    rag_rerank_max_candidates: int = 24  # cross-encoder only sees the top N by rule_score; 0 = all
+    rag_rerank_budget_ms: float = 1500.0  # stop cross-encoder batches past this; 0 = no budget
+    rag_rerank_batch_size: int = 16
+    rag_rerank_cache_memory_size: int = 4096  # in-memory LRU in front of the rerank_cache table; 0 disables
+    rag_rerank_cache_ttl_s: float = 7 * 24 * 3600.0  # 0 = never expire
+    rag_rerank_cache_max_rows: int = 200_000  # oldest rows are evicted past this; 0 = unbounded
+    rag_rerank_cache_expire_interval_s: float = 60.0  # TTL/size expiry runs at most this often (or when ~max_rows is passed)
 
     # Critic
     critic_provider: str = "mock"  # llm|mock
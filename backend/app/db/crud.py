@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import datetime as dt
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
-from app.db.models import Chapter, ChapterMemory, Project, SourceDocument
+from app.db.models import AgentLogEntry, Chapter, ChapterMemory, Project, SourceDocument
+from rag.chunking import content_hash
 
 
 def create_project(
@@ -44,7 +46,6 @@ def update_project_artifacts(
     outline: str | None = None,
     characters: Dict[str, Any] | None = None,
     characters_text: str | None = None,
-    chapters: Dict[str, str] | None = None,
     append_logs: List[Dict[str, Any]] | None = None,
 ) -> Project:
     if outline is not None:
@@ -53,12 +54,8 @@ def update_project_artifacts(
         project.characters_json = json.dumps(characters, ensure_ascii=False, indent=2)
     if characters_text is not None:
         project.characters_text = characters_text
-    if chapters is not None:
-        project.chapters_json = json.dumps(chapters, ensure_ascii=False, indent=2)
     if append_logs:
-        existing = json.loads(project.agent_logs_json or "[]")
-        existing.extend(append_logs)
-        project.agent_logs_json = json.dumps(existing, ensure_ascii=False, indent=2)
+        append_agent_logs(db, project.id, append_logs, commit=False)
 
     project.updated_at = dt.datetime.now(dt.timezone.utc)
     db.add(project)
@@ -84,20 +81,42 @@ def upsert_source_document(
     return doc
 
 
-def upsert_chapter(db: Session, *, project_id: str, chapter_no: int, text: str) -> Chapter:
-    chapter = (
+def get_chapter(db: Session, project_id: str, chapter_no: int) -> Optional[Chapter]:
+    return (
         db.query(Chapter)
         .filter(Chapter.project_id == project_id)
         .filter(Chapter.chapter_no == chapter_no)
         .one_or_none()
     )
+
+
+def list_chapter_meta(db: Session, project_id: str) -> List[Dict[str, Any]]:
+    """Number, length, hash and update time of every chapter, without loading the texts."""
+    rows = db.execute(
+        select(Chapter.chapter_no, Chapter.char_count, Chapter.content_hash, Chapter.updated_at)
+        .where(Chapter.project_id == project_id)
+        .order_by(Chapter.chapter_no)
+    ).all()
+    return [
+        {"chapter_number": no, "length": count, "content_hash": digest, "updated_at": updated_at}
+        for no, count, digest, updated_at in rows
+    ]
+
+
+def upsert_chapter(db: Session, *, project_id: str, chapter_no: int, text: str) -> Chapter:
+    digest = content_hash(text)
+    chapter = get_chapter(db, project_id, chapter_no)
     if chapter is None:
-        chapter = Chapter(project_id=project_id, chapter_no=chapter_no, text=text)
+        chapter = Chapter(project_id=project_id, chapter_no=chapter_no, text=text, char_count=len(text), content_hash=digest)
         db.add(chapter)
         db.commit()
         db.refresh(chapter)
         return chapter
+    if chapter.content_hash == digest:
+        return chapter  # unchanged: no write, updated_at stays
     chapter.text = text
+    chapter.char_count = len(text)
+    chapter.content_hash = digest
     db.add(chapter)
     db.commit()
     db.refresh(chapter)
@@ -118,3 +137,59 @@ def add_chapter_memory(
     db.commit()
     db.refresh(mem)
     return mem
+
+
+def _log_row(project_id: str, log: Dict[str, Any], now: dt.datetime) -> Dict[str, Any]:
+    ts = log.get("ts")
+    if isinstance(ts, str):
+        try:
+            ts = dt.datetime.fromisoformat(ts)
+        except ValueError:
+            ts = None
+    preview = log.get("output_preview")
+    return {
+        "project_id": project_id,
+        "ts": ts if isinstance(ts, dt.datetime) else now,
+        "agent": str(log.get("agent") or ""),
+        "action": str(log.get("action") or ""),
+        "summary": str(log.get("summary") or ""),
+        "output_preview": None if preview is None else str(preview),
+    }
+
+
+def append_agent_logs(db: Session, project_id: str, logs: List[Dict[str, Any]], *, commit: bool = True) -> None:
+    """One multi-row INSERT; cost is independent of how many logs the project already has."""
+    if not logs:
+        return
+    now = dt.datetime.now(dt.timezone.utc)
+    db.execute(insert(AgentLogEntry), [_log_row(project_id, log, now) for log in logs])
+    if commit:
+        db.commit()
+
+
+def _log_dict(row: AgentLogEntry) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "ts": row.ts,
+        "agent": row.agent,
+        "action": row.action,
+        "summary": row.summary,
+        "output_preview": row.output_preview,
+    }
+
+
+def list_agent_logs(
+    db: Session, project_id: str, *, before_id: int | None = None, limit: int = 50
+) -> Tuple[List[Dict[str, Any]], int | None]:
+    """
+    Keyset page of a project's logs, newest page first: entries with id < before_id (or the
+    newest when None), returned oldest to newest. The second value is the cursor for the
+    next (older) page, None when this page reaches the first entry.
+    """
+    stmt = select(AgentLogEntry).where(AgentLogEntry.project_id == project_id)
+    if before_id is not None:
+        stmt = stmt.where(AgentLogEntry.id < before_id)
+    rows = db.execute(stmt.order_by(AgentLogEntry.id.desc()).limit(limit + 1)).scalars().all()
+    has_more = len(rows) > limit
+    rows = list(reversed(rows[:limit]))
+    return [_log_dict(r) for r in rows], (rows[0].id if has_more and rows else None)
@@ -1,35 +1,175 @@
+import json
+import uuid
+
 from app.db.base import Base
 from app.db.session import engine
+from rag.chunking import content_hash
+from rag.storage_base import get_chunk_storage
+from rag.storage_sqlite import EMBEDDINGS_CACHE_DDL
+from rag.vector_codec import pack_vector
 
+# DOUBLE PRECISION is REAL on SQLite and float8 (not float4) on PostgreSQL.
+# Cross-encoder scores; created_at is epoch seconds so TTL expiry is a plain range delete.
+_RERANK_CACHE_DDL = """
+CREATE TABLE IF NOT EXISTS rerank_cache (
+  cache_key TEXT PRIMARY KEY,
+  model_name TEXT NOT NULL,
+  score DOUBLE PRECISION NOT NULL,
+  created_at DOUBLE PRECISION NOT NULL
+);
+"""
 
-def init_db() -> None:
-    Base.metadata.create_all(bind=engine)
+# LLM completions (opt-in, see app/agents/llm_cache.py); evicted least-recently-used by total bytes.
+_LLM_CACHE_DDL = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+  cache_key TEXT PRIMARY KEY,
+  model_name TEXT NOT NULL,
+  agent TEXT NOT NULL,
+  response TEXT NOT NULL,
+  bytes INTEGER NOT NULL,
+  created_at DOUBLE PRECISION NOT NULL,
+  last_used_at DOUBLE PRECISION NOT NULL
+);
+"""
 
-    # SQLite FTS5 for keyword retrieval (hybrid RAG).
-    with engine.begin() as conn:
+
+def _migrate_embeddings_cache(conn) -> None:
+    """Convert a legacy `vector_json` embeddings_cache table to packed float32 BLOBs."""
+    cols = {r[1] for r in conn.exec_driver_sql("PRAGMA table_info(embeddings_cache)").fetchall()}
+    if "vector_json" not in cols:
+        return
+
+    conn.exec_driver_sql("ALTER TABLE embeddings_cache RENAME TO embeddings_cache_legacy")
+    conn.exec_driver_sql(EMBEDDINGS_CACHE_DDL)
+    result = conn.exec_driver_sql("SELECT cache_key, model_name, vector_json, created_at FROM embeddings_cache_legacy")
+    while True:
+        rows = result.fetchmany(500)
+        if not rows:
+            break
+        batch = []
+        for cache_key, model_name, vector_json, created_at in rows:
+            try:
+                vec = json.loads(vector_json)
+            except Exception:
+                continue
+            batch.append((cache_key, model_name, len(vec), "float32", pack_vector(vec, "float32"), created_at))
+        if batch:
+            conn.exec_driver_sql(
+                "INSERT OR REPLACE INTO embeddings_cache(cache_key, model_name, dim, dtype, vector_blob, created_at) VALUES(?,?,?,?,?,?)",
+                batch,
+            )
+    conn.exec_driver_sql("DROP TABLE embeddings_cache_legacy")
+
+
+def _migrate_rag_chunks(conn) -> None:
+    """Add and backfill rag_chunks.content_hash for databases created before incremental re-indexing."""
+    cols = {r[1] for r in conn.exec_driver_sql("PRAGMA table_info(rag_chunks)").fetchall()}
+    if not cols or "content_hash" in cols:
+        return
+
+    conn.exec_driver_sql("ALTER TABLE rag_chunks ADD COLUMN content_hash VARCHAR(64) DEFAULT ''")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_rag_chunks_content_hash ON rag_chunks (content_hash)")
+    rows = conn.exec_driver_sql("SELECT id, text FROM rag_chunks").fetchall()
+    if rows:
         conn.exec_driver_sql(
-            """
-            CREATE TABLE IF NOT EXISTS embeddings_cache (
-              cache_key TEXT PRIMARY KEY,
-              model_name TEXT NOT NULL,
-              vector_json TEXT NOT NULL,
-              created_at TEXT NOT NULL
-            );
-            """
+            "UPDATE rag_chunks SET content_hash = ? WHERE id = ?",
+            [(content_hash(text or ""), cid) for cid, text in rows],
         )
+
+
+def _migrate_agent_logs(conn) -> None:
+    """Move projects.agent_logs_json blobs into the agent_logs table, then drop the column."""
+    cols = {r[1] for r in conn.exec_driver_sql("PRAGMA table_info(projects)").fetchall()}
+    if "agent_logs_json" not in cols:
+        return
+
+    projects = conn.exec_driver_sql("SELECT id, agent_logs_json, updated_at FROM projects").fetchall()
+    for project_id, blob, updated_at in projects:
         try:
+            logs = json.loads(blob or "[]")
+        except Exception:
+            continue
+        # The blobs carry no timestamps; the project's last update is the closest we have.
+        rows = [
+            (
+                project_id,
+                updated_at,
+                str(log.get("agent") or ""),
+                str(log.get("action") or ""),
+                str(log.get("summary") or ""),
+                None if log.get("output_preview") is None else str(log.get("output_preview")),
+            )
+            for log in logs
+            if isinstance(log, dict)
+        ]
+        if rows:
             conn.exec_driver_sql(
-                """
-                CREATE VIRTUAL TABLE IF NOT EXISTS rag_chunks_fts
-                USING fts5(
-                  chunk_id UNINDEXED,
-                  project_id UNINDEXED,
-                  type UNINDEXED,
-                  chapter_no UNINDEXED,
-                  text
-                );
-                """
+                "INSERT INTO agent_logs(project_id, ts, agent, action, summary, output_preview) VALUES(?,?,?,?,?,?)",
+                rows,
             )
+    conn.exec_driver_sql("ALTER TABLE projects DROP COLUMN agent_logs_json")  # SQLite >= 3.35
+
+
+def _migrate_chapters(conn) -> None:
+    """
+    Make the chapters table the only copy of chapter text: add/backfill char_count and
+    content_hash, import chapters that only exist in projects.chapters_json, drop that column.
+    """
+    cols = {r[1] for r in conn.exec_driver_sql("PRAGMA table_info(chapters)").fetchall()}
+    if not cols:
+        return
+    if "char_count" not in cols:
+        conn.exec_driver_sql("ALTER TABLE chapters ADD COLUMN char_count INTEGER NOT NULL DEFAULT 0")
+    if "content_hash" not in cols:
+        conn.exec_driver_sql("ALTER TABLE chapters ADD COLUMN content_hash VARCHAR(64) NOT NULL DEFAULT ''")
+    stale = conn.exec_driver_sql("SELECT id, text FROM chapters WHERE content_hash = ''").fetchall()
+    if stale:
+        conn.exec_driver_sql(
+            "UPDATE chapters SET char_count = ?, content_hash = ? WHERE id = ?",
+            [(len(text or ""), content_hash(text or ""), chapter_id) for chapter_id, text in stale],
+        )
+
+    project_cols = {r[1] for r in conn.exec_driver_sql("PRAGMA table_info(projects)").fetchall()}
+    if "chapters_json" not in project_cols:
+        return
+    existing = {(p, n) for p, n in conn.exec_driver_sql("SELECT project_id, chapter_no FROM chapters").fetchall()}
+    rows = []
+    for project_id, blob, updated_at in conn.exec_driver_sql("SELECT id, chapters_json, updated_at FROM projects").fetchall():
+        try:
+            chapters = json.loads(blob or "{}")
         except Exception:
-            # Allow running on SQLite builds without FTS5; keyword retrieval will fall back.
-            pass
+            continue
+        for number, text in (chapters.items() if isinstance(chapters, dict) else []):
+            try:
+                chapter_no = int(number)
+            except (TypeError, ValueError):
+                continue
+            if (project_id, chapter_no) in existing or not isinstance(text, str):
+                continue
+            rows.append((str(uuid.uuid4()), project_id, chapter_no, text, len(text), content_hash(text), updated_at, updated_at))
+    if rows:
+        conn.exec_driver_sql(
+            "INSERT INTO chapters(id, project_id, chapter_no, text, char_count, content_hash, created_at, updated_at) "
+            "VALUES(?,?,?,?,?,?,?,?)",
+            rows,
+        )
+    conn.exec_driver_sql("ALTER TABLE projects DROP COLUMN chapters_json")  # SQLite >= 3.35
+
+
+def init_db() -> None:
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            # In-place upgrades of older SQLite files; PostgreSQL databases start at the current schema.
+            _migrate_rag_chunks(conn)
+            _migrate_embeddings_cache(conn)
+            _migrate_agent_logs(conn)
+            _migrate_chapters(conn)
+        # embeddings_cache, rag_index_generations and the keyword (SQLite FTS5 / PostgreSQL
+        # tsvector + pgvector) index for hybrid RAG.
+        get_chunk_storage(engine.dialect.name).init_schema(conn)
+        conn.exec_driver_sql(_RERANK_CACHE_DDL)
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_rerank_cache_created_at ON rerank_cache (created_at)")
+        conn.exec_driver_sql(_LLM_CACHE_DDL)
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used_at ON llm_cache (last_used_at)")
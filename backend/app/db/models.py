@@ -3,7 +3,7 @@ from __future__ import annotations
 import datetime as dt
 import uuid
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base import Base
@@ -24,8 +24,6 @@ class Project(Base):
     outline: Mapped[str] = mapped_column(Text, default="")
     characters_json: Mapped[str] = mapped_column(Text, default="{}")
     characters_text: Mapped[str] = mapped_column(Text, default="")
-    chapters_json: Mapped[str] = mapped_column(Text, default="{}")
-    agent_logs_json: Mapped[str] = mapped_column(Text, default="[]")
 
     created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=lambda: dt.datetime.now(dt.timezone.utc))
     updated_at: Mapped[dt.datetime] = mapped_column(
@@ -35,6 +33,21 @@ class Project(Base):
     )
 
 
+class AgentLogEntry(Base):
+    """Append-only agent/RAG log; `id` increases with insertion order and is the paging cursor."""
+
+    __tablename__ = "agent_logs"
+    __table_args__ = (Index("ix_agent_logs_project_id_id", "project_id", "id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    project_id: Mapped[str] = mapped_column(String(36))
+    ts: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=lambda: dt.datetime.now(dt.timezone.utc))
+    agent: Mapped[str] = mapped_column(String(100), default="")
+    action: Mapped[str] = mapped_column(String(100), default="")
+    summary: Mapped[str] = mapped_column(Text, default="")
+    output_preview: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+
 class SourceDocument(Base):
     __tablename__ = "source_documents"
 
@@ -54,6 +67,9 @@ class Chapter(Base):
     project_id: Mapped[str] = mapped_column(String(36), index=True)
     chapter_no: Mapped[int] = mapped_column(Integer, index=True)
     text: Mapped[str] = mapped_column(Text, default="")
+    # Kept in sync by crud.upsert_chapter so chapter listings never have to load `text`.
+    char_count: Mapped[int] = mapped_column(Integer, default=0)
+    content_hash: Mapped[str] = mapped_column(String(64), default="")  # sha256(text)
     created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=lambda: dt.datetime.now(dt.timezone.utc))
     updated_at: Mapped[dt.datetime] = mapped_column(
         DateTime(timezone=True),
@@ -90,4 +106,5 @@ class RagChunk(Base):
 
     text: Mapped[str] = mapped_column(Text, default="")
     snippet: Mapped[str] = mapped_column(Text, default="")
+    content_hash: Mapped[str] = mapped_column(String(64), default="", index=True)  # sha256(text)
     metadata_json: Mapped[str] = mapped_column(Text, default="{}")
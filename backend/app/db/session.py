@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import os
+from typing import Any
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Delete, Insert, TextClause, Update, create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
 
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER")
+
 
 def _sqlite_url(db_path: str) -> str:
     # Ensure directory exists (esp. for Docker volume mount).
@@ -14,12 +18,136 @@ def _sqlite_url(db_path: str) -> str:
     return f"sqlite:///{db_path}"
 
 
-engine = create_engine(
-    _sqlite_url(settings.db_path),
-    connect_args={"check_same_thread": False},
-)
+def _production_profile() -> bool:
+    return str(getattr(settings, "sqlite_profile", "production")).lower() == "production"
+
+
+def _set_pragmas(engine: Engine, *, query_only: bool) -> None:
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record) -> None:
+        cur = dbapi_conn.cursor()
+        try:
+            if not query_only:
+                cur.execute("PRAGMA journal_mode=WAL")  # persistent in the file; readers inherit it
+            cur.execute(f"PRAGMA busy_timeout={int(getattr(settings, 'sqlite_busy_timeout_ms', 5000))}")
+            cur.execute(f"PRAGMA synchronous={str(getattr(settings, 'sqlite_synchronous', 'NORMAL')).upper()}")
+            cur.execute(f"PRAGMA mmap_size={int(getattr(settings, 'sqlite_mmap_size', 256 * 1024 * 1024))}")
+            cur.execute(f"PRAGMA cache_size=-{int(getattr(settings, 'sqlite_cache_size_kib', 64 * 1024))}")
+            cur.execute("PRAGMA temp_store=MEMORY")
+            if query_only:
+                cur.execute("PRAGMA query_only=ON")
+        finally:
+            cur.close()
+
+
+def _create_postgres_engine(url: str) -> Engine:
+    # MVCC: readers and writers do not block each other, so one pool serves both. As with the
+    # SQLite reader pool, overflow is uncapped by default because the pipeline nests sessions;
+    # the worker threads bound the connection count in practice.
+    pg = create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_size=int(getattr(settings, "pg_pool_size", 10)),
+        max_overflow=int(getattr(settings, "pg_max_overflow", -1)),
+    )
+
+    @event.listens_for(pg, "connect")
+    def _on_connect(dbapi_conn, _record) -> None:
+        cur = dbapi_conn.cursor()
+        try:
+            cur.execute(f"SET hnsw.ef_search = {int(getattr(settings, 'pg_hnsw_ef_search', 100))}")
+        finally:
+            cur.close()
+        dbapi_conn.commit()
+
+    return pg
+
+
+def _create_engines() -> tuple[Engine, Engine]:
+    database_url = str(getattr(settings, "database_url", "") or "")
+    if database_url and not database_url.startswith("sqlite"):
+        pg = _create_postgres_engine(database_url)
+        return pg, pg
+
+    url = database_url or _sqlite_url(settings.db_path)
+    if not _production_profile():
+        plain = create_engine(url, connect_args={"check_same_thread": False})
+        return plain, plain
+
+    busy_s = int(getattr(settings, "sqlite_busy_timeout_ms", 5000)) / 1000.0
+    # One connection: writers queue on the pool (FIFO) instead of racing for SQLite's lock, so a
+    # read-then-write transaction can never hit SQLITE_BUSY on lock upgrade.
+    writer = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": busy_s},
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=float(getattr(settings, "sqlite_write_wait_s", 60.0)),
+    )
+    # With WAL, readers see the last committed snapshot and never wait for the writer. Sessions
+    # keep their connection until they end and the pipeline nests them, so the pool must not cap
+    # readers (a cap deadlocks under load); connections beyond pool_size are closed on return.
+    reader = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": busy_s},
+        pool_size=max(1, int(getattr(settings, "sqlite_read_pool_size", 8))),
+        max_overflow=-1,
+    )
+    _set_pragmas(writer, query_only=False)
+    _set_pragmas(reader, query_only=True)
+    return writer, reader
+
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# `engine` is the writer (and the only engine under the default profile and on PostgreSQL);
+# `read_engine` serves plain reads. Code that writes through `engine` directly (caches, migrations) is unaffected.
+engine, read_engine = _create_engines()
+
+
+def _is_write(clause: Any) -> bool:
+    if isinstance(clause, (Insert, Update, Delete)):
+        return True
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip().upper().startswith(_WRITE_PREFIXES)
+    return False
+
+
+class RoutingSession(Session):
+    """
+    Reads go to `read_engine`; flushes and DML go to the writer. Once a transaction has
+    written, the rest of it stays on the writer so it reads its own uncommitted rows.
+    """
+
+    _writing = False
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        if self._writing or self._flushing or _is_write(clause):
+            self._writing = True
+            return engine
+        return read_engine
+
+    def commit(self) -> None:
+        try:
+            super().commit()
+        finally:
+            self._writing = False
+
+    def rollback(self) -> None:
+        try:
+            super().rollback()
+        finally:
+            self._writing = False
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._writing = False
+
+
+if read_engine is engine:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+else:
+    SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
 
 
 def get_db():
@@ -28,4 +156,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import datetime as dt
+import uuid
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.db import crud
+from app.db.models import Chapter, ChapterMemory, Project
+from rag.chunking import content_hash
+
+_Write = Callable[[Session], None]
+_AfterCommit = Callable[[], None]
+
+
+class UnitOfWork:
+    """
+    Writes of one pipeline request, buffered in memory and applied by flush() in a single
+    transaction. Nothing is added to the session before that, so no SQLite write lock is
+    held across LLM calls. Rows get their ids when staged, so later steps can reference
+    them (RAG source_id) before they exist. After-commit actions (vector-store upserts) run
+    once the commit succeeded and handle their own failures; anything they still raise is
+    recorded in after_commit_errors rather than propagated.
+    """
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+        self._chapters: Dict[Tuple[str, int], Chapter] = {}
+        self._rows: List[Any] = []
+        self._logs: Dict[str, List[Dict[str, Any]]] = {}
+        self._writes: Dict[Hashable, Tuple[_Write, Optional[_AfterCommit]]] = {}
+        self._touched: Set[str] = set()
+        self.flushes = 0
+        self.after_commit_errors: List[str] = []
+
+    def chapter(self, project_id: str, chapter_no: int, text: str) -> Chapter:
+        """Staged upsert of a chapter; returns a transient row carrying the final id and text."""
+        now = dt.datetime.now(dt.timezone.utc)
+        digest = content_hash(text)
+        staged = self._chapters.get((project_id, chapter_no))
+        if staged is None:
+            row = self.db.execute(
+                select(Chapter.id, Chapter.content_hash, Chapter.created_at, Chapter.updated_at)
+                .where(Chapter.project_id == project_id)
+                .where(Chapter.chapter_no == chapter_no)
+            ).first()
+            staged = Chapter(
+                id=row.id if row else str(uuid.uuid4()),
+                project_id=project_id,
+                chapter_no=chapter_no,
+                text=text,
+                char_count=len(text),
+                content_hash=digest,
+                created_at=row.created_at if row else now,
+                updated_at=row.updated_at if row else now,
+            )
+            if row is not None and row.content_hash == digest:
+                return staged  # unchanged: nothing to write
+            self._chapters[(project_id, chapter_no)] = staged
+        elif staged.content_hash == digest:
+            return staged
+        staged.text = text
+        staged.char_count = len(text)
+        staged.content_hash = digest
+        staged.updated_at = now
+        self._touched.add(project_id)
+        return staged
+
+    def chapter_memory(
+        self, *, project_id: str, chapter_id: str, chapter_no: int, type: str, text: str
+    ) -> ChapterMemory:
+        mem = ChapterMemory(
+            id=str(uuid.uuid4()),
+            project_id=project_id,
+            chapter_id=chapter_id,
+            chapter_no=chapter_no,
+            type=type,
+            text=text,
+            created_at=dt.datetime.now(dt.timezone.utc),
+        )
+        self._rows.append(mem)
+        return mem
+
+    def append_logs(self, project_id: str, logs: List[Dict[str, Any]]) -> None:
+        if logs:
+            self._logs.setdefault(project_id, []).extend(logs)
+            self._touched.add(project_id)
+
+    def stage(self, key: Hashable, *, write: _Write, after_commit: Optional[_AfterCommit] = None) -> None:
+        """Deferred write; staging the same key again replaces the earlier, unflushed one."""
+        self._writes[key] = (write, after_commit)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._chapters or self._rows or self._logs or self._writes)
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        after_commit = [after for _, after in self._writes.values() if after is not None]
+        try:
+            for chapter in self._chapters.values():
+                self.db.merge(chapter)
+            self.db.add_all(self._rows)
+            for write, _ in self._writes.values():
+                write(self.db)
+            for project_id, logs in self._logs.items():
+                crud.append_agent_logs(self.db, project_id, logs, commit=False)
+            if self._touched:
+                self.db.execute(
+                    update(Project)
+                    .where(Project.id.in_(self._touched))
+                    .values(updated_at=dt.datetime.now(dt.timezone.utc))
+                    .execution_options(synchronize_session=False)
+                )
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            self._chapters.clear()
+            self._rows.clear()
+            self._logs.clear()
+            self._writes.clear()
+            self._touched.clear()
+        self.flushes += 1
+        # The commit stands whatever happens here; one failing action must not skip the rest.
+        for action in after_commit:
+            try:
+                action()
+            except Exception as e:
+                self.after_commit_errors.append(f"{type(e).__name__}: {e}")
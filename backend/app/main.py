@@ -1,9 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from app.agents.llm import llm_scheduler
+from app.agents.llm_cache import llm_completion_cache
+from app.api.middleware import LLMCacheBypassMiddleware, RAGNotesMiddleware
 from app.api.router import api_router
 from app.core.config import settings
 from app.db.init_db import init_db
+from rag.model_registry import model_registry
 
 
 def create_app() -> FastAPI:
@@ -16,12 +21,27 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(LLMCacheBypassMiddleware)
+    app.add_middleware(RAGNotesMiddleware)
     app.include_router(api_router)
 
+    if getattr(settings, "rag_warmup_models", False):
+        # Load embedder/reranker off the request path; /readyz reports 503 until done.
+        model_registry.warm_up_in_background()
+
     @app.get("/healthz")
     def healthz():
         return {"ok": True}
 
+    @app.get("/readyz")
+    def readyz():
+        status = model_registry.status()
+        return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+    @app.get("/llm/stats")
+    def llm_stats():
+        return {"scheduler": llm_scheduler.stats(), "completion_cache": llm_completion_cache.stats()}
+
     return app
 
 
@@ -14,6 +14,16 @@ class AgentLog(BaseModel):
     output_preview: str | None = None
 
 
+class AgentLogRecord(AgentLog):
+    id: int
+
+
+class AgentLogPage(BaseModel):
+    # Oldest to newest within the page; pass next_cursor as ?cursor= for the older page.
+    items: List[AgentLogRecord]
+    next_cursor: int | None = None
+
+
 class APIError(BaseModel):
     code: str
     message: str
@@ -35,6 +45,17 @@ class ProjectCreateRequest(BaseModel):
     target_chapters: PositiveInt = Field(default=10, le=200)
 
 
+class ChapterMeta(BaseModel):
+    chapter_number: int
+    length: int  # characters
+    content_hash: str  # sha256 of the text
+    updated_at: dt.datetime
+
+
+class ChapterContent(ChapterMeta):
+    text: str
+
+
 class ProjectState(BaseModel):
     id: str
     genre: str
@@ -46,7 +67,7 @@ class ProjectState(BaseModel):
     outline: str
     characters: Dict[str, Any]
     characters_text: str
-    chapters: Dict[str, str]
+    chapters: Dict[str, ChapterMeta]  # keyed by chapter number; bodies via GET /projects/{id}/chapters/{n}
     created_at: dt.datetime
     updated_at: dt.datetime
 
@@ -107,3 +128,5 @@ class RagPreviewResponse(BaseModel):
     final_selected: List[RetrievedChunkSummary]
     final_selected_grouped: Dict[str, List[RetrievedChunkSummary]] = {}
     context_string: str
+    rerank_scores: Dict[str, float] = {}
+    timings_ms: Dict[str, float | None] = {}
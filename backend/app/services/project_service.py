@@ -1,18 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from typing import Any, Dict, List, Tuple
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Tuple, TypeVar
 
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.orm import Session
 
 from app.agents.coordinator import Coordinator
 from app.agents.consistency_critic_agent import ConsistencyCriticAgent
 from app.db import crud
-from app.db.models import Project
+from app.db.models import Chapter, Project
+from app.db.unit_of_work import UnitOfWork
 from app.schemas import CriticIssue, RetrievedChunkSummary
 from app.services.writeback_extractor import WritebackExtractor
 from rag.service import RAGService
-from rag.types import Chunk
+from rag.types import Chunk, RetrievalTrace
 
 
 def _safe_json_loads(s: str, default):
@@ -30,6 +34,45 @@ def _extract_character_names(characters_obj: Dict[str, Any]) -> List[str]:
     return names
 
 
+def _fmt_ms(ms: float | None) -> str:
+    return "timeout" if ms is None else f"{ms:.0f}ms"
+
+
+def _fmt_stages(stages: Dict[str, Any]) -> str:
+    # candidates -> rule prefilter -> cross-encoder
+    if not stages:
+        return "-"
+    out = f"{stages.get('candidates', 0)}→{stages.get('prefiltered', 0)}→{stages.get('cross_encoder', 0)}"
+    if stages.get("score_cache_hits"):
+        out += f" cached={stages['score_cache_hits']}"
+    return out
+
+
+M = TypeVar("M")
+
+
+def _detached(obj: M) -> M:
+    """Transient copy of a loaded ORM row, safe to read while the session is used elsewhere."""
+    mapper = sa_inspect(type(obj))
+    return type(obj)(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+
+
+@dataclass
+class _ExpandState:
+    chapter_number: int
+    names: List[str]
+    retrieved: List[Chunk]
+    context_with_instruction: str
+    fallback_logs: List[Dict[str, Any]]
+    rag_log: Dict[str, Any]
+    index_stats: Dict[str, Any] = field(default_factory=dict)
+    index_log: Dict[str, Any] = field(default_factory=dict)
+    extract_logs: List[Dict[str, Any]] = field(default_factory=list)
+    mem_logs: List[Dict[str, Any]] = field(default_factory=list)
+    # Request-scoped writes, flushed twice: once the chapter is written and indexed, and at the end.
+    uow: UnitOfWork | None = None
+
+
 class ProjectService:
     def __init__(self) -> None:
         self.coordinator = Coordinator()
@@ -115,8 +158,9 @@ class ProjectService:
         project = crud.update_project_artifacts(db, project, append_logs=logs)
         return project, logs
 
-    def generate_outline(self, db: Session, project: Project, *, theme: str, total_words: int) -> Tuple[Project, List[Dict[str, Any]]]:
-        project, logs = self.coordinator.generate_outline(db, project, theme=theme, total_words=total_words)
+    # ---- outline / characters ------------------------------------------
+
+    def _index_outline(self, db: Session, project: Project, logs: List[Dict[str, Any]]) -> Tuple[Project, List[Dict[str, Any]]]:
         doc = crud.upsert_source_document(
             db,
             project_id=project.id,
@@ -133,14 +177,19 @@ class ProjectService:
             project = crud.update_project_artifacts(db, project, append_logs=fallback_logs)
         return project, [*logs, rag_log, *fallback_logs]
 
-    def generate_characters(
-        self,
-        db: Session,
-        project: Project,
-        *,
-        constraints: str,
+    def generate_outline(self, db: Session, project: Project, *, theme: str, total_words: int) -> Tuple[Project, List[Dict[str, Any]]]:
+        project, logs = self.coordinator.generate_outline(db, project, theme=theme, total_words=total_words)
+        return self._index_outline(db, project, logs)
+
+    async def agenerate_outline(
+        self, db: Session, project: Project, *, theme: str, total_words: int
+    ) -> Tuple[Project, List[Dict[str, Any]]]:
+        project, logs = await self.coordinator.agenerate_outline(db, project, theme=theme, total_words=total_words)
+        return await asyncio.to_thread(self._index_outline, db, project, logs)
+
+    def _index_characters(
+        self, db: Session, project: Project, logs: List[Dict[str, Any]]
     ) -> Tuple[Project, List[Dict[str, Any]]]:
-        project, logs = self.coordinator.generate_characters(db, project, constraints=constraints)
         characters_obj = _safe_json_loads(project.characters_json, {})
         names = _extract_character_names(characters_obj)
         combined_text = f"角色设定 JSON：\n{project.characters_json}\n\n角色总结：\n{project.characters_text}"
@@ -165,19 +214,40 @@ class ProjectService:
             project = crud.update_project_artifacts(db, project, append_logs=fallback_logs)
         return project, [*logs, rag_log, *fallback_logs]
 
-    def expand_chapter(
+    def generate_characters(
         self,
         db: Session,
         project: Project,
         *,
-        chapter_number: int,
-        instruction: str,
-        target_words: int,
-    ) -> Tuple[Project, Dict[str, Any], List[Dict[str, Any]]]:
-        # Retrieve first (hybrid RAG), then write.
+        constraints: str,
+    ) -> Tuple[Project, List[Dict[str, Any]]]:
+        project, logs = self.coordinator.generate_characters(db, project, constraints=constraints)
+        return self._index_characters(db, project, logs)
+
+    async def agenerate_characters(
+        self,
+        db: Session,
+        project: Project,
+        *,
+        constraints: str,
+    ) -> Tuple[Project, List[Dict[str, Any]]]:
+        project, logs = await self.coordinator.agenerate_characters(db, project, constraints=constraints)
+        return await asyncio.to_thread(self._index_characters, db, project, logs)
+
+    # ---- chapter expansion ---------------------------------------------
+    #
+    # expand_chapter / aexpand_chapter share these steps:
+    #   retrieve -> write -> store + index chapter -> extract -> store + index memories
+    #                                              \-> critic ------------------------> finish
+    # The async path runs extraction and the critic concurrently (both only need the chapter
+    # text) and stages the extracted memories while the critic is still running; they are
+    # committed and indexed with the critic's result in _finish_chapter.
+
+    def _retrieve_for_chapter(self, project: Project, *, chapter_number: int, instruction: str) -> _ExpandState:
         query = f"第{chapter_number}章 扩写：{instruction}".strip()
         characters_obj = _safe_json_loads(project.characters_json, {})
         names = _extract_character_names(characters_obj)
+        trace = RetrievalTrace()
         retrieved = self.rag.retrieve(
             project.id,
             query,
@@ -196,6 +266,7 @@ class ProjectService:
                 "chapter_only_before": True,
             },
             top_k=18,
+            trace=trace,
         )
         fallback_logs = [{"agent": "RAG", "action": "fallback", "summary": note, "output_preview": None} for note in self.rag.pop_notes()]
         context = self.rag.build_context(
@@ -208,19 +279,33 @@ class ProjectService:
             retrieved,
         )
         context_with_instruction = (context + "\n\n## user instruction\n" + (instruction or "")).strip()
-
-        project, writer_data, writer_logs = self.coordinator.expand_chapter(
-            db,
-            project,
+        rag_log = {
+            "agent": "RAG",
+            "action": "retrieve",
+            "summary": (
+                f"扩写前检索到 {len(retrieved)} 条上下文"
+                f"（vector={_fmt_ms(trace.timings_ms.get('vector_ms'))} keyword={_fmt_ms(trace.timings_ms.get('keyword_ms'))}"
+                f" rerank={_fmt_stages(trace.rerank_stages)}）"
+            ),
+            "output_preview": context[:400],
+        }
+        return _ExpandState(
             chapter_number=chapter_number,
-            instruction=f"【请严格遵守以下检索到的上下文】\n\n{context_with_instruction}",
-            target_words=target_words,
+            names=names,
+            retrieved=retrieved,
+            context_with_instruction=context_with_instruction,
+            fallback_logs=fallback_logs,
+            rag_log=rag_log,
         )
 
+    def _writer_instruction(self, state: _ExpandState) -> str:
+        return f"【请严格遵守以下检索到的上下文】\n\n{state.context_with_instruction}"
+
+    def _store_chapter(self, db: Session, project: Project, state: _ExpandState, text: str) -> Chapter:
         # Save chapter into normalized table for traceable source_id
-        chapter = crud.upsert_chapter(db, project_id=project.id, chapter_no=chapter_number, text=writer_data["text"])
+        chapter = state.uow.chapter(project.id, state.chapter_number, text)
         # Index chapter text
-        self.rag.index_document(
+        index_stats = self.rag.index_document(
             project.id,
             "chapter",
             chapter.text,
@@ -228,56 +313,78 @@ class ProjectService:
                 "source_id": chapter.id,
                 "project_id": project.id,
                 "type": "chapter",
-                "chapter_no": chapter_number,
-                "characters": ",".join(names),
+                "chapter_no": state.chapter_number,
+                "characters": ",".join(state.names),
             },
+            uow=state.uow,
         )
+        # First transaction: chapter row, writer logs and chapter chunks, so the (expensive) text
+        # is durable before the extractor and critic run.
+        state.uow.flush()
+        state.index_stats = index_stats
+        state.index_log = {
+            "agent": "RAG",
+            "action": "index",
+            "summary": (
+                f"已索引 chapter #{state.chapter_number}（kept={index_stats.get('kept', 0)} "
+                f"added={index_stats.get('added', 0)} removed={index_stats.get('removed', 0)}）"
+            ),
+            "output_preview": chapter.text[:240],
+        }
+        return chapter
 
-        rag_log = {"agent": "RAG", "action": "retrieve", "summary": f"扩写前检索到 {len(retrieved)} 条上下文", "output_preview": context[:400]}
-        index_log = {"agent": "RAG", "action": "index", "summary": f"已索引 chapter #{chapter_number}", "output_preview": chapter.text[:240]}
-
-        # Post-write extraction: summary / facts / foreshadowing
-        extracted, extract_logs = self.extractor.extract(project=project, chapter_no=chapter_number, chapter_text=chapter.text)
-        mem_logs: List[Dict[str, Any]] = []
+    def _store_memories(self, db: Session, project_id: str, chapter: Chapter, state: _ExpandState, extracted: Dict[str, str]) -> None:
         for mem_type, mem_text in extracted.items():
-            mem = crud.add_chapter_memory(
-                db,
-                project_id=project.id,
+            mem = state.uow.chapter_memory(
+                project_id=project_id,
                 chapter_id=chapter.id,
-                chapter_no=chapter_number,
+                chapter_no=state.chapter_number,
                 type=mem_type,
                 text=mem_text,
             )
             self.rag.index_document(
-                project.id,
+                project_id,
                 mem_type,
                 mem_text,
                 {
                     "source_id": mem.id,
-                    "project_id": project.id,
+                    "project_id": project_id,
                     "type": mem_type,
-                    "chapter_no": chapter_number,
-                    "characters": ",".join(names),
+                    "chapter_no": state.chapter_number,
+                    "characters": ",".join(state.names),
                 },
+                uow=state.uow,
+            )
+            state.mem_logs.append(
+                {"agent": "RAG", "action": "index", "summary": f"已索引 {mem_type}（第{state.chapter_number}章）", "output_preview": mem_text[:240]}
             )
-            mem_logs.append({"agent": "RAG", "action": "index", "summary": f"已索引 {mem_type}（第{chapter_number}章）", "output_preview": mem_text[:240]})
 
+    def _critic_kwargs(self, project: Project, chapter: Chapter, state: _ExpandState) -> Dict[str, Any]:
         # Critic: check consistency using key constraint types
-        constraint_chunks = [c for c in retrieved if c.type in {"characters", "world", "facts", "outline"}]
-        critic = self.critic.review(
-            project=project,
-            chapter_no=chapter_number,
-            draft_text=chapter.text,
-            constraints=constraint_chunks,
-            context_used=context_with_instruction,
-        )
+        return {
+            "project": project,
+            "chapter_no": state.chapter_number,
+            "draft_text": chapter.text,
+            "constraints": [c for c in state.retrieved if c.type in {"characters", "world", "facts", "outline"}],
+            "context_used": state.context_with_instruction,
+        }
 
+    def _finish_chapter(
+        self,
+        db: Session,
+        project: Project,
+        chapter: Chapter,
+        state: _ExpandState,
+        critic: Dict[str, Any],
+        writer_logs: List[Dict[str, Any]],
+    ) -> Tuple[Project, Dict[str, Any], List[Dict[str, Any]]]:
+        chapter_number = state.chapter_number
         revised = False
         final_text = chapter.text
         if critic.get("revised_text"):
             revised = True
             final_text = str(critic["revised_text"])
-            chapter = crud.upsert_chapter(db, project_id=project.id, chapter_no=chapter_number, text=final_text)
+            chapter = state.uow.chapter(project.id, chapter_number, final_text)
             self.rag.index_document(
                 project.id,
                 "chapter",
@@ -287,23 +394,33 @@ class ProjectService:
                     "project_id": project.id,
                     "type": "chapter",
                     "chapter_no": chapter_number,
-                    "characters": ",".join(names),
+                    "characters": ",".join(state.names),
                 },
+                uow=state.uow,
             )
-            chapters = _safe_json_loads(project.chapters_json, {})
-            chapters[str(chapter_number)] = final_text
-            project = crud.update_project_artifacts(db, project, chapters=chapters)
 
         critic_log = {
             "agent": "ConsistencyCriticAgent",
             "action": "review",
-            "summary": f"一致性审查：issues={len(critic.get('issues') or [])} revised={revised}",
+            "summary": f"一致性审查：issues={len(critic.get('issues') or [])} revised={revised}{critic.get('llm_cache') or ''}",
             "output_preview": json.dumps(critic.get("issues") or [], ensure_ascii=False)[:500],
         }
 
-        project = crud.update_project_artifacts(
-            db, project, append_logs=[*fallback_logs, rag_log, index_log, *extract_logs, *mem_logs, critic_log]
-        )
+        # e.g. a vector upsert rolled back after the first flush
+        notes = [*self.rag.pop_notes(), *(f"After-commit step failed: {err}" for err in state.uow.after_commit_errors)]
+        vector_logs = [{"agent": "RAG", "action": "fallback", "summary": note, "output_preview": None} for note in notes]
+        step_logs = [
+            *state.fallback_logs,
+            state.rag_log,
+            state.index_log,
+            *state.extract_logs,
+            *state.mem_logs,
+            *vector_logs,
+            critic_log,
+        ]
+        state.uow.append_logs(project.id, step_logs)
+        # Second transaction: memories, their chunks, the critic's revision and the step logs.
+        state.uow.flush()
 
         sources = [
             RetrievedChunkSummary(
@@ -315,13 +432,14 @@ class ProjectService:
                 source_id=(c.metadata.get("source_id") if isinstance(c.metadata, dict) else None),
                 snippet=c.snippet,
             ).model_dump()
-            for c in retrieved
+            for c in state.retrieved
         ]
         issues = [
             CriticIssue(**i).model_dump()
             for i in (critic.get("issues") or [])
             if isinstance(i, dict) and {"issue_type", "severity", "conflict"} <= set(i.keys())
         ]
+        context_with_instruction = state.context_with_instruction
         rag_info = {
             "context_used": (context_with_instruction[:4000] + ("…" if len(context_with_instruction) > 4000 else "")),
             "retrieved_context_sources": sources,
@@ -330,5 +448,133 @@ class ProjectService:
         }
 
         data = {"chapter_number": chapter_number, "text": final_text, **rag_info}
-        logs = [*writer_logs, *fallback_logs, rag_log, index_log, *extract_logs, *mem_logs, critic_log]
-        return project, data, logs
+        return project, data, [*writer_logs, *step_logs]
+
+    def expand_chapter(
+        self,
+        db: Session,
+        project: Project,
+        *,
+        chapter_number: int,
+        instruction: str,
+        target_words: int,
+    ) -> Tuple[Project, Dict[str, Any], List[Dict[str, Any]]]:
+        # Retrieve first (hybrid RAG), then write.
+        state = self._retrieve_for_chapter(project, chapter_number=chapter_number, instruction=instruction)
+        state.uow = UnitOfWork(db)
+        project, writer_data, writer_logs = self.coordinator.expand_chapter(
+            db,
+            project,
+            chapter_number=chapter_number,
+            instruction=self._writer_instruction(state),
+            target_words=target_words,
+            uow=state.uow,
+        )
+        chapter = self._store_chapter(db, project, state, writer_data["text"])
+
+        # Post-write extraction: summary / facts / foreshadowing
+        extracted, state.extract_logs = self.extractor.extract(project=project, chapter_no=chapter_number, chapter_text=chapter.text)
+        self._store_memories(db, project.id, chapter, state, extracted)
+
+        critic = self.critic.review(**self._critic_kwargs(project, chapter, state))
+        return self._finish_chapter(db, project, chapter, state, critic, writer_logs)
+
+    async def aexpand_chapter(
+        self,
+        db: Session,
+        project: Project,
+        *,
+        chapter_number: int,
+        instruction: str,
+        target_words: int,
+    ) -> Tuple[Project, Dict[str, Any], List[Dict[str, Any]]]:
+        state = await asyncio.to_thread(
+            self._retrieve_for_chapter, project, chapter_number=chapter_number, instruction=instruction
+        )
+        state.uow = UnitOfWork(db)
+        project, writer_data, writer_logs = await self.coordinator.aexpand_chapter(
+            db,
+            project,
+            chapter_number=chapter_number,
+            instruction=self._writer_instruction(state),
+            target_words=target_words,
+            uow=state.uow,
+        )
+        chapter = await asyncio.to_thread(self._store_chapter, db, project, state, writer_data["text"])
+        critic: Dict[str, Any] = {}
+        async for stage, value in self._aextract_and_review(db, project, chapter, state):
+            if stage == "critic":
+                critic = value
+        return await asyncio.to_thread(self._finish_chapter, db, project, chapter, state, critic, writer_logs)
+
+    async def _aextract_and_review(
+        self, db: Session, project: Project, chapter: Chapter, state: _ExpandState
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Yields ("extracted", memories) once they are staged on state.uow (committed and indexed by
+        _finish_chapter's flush, not yet), then ("critic", review).
+        """
+        # The agents get detached copies: the session is busy in worker threads meanwhile, and
+        # its commits expire the attached instances.
+        snapshot, chapter_snapshot = _detached(project), _detached(chapter)
+        critic_task = asyncio.create_task(self.critic.areview(**self._critic_kwargs(snapshot, chapter_snapshot, state)))
+        try:
+            extracted, state.extract_logs = await self.extractor.aextract(
+                project=snapshot, chapter_no=state.chapter_number, chapter_text=chapter_snapshot.text
+            )
+            await asyncio.to_thread(self._store_memories, db, snapshot.id, chapter_snapshot, state, extracted)
+            yield "extracted", extracted
+            yield "critic", await critic_task
+        finally:
+            if not critic_task.done():
+                critic_task.cancel()
+
+    async def astream_expand_chapter(
+        self,
+        db: Session,
+        project: Project,
+        *,
+        chapter_number: int,
+        instruction: str,
+        target_words: int,
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Same pipeline as aexpand_chapter, as (event, payload) pairs: `token` per writer chunk,
+        then `indexed`, `extracted` (memories extracted; they are stored and indexed together with
+        the critic's result), `critic` as those stages finish, and finally `done` with the
+        regular response data and logs.
+        """
+        state = await asyncio.to_thread(
+            self._retrieve_for_chapter, project, chapter_number=chapter_number, instruction=instruction
+        )
+        pieces: List[str] = []
+        async for chunk in self.coordinator.astream_chapter(
+            project,
+            chapter_number=chapter_number,
+            instruction=self._writer_instruction(state),
+            target_words=target_words,
+        ):
+            pieces.append(chunk)
+            yield "token", {"text": chunk}
+
+        state.uow = UnitOfWork(db)
+        project, writer_data, writer_logs = await self.coordinator.asave_streamed_chapter(
+            db, project, chapter_number=chapter_number, text="".join(pieces), uow=state.uow
+        )
+        chapter = await asyncio.to_thread(self._store_chapter, db, project, state, writer_data["text"])
+        yield "indexed", {"chapter_number": chapter_number, "chars": len(chapter.text), **state.index_stats}
+
+        critic: Dict[str, Any] = {}
+        async for stage, value in self._aextract_and_review(db, project, chapter, state):
+            if stage == "extracted":
+                yield "extracted", {"chapter_number": chapter_number, "memories": value}
+            else:
+                critic = value
+        project, data, logs = await asyncio.to_thread(self._finish_chapter, db, project, chapter, state, critic, writer_logs)
+        yield "critic", {
+            "chapter_number": chapter_number,
+            "issues": data["critic_issues"],
+            "revised": data["revised"],
+            "text": data["text"] if data["revised"] else None,
+        }
+        yield "done", {"data": data, "agent_logs": logs}
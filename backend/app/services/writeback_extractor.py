@@ -4,18 +4,31 @@ import json
 from typing import Any, Dict, List, Tuple
 
 from app.agents.llm import get_llm_client
+from app.agents.llm_cache import with_cache_note
 from app.db.models import Project
 
 
 class WritebackExtractor:
     name = "WritebackExtractor"
+    cache_name = "extractor"  # LLM_CACHE_AGENTS entry
 
     def extract(self, *, project: Project, chapter_no: int, chapter_text: str) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
         """
         Returns dict: {chapter_summary, facts, foreshadowing} as strings (facts/foreshadowing are JSON strings).
         Must be runnable without a real LLM (get_llm_client() handles MOCK_LLM).
         """
-        llm = get_llm_client()
+        system, prompt = self._messages(project=project, chapter_no=chapter_no, chapter_text=chapter_text)
+        llm = get_llm_client(self.cache_name)
+        extracted, logs = self._parse(llm.complete(system=system, prompt=prompt), chapter_no)
+        return extracted, with_cache_note(logs, llm)
+
+    async def aextract(self, *, project: Project, chapter_no: int, chapter_text: str) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+        system, prompt = self._messages(project=project, chapter_no=chapter_no, chapter_text=chapter_text)
+        llm = get_llm_client(self.cache_name)
+        extracted, logs = self._parse(await llm.acomplete(system=system, prompt=prompt), chapter_no)
+        return extracted, with_cache_note(logs, llm)
+
+    def _messages(self, *, project: Project, chapter_no: int, chapter_text: str) -> Tuple[str, str]:
         system = (
             "你是小说编辑助理。请在不改写正文的前提下，"
             "对章节进行：摘要（300-600字）、事实提炼、伏笔提炼。"
@@ -41,7 +54,9 @@ class WritebackExtractor:
   ]
 }}
 """
-        raw = llm.complete(system=system, prompt=prompt)
+        return system, prompt
+
+    def _parse(self, raw: str, chapter_no: int) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
         data: Dict[str, Any] = {}
         try:
             start = raw.find("{")
@@ -0,0 +1,117 @@
+"""Fixed batch_size=16 in input order vs length-bucketed token-budget batches on a mixed-length corpus.
+
+Without --model the encoder is simulated: each batch is padded to its longest input and pushed
+through one dense layer and a self-attention score matrix with NumPy, so cost follows padded
+tokens the same way a transformer forward pass does. With --model a real SentenceTransformer
+(e.g. model/bge-m3) is timed instead.
+
+Usage (from backend/):
+    python -m bench.dynamic_batching --texts 512
+    python -m bench.dynamic_batching --texts 512 --model model/bge-m3 --threads 4
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Callable, List, Sequence
+
+from rag.batching import cap_torch_threads, estimate_tokens, token_budget_batches
+
+
+def _corpus(n: int, seed: int = 7) -> List[str]:
+    # Roughly what a project index holds: short facts/foreshadowing JSON, mid-size summaries, long chapter chunks.
+    rng = random.Random(seed)
+    out: List[str] = []
+    for i in range(n):
+        r = rng.random()
+        if r < 0.45:
+            size = rng.randint(50, 160)
+        elif r < 0.7:
+            size = rng.randint(200, 600)
+        else:
+            size = rng.randint(900, 1400)
+        out.append((f"片段{i}：" + "风雪夜行，灯火阑珊，少年握紧了剑。" * 90)[:size])
+    return out
+
+
+def _fixed_batches(n: int, size: int) -> List[List[int]]:
+    return [list(range(i, min(n, i + size))) for i in range(0, n, size)]
+
+
+def _padding_efficiency(lengths: Sequence[int], batches: List[List[int]]) -> float:
+    real = sum(lengths)
+    padded = sum(len(b) * max(lengths[i] for i in b) for b in batches)
+    return real / padded if padded else 1.0
+
+
+def _simulated_encoder(hidden: int) -> Callable[[List[int]], None]:
+    import numpy as np  # type: ignore
+
+    w = np.random.default_rng(0).standard_normal((hidden, hidden)).astype(np.float32)
+
+    def run(batch_lengths: List[int]) -> None:
+        x = np.ones((len(batch_lengths), max(batch_lengths), hidden), dtype=np.float32)
+        h = x @ w
+        _ = h @ h.transpose(0, 2, 1)
+
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--token-budget", type=int, default=8192)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--hidden", type=int, default=256, help="simulated encoder width")
+    parser.add_argument("--model", default=None, help="SentenceTransformer name/path to time instead of the simulation")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = _corpus(args.texts)
+    max_tokens = 8192
+    model = None
+    if args.model:
+        from sentence_transformers import SentenceTransformer  # type: ignore
+
+        cap_torch_threads(args.threads)
+        model = SentenceTransformer(args.model)
+        max_tokens = int(model.max_seq_length)
+    lengths = [estimate_tokens(t, max_tokens) for t in texts]
+
+    plans = {
+        "fixed-16": _fixed_batches(len(texts), 16),
+        "bucketed": token_budget_batches(lengths, token_budget=args.token_budget, max_batch_size=args.max_batch_size),
+    }
+
+    if model is not None:
+
+        def run(batch: List[int]) -> None:
+            model.encode([texts[i] for i in batch], batch_size=len(batch), show_progress_bar=False)
+
+    else:
+        sim = _simulated_encoder(args.hidden)
+
+        def run(batch: List[int]) -> None:
+            sim([lengths[i] for i in batch])
+
+    print(
+        f"texts={len(texts)} tokens min/avg/max={min(lengths)}/{sum(lengths) // len(lengths)}/{max(lengths)} "
+        f"encoder={'model ' + args.model if model is not None else f'simulated (hidden={args.hidden})'}"
+    )
+    for name, batches in plans.items():
+        best = float("inf")
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            for b in batches:
+                run(b)
+            best = min(best, time.perf_counter() - t0)
+        print(
+            f"  {name:<9} batches={len(batches):>4} padding_efficiency={_padding_efficiency(lengths, batches):6.1%} "
+            f"best={best * 1000:8.1f}ms  {len(texts) / best:8.0f} texts/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Cache-hit throughput of the embeddings cache: per-row JSON (legacy) vs batched BLOB lookup.
+
+Usage (from backend/):
+    python -m bench.embeddings_cache --texts 2000 --dim 1024
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+
+_tmp = tempfile.mkdtemp(prefix="bench_embcache_")
+os.environ.setdefault("DB_PATH", os.path.join(_tmp, "bench.db"))
+
+from sqlalchemy import text as sql_text  # noqa: E402
+
+from app.db.init_db import init_db  # noqa: E402
+from app.db.session import SessionLocal  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from rag.embeddings_mock import MockEmbeddings  # noqa: E402
+from rag.service import RAGService  # noqa: E402
+
+
+def _legacy_lookup(db, model_name: str, texts):
+    out = []
+    for t in texts:
+        cache_key = f"{model_name}:{uuid.uuid5(uuid.NAMESPACE_DNS, t)}"
+        row = db.execute(
+            sql_text("SELECT vector_json FROM embeddings_cache_legacy_bench WHERE cache_key = :k"),
+            {"k": cache_key},
+        ).fetchone()
+        out.append(json.loads(row[0]) if row else [])
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    args = parser.parse_args()
+
+    settings.embeddings_cache_dtype = args.dtype
+    init_db()
+    rag = RAGService()
+    rag._embeddings = MockEmbeddings(dim=args.dim)
+    model_name = rag._embeddings.model_name
+    texts = [f"第{i // 20 + 1}章 片段 {i}：" + "风雪夜行，灯火阑珊。" * 40 for i in range(args.texts)]
+
+    with SessionLocal() as db:
+        db.execute(
+            sql_text(
+                "CREATE TABLE embeddings_cache_legacy_bench (cache_key TEXT PRIMARY KEY, model_name TEXT, vector_json TEXT, created_at TEXT)"
+            )
+        )
+        vectors = rag._embed_cached(db, texts)  # warm the BLOB cache (all misses)
+        db.execute(
+            sql_text("INSERT INTO embeddings_cache_legacy_bench VALUES(:k,:m,:v,'')"),
+            [
+                {"k": f"{model_name}:{uuid.uuid5(uuid.NAMESPACE_DNS, t)}", "m": model_name, "v": json.dumps(v)}
+                for t, v in zip(texts, vectors)
+            ],
+        )
+        db.commit()
+
+        def run(label, fn):
+            best = float("inf")
+            for _ in range(args.rounds):
+                t0 = time.perf_counter()
+                fn()
+                best = min(best, time.perf_counter() - t0)
+            print(f"{label:<28} {best * 1000:9.1f} ms  {args.texts / best:10.0f} texts/s")
+            return best
+
+        print(f"texts={args.texts} dim={args.dim} dtype={args.dtype} (best of {args.rounds})")
+        before = run("before: per-row vector_json", lambda: _legacy_lookup(db, model_name, texts))
+        after = run("after: batched vector_blob", lambda: rag._embed_cached(db, texts))
+        print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
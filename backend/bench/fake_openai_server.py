@@ -0,0 +1,134 @@
+"""Local OpenAI-compatible chat endpoint that injects latency and errors.
+
+Serves POST /v1/chat/completions (plain and `stream: true`). Each request sleeps a log-normal
+latency around --latency-ms; a --tail-rate share of requests is slowed to --tail-ms instead, and
+an --error-rate share fails with --error-status (429 responses carry Retry-After). Point the
+backend at it with MOCK_LLM=0 LLM_API_KEY=x LLM_BASE_URL=http://127.0.0.1:8009/v1, or use it
+from bench.llm_resilience.
+
+Usage (from backend/):
+    python -m bench.fake_openai_server --port 8009 --latency-ms 300 --tail-rate 0.05 --tail-ms 5000 --error-rate 0.1
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def create_app(
+    *,
+    latency_ms: float,
+    tail_rate: float,
+    tail_ms: float,
+    error_rate: float,
+    error_status: int,
+    seed: int | None = None,
+) -> FastAPI:
+    app = FastAPI(title="fake-openai")
+    rng = random.Random(seed)
+    counters: Dict[str, int] = {"requests": 0, "errors": 0, "tail": 0}
+
+    def _reply_text(body: Dict[str, Any]) -> str:
+        messages = body.get("messages") or []
+        last = str(messages[-1].get("content", "")) if messages else ""
+        return f"【fake】{last[:200]}"
+
+    @app.get("/stats")
+    def stats():
+        return counters
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counters["requests"] += 1
+        if rng.random() < tail_rate:
+            counters["tail"] += 1
+            delay = tail_ms / 1000.0
+        else:
+            delay = rng.lognormvariate(0.0, 0.35) * latency_ms / 1000.0
+        await asyncio.sleep(delay)
+
+        if rng.random() < error_rate:
+            counters["errors"] += 1
+            headers = {"retry-after": "1"} if error_status == 429 else {}
+            return JSONResponse(
+                {"error": {"message": "injected failure", "type": "server_error", "code": error_status}},
+                status_code=error_status,
+                headers=headers,
+            )
+
+        text = _reply_text(body)
+        model = str(body.get("model") or "fake-model")
+        rid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        if not body.get("stream"):
+            return {
+                "id": rid,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(text), "total_tokens": len(text)},
+            }
+
+        async def events():
+            for i in range(0, len(text), 8):
+                chunk = {
+                    "id": rid,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": text[i : i + 8]}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(0.01)
+            done = {
+                "id": rid,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8009)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=5000.0)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn  # type: ignore
+
+    app = create_app(
+        latency_ms=args.latency_ms,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Tail latency and success rate of LLM calls under the retry / hedging policies.
+
+Starts bench.fake_openai_server in-process (or uses --url) and sends --calls distinct prompts
+with --concurrency at a time through ScheduledLLMClient, once per policy:
+no retries, retries with jittered backoff, and retries plus hedging after the p95 latency.
+The upstream client here is a minimal httpx chat-completions call so the benchmark runs
+without AutoGen installed.
+
+Usage (from backend/):
+    python -m bench.llm_resilience --calls 200 --concurrency 16
+    python -m bench.llm_resilience --url http://127.0.0.1:8009/v1 --calls 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import threading
+import time
+from typing import Dict, List
+
+from app.agents.llm import LLMClient, ScheduledLLMClient, _background_loop, llm_call_stats, llm_scheduler
+from app.agents.llm_resilience import CallPolicy, is_retryable
+
+
+class _HttpChatClient(LLMClient):
+    def __init__(self, base_url: str) -> None:
+        import httpx  # type: ignore
+
+        self._url = base_url.rstrip("/") + "/chat/completions"
+        self._client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=256))
+
+    async def acomplete(self, *, system: str, prompt: str) -> str:
+        resp = await self._client.post(
+            self._url,
+            json={"model": "fake", "messages": [{"role": "system", "content": system}, {"role": "user", "content": prompt}]},
+        )
+        resp.raise_for_status()  # httpx.HTTPStatusError carries .response.status_code for is_retryable
+        return resp.json()["choices"][0]["message"]["content"]
+
+
+def _start_server(port: int, args: argparse.Namespace) -> None:
+    import uvicorn  # type: ignore
+
+    from bench.fake_openai_server import create_app
+
+    app = create_app(
+        latency_ms=args.latency_ms,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=7,
+    )
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+
+def _pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+async def _run(client_factory, calls: int, concurrency: int, tag: str) -> Dict[str, float]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        async with sem:
+            started = time.perf_counter()
+            try:
+                await client_factory().acomplete(system="bench", prompt=f"{tag} prompt #{i}")
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                failures += 1
+                if not is_retryable(e) and not isinstance(e, TimeoutError):
+                    raise
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(calls)])
+    return {
+        "ok": len(latencies),
+        "failed": failures,
+        "p50": _pct(latencies, 0.5),
+        "p95": _pct(latencies, 0.95),
+        "p99": _pct(latencies, 0.99),
+        "wall": time.perf_counter() - started,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="existing OpenAI-compatible base URL; default starts the fake server")
+    parser.add_argument("--port", type=int, default=8019)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=3000.0)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--attempt-timeout-s", type=float, default=10.0)
+    args = parser.parse_args()
+
+    base_url = args.url
+    if base_url is None:
+        _start_server(args.port, args)
+        base_url = f"http://127.0.0.1:{args.port}/v1"
+    inner = _HttpChatClient(base_url)
+    llm_scheduler.max_in_flight = max(llm_scheduler.max_in_flight, args.concurrency * 2)
+
+    common = {
+        "attempt_timeout_s": args.attempt_timeout_s,
+        "deadline_s": args.attempt_timeout_s * 4,
+        "backoff_base_s": 0.1,
+        "backoff_max_s": 1.0,
+    }
+    policies = {
+        "no-retry": CallPolicy(max_retries=0, **common),
+        "retry": CallPolicy(max_retries=3, **common),
+        "retry+hedge": CallPolicy(max_retries=3, hedge=True, hedge_min_delay_s=args.latency_ms / 1000.0, **common),
+    }
+    print(
+        f"calls={args.calls} concurrency={args.concurrency} upstream={base_url} "
+        f"latency~{args.latency_ms:.0f}ms tail={args.tail_rate:.0%}@{args.tail_ms:.0f}ms errors={args.error_rate:.0%}({args.error_status})"
+    )
+    print(f"{'policy':<12} {'ok':>5} {'failed':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'wall':>7}  attempts/retries/hedges(won)")
+    for name, policy in policies.items():
+        before = dict(llm_call_stats.counters)
+
+        def factory(policy=policy):
+            return ScheduledLLMClient(inner, agent=f"bench-{name}", model="fake", temperature=0.0, policy=policy)
+
+        r = _background_loop.run(_run(factory, args.calls, args.concurrency, name))
+        after = llm_call_stats.counters
+        d = {k: after[k] - before.get(k, 0) for k in after}
+        print(
+            f"{name:<12} {r['ok']:>5} {r['failed']:>6} {r['p50']:>6.2f}s {r['p95']:>6.2f}s {r['p99']:>6.2f}s {r['wall']:>6.1f}s  "
+            f"{d['attempts']}/{d['retries']}/{d['hedges']}({d['hedge_wins']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Embedding and rerank throughput per provider on the mixed-length corpus.
+
+Each provider is loaded the same way the model registry loads it (settings for batching,
+threads and ONNX quantization apply). Providers whose dependencies or model files are missing
+are reported and skipped.
+
+Usage (from backend/):
+    python -m bench.model_throughput --embeddings mock,hashing_ngram,local_bge_m3,onnx_bge_m3 --rerank mock,local_bge,onnx_bge
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from app.core.config import settings
+from bench.dynamic_batching import _corpus
+from rag.model_registry import _load_embeddings, _load_reranker
+
+
+def _best(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeddings", default="mock,hashing_ngram,local_bge_m3,onnx_bge_m3")
+    parser.add_argument("--rerank", default="mock,local_bge,onnx_bge")
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = _corpus(args.texts)
+    device = getattr(settings, "rag_device", None)
+    print(f"texts={len(texts)} rounds={args.rounds} (best of)")
+
+    for provider in [p for p in args.embeddings.split(",") if p]:
+        try:
+            model = _load_embeddings(provider, settings.bge_m3_model_name, device)
+        except Exception as e:
+            print(f"  embeddings {provider:<13} skipped: {type(e).__name__}: {e}")
+            continue
+        model.embed_texts(texts[:4])  # warm-up
+        t = _best(lambda: model.embed_texts(texts), args.rounds)
+        print(f"  embeddings {provider:<13} {model.model_name:<40} {len(texts) / t:8.1f} texts/s")
+
+    query = "少年握紧了剑"
+    for provider in [p for p in args.rerank.split(",") if p]:
+        try:
+            model = _load_reranker(provider, settings.bge_rerank_model_name, device)
+        except Exception as e:
+            print(f"  rerank     {provider:<13} skipped: {type(e).__name__}: {e}")
+            continue
+        model.rerank(query=query, texts=texts[:4])
+        t = _best(lambda: model.rerank(query=query, texts=texts), args.rounds)
+        print(f"  rerank     {provider:<13} {model.model_name:<40} {len(texts) / t:8.1f} pairs/s")
+
+
+if __name__ == "__main__":
+    main()
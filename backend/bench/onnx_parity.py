@@ -0,0 +1,93 @@
+"""Parity of the ONNX providers against the sentence-transformers ones on the same local model.
+
+Embeddings: per-text cosine between onnx_bge_m3 and local_bge_m3 vectors.
+Reranker:   per-query Spearman rank correlation between onnx_bge and local_bge scores.
+Exits non-zero when min cosine or mean rank correlation falls below the thresholds, so it can
+gate a model export in CI.
+
+Usage (from backend/, after `python -m rag.onnx_export ... --quantize`):
+    python -m bench.onnx_parity --embeddings-model model/bge-m3 --rerank-model model/bge-reranker-v2-m3
+    python -m bench.onnx_parity --embeddings-model model/bge-m3 --fp32   # compare the unquantized export
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import List, Sequence
+
+import numpy as np
+
+from bench.dynamic_batching import _corpus
+
+
+def _ranks(x: Sequence[float]) -> np.ndarray:
+    order = np.argsort(np.asarray(x), kind="stable")
+    ranks = np.empty(len(order), dtype=np.float64)
+    ranks[order] = np.arange(len(order))
+    return ranks
+
+
+def spearman(a: Sequence[float], b: Sequence[float]) -> float:
+    ra, rb = _ranks(a), _ranks(b)
+    ra -= ra.mean()
+    rb -= rb.mean()
+    denom = float(np.sqrt((ra * ra).sum() * (rb * rb).sum()))
+    return float((ra * rb).sum() / denom) if denom else 1.0
+
+
+def check_embeddings(model_dir: str, texts: List[str], *, quantized: bool, min_cosine: float) -> bool:
+    from rag.embeddings_bge_m3 import BgeM3Embeddings
+    from rag.embeddings_onnx import OnnxBgeM3Embeddings
+
+    ref = np.asarray(BgeM3Embeddings(model_name=model_dir).embed_texts(texts))
+    onnx = OnnxBgeM3Embeddings(model_dir=model_dir, quantized=quantized)
+    got = np.asarray(onnx.embed_texts(texts))
+    cos = (ref * got).sum(axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(got, axis=1))
+    ok = float(cos.min()) >= min_cosine
+    print(
+        f"embeddings {onnx.model_name}: cosine min={cos.min():.4f} mean={cos.mean():.4f} "
+        f"(threshold {min_cosine}) {'OK' if ok else 'FAIL'}"
+    )
+    return ok
+
+
+def check_reranker(model_dir: str, texts: List[str], *, quantized: bool, min_spearman: float) -> bool:
+    from rag.rerank_bge import BgeReranker
+    from rag.rerank_onnx import OnnxBgeReranker
+
+    queries = ["少年握紧了剑", "灯火阑珊处的约定", "风雪夜行的旅人", "片段3", "谁在说谎"]
+    ref_model = BgeReranker(model_name=model_dir)
+    onnx = OnnxBgeReranker(model_dir=model_dir, quantized=quantized)
+    corr = [spearman(ref_model.rerank(query=q, texts=texts), onnx.rerank(query=q, texts=texts)) for q in queries]
+    mean = float(np.mean(corr))
+    ok = mean >= min_spearman
+    print(
+        f"reranker {onnx.model_name}: spearman min={min(corr):.4f} mean={mean:.4f} "
+        f"(threshold {min_spearman}) {'OK' if ok else 'FAIL'}"
+    )
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeddings-model", default=None)
+    parser.add_argument("--rerank-model", default=None)
+    parser.add_argument("--texts", type=int, default=64)
+    parser.add_argument("--fp32", action="store_true", help="compare model.onnx instead of model_int8.onnx")
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--min-spearman", type=float, default=0.9)
+    args = parser.parse_args()
+    if not args.embeddings_model and not args.rerank_model:
+        parser.error("pass --embeddings-model and/or --rerank-model")
+
+    texts = _corpus(args.texts)
+    ok = True
+    if args.embeddings_model:
+        ok &= check_embeddings(args.embeddings_model, texts, quantized=not args.fp32, min_cosine=args.min_cosine)
+    if args.rerank_model:
+        ok &= check_reranker(args.rerank_model, texts[:32], quantized=not args.fp32, min_spearman=args.min_spearman)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Parallel expand + preview requests against the mock LLM, per SQLite profile.
+
+For each SQLITE_PROFILE (default: plain engine, rollback journal; production: WAL, tuned
+pragmas, reader pool + single writer connection) a fresh subprocess creates --projects
+projects with outline and characters, then fires --expands chapter expansions and
+--previews RAG previews at once through the ASGI app. Reports failed requests (e.g.
+`database is locked`), latency percentiles per request kind and wall time.
+
+Usage (from backend/):
+    python -m bench.sqlite_concurrency --projects 4 --expands 16 --previews 32
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+
+def _pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+async def _worker(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx  # type: ignore
+
+    from app.db.init_db import init_db
+    from app.main import app
+
+    init_db()
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        pids: List[str] = []
+        for i in range(args.projects):
+            r = await client.post("/projects", json={"genre": "仙侠", "setting": f"山门{i}", "style": "冷峻"})
+            pid = r.json()["data"]["id"]
+            await client.post(f"/projects/{pid}/outline", json={"theme": "成长"})
+            await client.post(f"/projects/{pid}/characters", json={})
+            pids.append(pid)
+
+        latencies: Dict[str, List[float]] = {"expand": [], "preview": []}
+        failures: Dict[str, int] = {"expand": 0, "preview": 0}
+        errors: List[str] = []
+
+        async def call(kind: str, method: str, url: str, **kw: Any) -> None:
+            started = time.perf_counter()
+            try:
+                r = await client.request(method, url, **kw)
+                ok = r.status_code == 200
+                if not ok:
+                    errors.append(f"{r.status_code} {r.text[:120]}")
+            except Exception as e:
+                ok = False
+                errors.append(f"{type(e).__name__}: {e}"[:160])
+            if ok:
+                latencies[kind].append(time.perf_counter() - started)
+            else:
+                failures[kind] += 1
+
+        jobs = []
+        for i in range(args.expands):
+            pid, chapter = pids[i % len(pids)], 1 + i // len(pids)
+            jobs.append(call("expand", "POST", f"/projects/{pid}/chapters/{chapter}/expand", json={"instruction": f"第{chapter}章"}))
+        for i in range(args.previews):
+            pid = pids[i % len(pids)]
+            jobs.append(call("preview", "GET", f"/projects/{pid}/rag/preview", params={"chapter": 1 + i % 4, "query": f"线索{i}"}))
+
+        started = time.perf_counter()
+        await asyncio.gather(*jobs)
+        wall = time.perf_counter() - started
+
+    out: Dict[str, Any] = {"wall": wall, "errors": sorted(set(errors))[:3]}
+    for kind in ("expand", "preview"):
+        out[kind] = {
+            "ok": len(latencies[kind]),
+            "failed": failures[kind],
+            "p50": _pct(latencies[kind], 0.5),
+            "p95": _pct(latencies[kind], 0.95),
+        }
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--projects", type=int, default=4)
+    parser.add_argument("--expands", type=int, default=16)
+    parser.add_argument("--previews", type=int, default=32)
+    parser.add_argument("--profiles", default="default,production")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(_worker(args))))
+        return
+
+    print(f"projects={args.projects} expands={args.expands} previews={args.previews} (mock LLM, all fired at once)")
+    print(f"{'profile':<11} {'kind':<8} {'ok':>4} {'failed':>6} {'p50':>8} {'p95':>8} {'wall':>7}")
+    for profile in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        tmp = tempfile.mkdtemp(prefix=f"bench_sqlite_{profile}_")
+        env = dict(
+            os.environ,
+            SQLITE_PROFILE=profile,
+            DB_PATH=os.path.join(tmp, "app.db"),
+            CHROMA_PERSIST_DIR=os.path.join(tmp, "chroma"),
+            VECTOR_INDEX_DIR=os.path.join(tmp, "vectors"),
+            MOCK_LLM="1",
+            ANONYMIZED_TELEMETRY="False",
+        )
+        cmd = [
+            sys.executable, "-m", "bench.sqlite_concurrency", "--worker",
+            "--projects", str(args.projects), "--expands", str(args.expands), "--previews", str(args.previews),
+        ]  # fmt: skip
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        lines = [ln for ln in proc.stdout.splitlines() if ln.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            print(f"{profile:<11} worker failed:\n{proc.stderr[-2000:]}")
+            continue
+        r = json.loads(lines[-1])
+        for kind in ("expand", "preview"):
+            k = r[kind]
+            print(
+                f"{profile:<11} {kind:<8} {k['ok']:>4} {k['failed']:>6} {k['p50'] * 1000:>6.0f}ms {k['p95'] * 1000:>6.0f}ms "
+                f"{r['wall']:>6.1f}s"
+            )
+        for err in r["errors"]:
+            print(f"{'':<11} e.g. {err}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Vector backend comparison: NumpyVectorStore vs ChromaVectorStore (build time, query latency).
+
+Usage (from backend/):
+    python -m bench.vector_backends --sizes 1000,10000,100000 --dim 1024
+Chroma is skipped when chromadb is not installed.
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from rag.vector_store_base import VectorStore
+from rag.vector_store_numpy import NumpyVectorStore
+
+TYPES = ["style_guide", "world", "outline", "characters", "chapter_summary", "facts", "foreshadowing", "chapter"]
+
+
+def _corpus(n: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"c{i}" for i in range(n)]
+    metadatas = []
+    for i in range(n):
+        t = "chapter" if i % 3 else TYPES[i % len(TYPES)]
+        metadatas.append({"type": t, "chapter_no": int(i % 300) + 1})
+    return ids, vectors, metadatas
+
+
+def _bench(store: VectorStore, n: int, dim: int, queries: int, top_k: int) -> dict:
+    ids, vectors, metadatas = _corpus(n, dim)
+    t0 = time.perf_counter()
+    for start in range(0, n, 1000):
+        end = start + 1000
+        store.upsert(
+            "bench",
+            ids=ids[start:end],
+            embeddings=vectors[start:end].tolist(),
+            metadatas=metadatas[start:end],
+            documents=[f"doc {i}" for i in range(start, min(end, n))],
+        )
+    build_s = time.perf_counter() - t0
+
+    where = {"$and": [{"type": {"$in": TYPES}}, {"$or": [{"type": {"$ne": "chapter"}}, {"chapter_no": {"$lte": 5}}]}]}
+    rng = np.random.default_rng(1)
+    out = {"build_s": build_s}
+    for label, w in (("query_ms", None), ("filtered_query_ms", where)):
+        lat = []
+        for _ in range(queries):
+            q = rng.normal(size=dim).astype(np.float32).tolist()
+            t0 = time.perf_counter()
+            store.query("bench", embedding=q, top_k=top_k, where=w)
+            lat.append((time.perf_counter() - t0) * 1000)
+        out[label] = statistics.median(lat)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    backends = [("numpy", lambda d: NumpyVectorStore(persist_dir=d))]
+    try:
+        from rag.vector_store_chroma import ChromaVectorStore
+
+        ChromaVectorStore(persist_dir=tempfile.mkdtemp(prefix="bench_chroma_probe_"))
+        backends.append(("chroma", lambda d: ChromaVectorStore(persist_dir=d)))
+    except Exception:
+        print("chromadb not available; benchmarking numpy only")
+
+    print(f"dim={args.dim} top_k={args.top_k} queries={args.queries} (median latency)")
+    print(f"{'backend':<8} {'chunks':>8} {'build s':>9} {'query ms':>9} {'filtered ms':>12}")
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        for name, factory in backends:
+            tmp = tempfile.mkdtemp(prefix=f"bench_{name}_")
+            try:
+                r = _bench(factory(tmp), n, args.dim, args.queries, args.top_k)
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+            print(f"{name:<8} {n:>8} {r['build_s']:>9.2f} {r['query_ms']:>9.2f} {r['filtered_query_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import threading
+from typing import List, Sequence
+
+# Rough token count for bge-m3 / bge-reranker (XLM-R vocab): about one token per CJK
+# character, fewer for Latin text. Only used to group inputs, so an estimate is enough.
+_SPECIAL_TOKENS = 2
+
+
+def estimate_tokens(text: str, max_tokens: int | None = None) -> int:
+    n = len(text) + _SPECIAL_TOKENS
+    return min(n, max_tokens) if max_tokens else n
+
+
+def token_budget_batches(lengths: Sequence[int], *, token_budget: int, max_batch_size: int) -> List[List[int]]:
+    """
+    Group input indices into batches of similar length.
+
+    Indices are visited longest first, and a batch grows while
+    len(batch) * longest_in_batch (its padded size) fits in token_budget and
+    len(batch) <= max_batch_size. Every batch has at least one index. Callers
+    scatter the results back by index, so the input order is unchanged.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    longest = 0
+    for i in order:
+        n = max(1, int(lengths[i]))
+        width = max(longest, n)
+        if current and (len(current) >= max_batch_size or (len(current) + 1) * width > token_budget):
+            batches.append(current)
+            current, width = [], n
+        current.append(i)
+        longest = width
+    if current:
+        batches.append(current)
+    return batches
+
+
+_threads_lock = threading.Lock()
+
+
+def cap_torch_threads(num_threads: int | None) -> None:
+    """
+    Limit torch's intra-op thread pool to num_threads (<= 0 or None leaves torch's default).
+    torch.set_num_threads is process-wide, so this is applied once when a model loads rather
+    than per call; concurrent requests then share a bounded pool instead of each spawning one
+    thread per core.
+    """
+    if not num_threads or num_threads <= 0:
+        return
+    try:
+        import torch  # type: ignore
+    except Exception:  # pragma: no cover
+        return
+    with _threads_lock:
+        if torch.get_num_threads() != int(num_threads):
+            torch.set_num_threads(int(num_threads))
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 from dataclasses import dataclass
 from typing import List
 
@@ -10,6 +11,10 @@ class ChunkedText:
     snippet: str
 
 
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 def _split_paragraphs(text: str) -> List[str]:
     cleaned = text.replace("\r\n", "\n").replace("\r", "\n").strip()
     if not cleaned:
@@ -2,33 +2,53 @@ from __future__ import annotations
 
 from typing import List
 
+from rag.batching import cap_torch_threads, estimate_tokens, token_budget_batches
 from rag.embeddings_base import Embeddings
 
 
 class BgeM3Embeddings(Embeddings):
-    def __init__(self, *, model_name: str = "BAAI/bge-m3", device: str | None = None) -> None:
+    def __init__(
+        self,
+        *,
+        model_name: str = "BAAI/bge-m3",
+        device: str | None = None,
+        token_budget: int = 8192,
+        max_batch_size: int = 64,
+        num_threads: int | None = None,
+    ) -> None:
         try:
             from sentence_transformers import SentenceTransformer  # type: ignore
         except Exception as e:  # pragma: no cover
             raise RuntimeError("sentence-transformers is required for local_bge_m3") from e
 
+        cap_torch_threads(num_threads)
         self._model_name = model_name
         self._model = SentenceTransformer(model_name, device=device)
+        self._max_tokens = int(getattr(self._model, "max_seq_length", 0) or 0) or None
+        self._token_budget = int(token_budget)
+        self._max_batch_size = int(max_batch_size)
 
     @property
     def model_name(self) -> str:
         return self._model_name
 
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        vectors = self._model.encode(
-            texts,
-            batch_size=16,
-            normalize_embeddings=True,
-            convert_to_numpy=True,
-            show_progress_bar=False,
-        )
-        return vectors.tolist()
+        if not texts:
+            return []
+        # Similar-length batches sized by padded tokens, so short facts are not padded to chapter length.
+        lengths = [estimate_tokens(t, self._max_tokens) for t in texts]
+        out: List[List[float]] = [[] for _ in texts]
+        for batch in token_budget_batches(lengths, token_budget=self._token_budget, max_batch_size=self._max_batch_size):
+            vectors = self._model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+            for i, vec in zip(batch, vectors.tolist()):
+                out[i] = vec
+        return out
 
     def embed_query(self, query: str) -> List[float]:
         return self.embed_texts([query])[0]
-
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import List
+
+from rag.embeddings_base import Embeddings
+
+# Per-n seeds so the 1-gram "林" and the 2-gram "林林" never share a hash by construction.
+_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5, 0x85EBCA77C2B2AE63)
+
+
+class HashingNgramEmbeddings(Embeddings):
+    """
+    Character n-gram feature hashing (no model download). Each text becomes a signed count of
+    its 1..max_n character n-grams hashed into `dim` buckets; optionally log-scaled
+    (sublinear TF) and L2-normalized. Character n-grams need no word segmentation, so Chinese
+    text gets useful lexical similarity, which is enough for offline deployments and benchmarks.
+    """
+
+    def __init__(
+        self,
+        *,
+        dim: int = 1024,
+        min_n: int = 1,
+        max_n: int = 3,
+        sublinear_tf: bool = True,
+        normalize: bool = True,
+    ) -> None:
+        try:
+            import numpy as np  # type: ignore
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError("numpy is required for hashing_ngram embeddings") from e
+
+        if not 1 <= min_n <= max_n <= len(_SEEDS):
+            raise ValueError(f"n-gram range must satisfy 1 <= min_n <= max_n <= {len(_SEEDS)}")
+        self._np = np
+        self._dim = int(dim)
+        self._min_n = int(min_n)
+        self._max_n = int(max_n)
+        self._sublinear_tf = bool(sublinear_tf)
+        self._normalize = bool(normalize)
+
+    @property
+    def model_name(self) -> str:
+        flags = ("-sublinear" if self._sublinear_tf else "") + ("" if self._normalize else "-raw")
+        return f"hashing-ngram-{self._min_n}-{self._max_n}-{self._dim}{flags}"
+
+    def _mix(self, x):
+        # splitmix64 finalizer; uint64 arithmetic wraps, which is what we want.
+        np = self._np
+        x = x ^ (x >> np.uint64(30))
+        x = x * np.uint64(0xBF58476D1CE4E5B9)
+        x = x ^ (x >> np.uint64(27))
+        x = x * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+    def _vec_for(self, text: str):
+        np = self._np
+        dim = self._dim
+        codes = np.frombuffer(text.lower().encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        buckets = []
+        signs = []
+        h = None
+        for n in range(1, self._max_n + 1):
+            if codes.shape[0] < n:
+                break
+            # Rolling combination: hash(n-gram at i) from hash((n-1)-gram at i) and code point i+n-1.
+            h = codes.copy() if h is None else h[:-1] * np.uint64(0x100000001B3) + codes[n - 1 :]
+            if n < self._min_n:
+                continue
+            mixed = self._mix(h ^ np.uint64(_SEEDS[n - 1]))
+            buckets.append((mixed % np.uint64(dim)).astype(np.int64))
+            signs.append(np.where((mixed >> np.uint64(63)) == 0, 1.0, -1.0))
+        if not buckets:
+            return np.zeros(dim, dtype=np.float64)
+
+        vec = np.bincount(np.concatenate(buckets), weights=np.concatenate(signs), minlength=dim)
+        if self._sublinear_tf:
+            vec = np.sign(vec) * np.log1p(np.abs(vec))
+        if self._normalize:
+            norm = float(np.linalg.norm(vec))
+            if norm > 0:
+                vec = vec / norm
+        return vec
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        return [self._vec_for(t).tolist() for t in texts]
+
+    def embed_query(self, query: str) -> List[float]:
+        return self._vec_for(query).tolist()
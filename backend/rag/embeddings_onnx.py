@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from typing import List
+
+from rag.batching import token_budget_batches
+from rag.embeddings_base import Embeddings
+from rag.onnx_utils import load_session, load_tokenizer, resolve_onnx_file, session_inputs
+
+
+class OnnxBgeM3Embeddings(Embeddings):
+    """bge-m3 dense embeddings (CLS pooling, L2-normalized) on ONNX Runtime, CPU only."""
+
+    def __init__(
+        self,
+        *,
+        model_dir: str = "model/bge-m3",
+        quantized: bool = True,
+        max_length: int = 8192,
+        token_budget: int = 8192,
+        max_batch_size: int = 64,
+        num_threads: int | None = None,
+    ) -> None:
+        try:
+            import numpy  # type: ignore  # noqa: F401
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError("numpy is required for onnx_bge_m3") from e
+
+        self._path = resolve_onnx_file(model_dir, quantized=quantized)
+        self._session = load_session(self._path, num_threads=num_threads)
+        self._tokenizer = load_tokenizer(model_dir)
+        self._model_name = f"{model_dir}:onnx{'-int8' if self._path.endswith('_int8.onnx') else ''}"
+        self._max_length = int(max_length)
+        self._token_budget = int(token_budget)
+        self._max_batch_size = int(max_batch_size)
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np  # type: ignore
+
+        if not texts:
+            return []
+        # Exact token counts are cheap with a fast tokenizer, so batches are sized on them.
+        ids = self._tokenizer(list(texts), truncation=True, max_length=self._max_length)["input_ids"]
+        out: List[List[float]] = [[] for _ in texts]
+        for batch in token_budget_batches(
+            [len(x) for x in ids], token_budget=self._token_budget, max_batch_size=self._max_batch_size
+        ):
+            encoded = self._tokenizer(
+                [texts[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self._max_length,
+                return_tensors="np",
+            )
+            hidden = self._session.run(None, session_inputs(self._session, encoded))[0]
+            cls = hidden[:, 0, :]
+            cls = cls / np.maximum(np.linalg.norm(cls, axis=1, keepdims=True), 1e-12)
+            for i, vec in zip(batch, cls.tolist()):
+                out[i] = vec
+        return out
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embed_texts([query])[0]
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from multiprocessing.connection import Client, Connection
+from typing import Any, Dict, List, Sequence
+
+from rag.embeddings_base import Embeddings
+from rag.rerank_base import Reranker
+
+
+class ModelServerClient:
+    """One connection per thread to rag.model_server (Connection objects are not thread-safe)."""
+
+    def __init__(self, socket_path: str, *, timeout_s: float = 30.0) -> None:
+        self.socket_path = socket_path
+        self.timeout_s = float(timeout_s)
+        self._local = threading.local()
+        self._info: Dict[str, Any] | None = None
+
+    def _conn(self) -> Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.socket_path, family="AF_UNIX")
+            self._local.conn = conn
+        return conn
+
+    def _drop(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def call(self, request: Dict[str, Any]) -> Any:
+        for attempt in (0, 1):
+            try:
+                conn = self._conn()
+                conn.send(request)
+                ready = conn.poll(self.timeout_s)
+                reply = conn.recv() if ready else None
+                break
+            except (EOFError, ConnectionError, FileNotFoundError):
+                # Server restarted: reconnect once.
+                self._drop()
+                if attempt:
+                    raise
+        if reply is None:
+            self._drop()  # a late answer would otherwise be read as the reply to the next request
+            raise TimeoutError(f"model server did not answer within {self.timeout_s:.0f}s")
+        if not reply.get("ok"):
+            raise RuntimeError(f"model server error: {reply.get('error')}")
+        return reply["result"]
+
+    def info(self) -> Dict[str, Any]:
+        if self._info is None:
+            self._info = self.call({"op": "info"})
+        return self._info
+
+
+class RemoteEmbeddings(Embeddings):
+    def __init__(self, client: ModelServerClient) -> None:
+        self._client = client
+        info = client.info()  # fails fast when the server is down
+        self._model_name = str(info["embeddings_model"])
+        self.is_mock = bool(info.get("embeddings_is_mock", False))
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._client.call({"op": "embed", "texts": list(texts)})
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embed_texts([query])[0]
+
+
+class RemoteReranker(Reranker):
+    def __init__(self, client: ModelServerClient) -> None:
+        self._client = client
+        info = client.info()
+        self._model_name = str(info["reranker_model"])
+        # The server runs MockReranker: its raw scores are not cross-encoder relevance.
+        self.is_mock = bool(info.get("reranker_is_mock", False))
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    def rerank(self, *, query: str, texts: Sequence[str]) -> List[float]:
+        if not texts:
+            return []
+        return self._client.call({"op": "rerank", "query": query, "texts": list(texts)})
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import gc
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.core.config import settings
+from rag.embeddings_base import Embeddings
+from rag.embeddings_mock import MockEmbeddings
+from rag.rerank_base import Reranker
+from rag.rerank_mock import MockReranker
+
+ModelKey = Tuple[str, str, str, str]  # (kind, provider, model_name, device)
+
+# Backoff between model server connection attempts: 0.5s, 1s, 2s, ... capped here.
+_SERVER_RETRY_MAX_S = 30.0
+
+
+@dataclass
+class _Entry:
+    key: ModelKey
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    model: Any = None
+    fallback: bool = False  # load failed; `model` is the mock stand-in
+    error: str | None = None
+    failures: int = 0  # consecutive model server connection failures
+    retry_at: float = 0.0
+    load_ms: float | None = None
+    loaded_at: float | None = None
+    last_used: float = 0.0
+
+
+def _batching_kwargs() -> Dict[str, Any]:
+    return {
+        "token_budget": int(getattr(settings, "rag_batch_token_budget", 8192)),
+        "max_batch_size": int(getattr(settings, "rag_batch_max_size", 64)),
+        "num_threads": int(getattr(settings, "rag_torch_threads", 0)),
+    }
+
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def _server_client():
+    from rag.model_client import ModelServerClient
+
+    path = str(getattr(settings, "model_server_socket", None))
+    with _clients_lock:
+        client = _clients.get(path)
+        if client is None:
+            client = ModelServerClient(path, timeout_s=float(getattr(settings, "model_server_timeout_s", 30.0)))
+            _clients[path] = client
+        return client
+
+
+def _use_server(use_server: bool) -> bool:
+    return bool(use_server and getattr(settings, "model_server_socket", None))
+
+
+def _onnx_kwargs() -> Dict[str, Any]:
+    kwargs = _batching_kwargs()
+    kwargs["num_threads"] = int(getattr(settings, "onnx_num_threads", 0))
+    kwargs["quantized"] = bool(getattr(settings, "onnx_quantized", True))
+    return kwargs
+
+
+def _load_embeddings(provider: str, model_name: str, device: str | None) -> Embeddings:
+    if provider == "server":
+        from rag.model_client import RemoteEmbeddings
+
+        return RemoteEmbeddings(_server_client())
+    if provider == "local_bge_m3":
+        from rag.embeddings_bge_m3 import BgeM3Embeddings
+
+        return BgeM3Embeddings(model_name=model_name, device=device, **_batching_kwargs())
+    if provider == "hashing_ngram":
+        from rag.embeddings_hashing import HashingNgramEmbeddings
+
+        return HashingNgramEmbeddings(
+            dim=int(getattr(settings, "hashing_ngram_dim", 1024)),
+            max_n=int(getattr(settings, "hashing_ngram_max_n", 3)),
+            sublinear_tf=bool(getattr(settings, "hashing_ngram_sublinear_tf", True)),
+            normalize=bool(getattr(settings, "hashing_ngram_normalize", True)),
+        )
+    if provider == "onnx_bge_m3":
+        from rag.embeddings_onnx import OnnxBgeM3Embeddings
+
+        return OnnxBgeM3Embeddings(model_dir=model_name, **_onnx_kwargs())
+    return MockEmbeddings()
+
+
+def _load_reranker(provider: str, model_name: str, device: str | None) -> Reranker:
+    if provider == "server":
+        from rag.model_client import RemoteReranker
+
+        return RemoteReranker(_server_client())
+    if provider == "local_bge":
+        from rag.rerank_bge import BgeReranker
+
+        return BgeReranker(model_name=model_name, device=device, **_batching_kwargs())
+    if provider == "onnx_bge":
+        from rag.rerank_onnx import OnnxBgeReranker
+
+        return OnnxBgeReranker(model_dir=model_name, **_onnx_kwargs())
+    return MockReranker()
+
+
+class ModelRegistry:
+    """
+    Process-wide embedders/rerankers, one instance per (kind, provider, model_name, device), so
+    every RAGService in the process shares the same loaded weights. Loads are serialized per key;
+    entries idle for longer than `idle_unload_s` are dropped by a background sweeper (0 disables).
+    """
+
+    def __init__(self, *, idle_unload_s: float = 0.0) -> None:
+        self.idle_unload_s = float(idle_unload_s)
+        self._entries: Dict[ModelKey, _Entry] = {}
+        self._lock = threading.Lock()
+        self._sweeper: threading.Thread | None = None
+        self._warming = False
+        self._warmed = False
+
+    # ---- lookups -------------------------------------------------------
+
+    def _entry(self, key: ModelKey) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(key=key)
+                self._entries[key] = entry
+            return entry
+
+    def _get(
+        self,
+        key: ModelKey,
+        loader: Callable[[], Any],
+        fallback: Callable[[], Any],
+        notes: List[str] | None,
+    ) -> Any:
+        entry = self._entry(key)
+        entry.last_used = time.time()
+        if entry.model is not None:
+            return entry.model
+        with entry.lock:
+            if entry.model is None and key[1] == "server":
+                return self._connect(entry, loader, notes)
+            if entry.model is None:
+                started = time.perf_counter()
+                try:
+                    entry.model = loader()
+                    entry.fallback, entry.error = False, None
+                except Exception as e:
+                    entry.model = fallback()
+                    entry.fallback, entry.error = True, f"{type(e).__name__}: {e}"
+                    if notes is not None:
+                        kind, provider = key[0], key[1]
+                        notes.append(f"{kind.capitalize()} {provider} load failed; fallback to mock.")
+                entry.load_ms = (time.perf_counter() - started) * 1000.0
+                entry.loaded_at = time.time()
+            self._ensure_sweeper()
+            return entry.model
+
+    def _connect(self, entry: _Entry, loader: Callable[[], Any], notes: List[str] | None) -> Any:
+        """
+        Client for the model server; caller holds entry.lock. A failure is never replaced by a
+        mock: its vectors would not match the server model's dimension. The error is raised,
+        further attempts back off, and /readyz reports 503 until a connection succeeds.
+        """
+        now = time.time()
+        if now < entry.retry_at:
+            raise RuntimeError(f"model server unavailable (retry in {entry.retry_at - now:.1f}s): {entry.error}")
+        started = time.perf_counter()
+        try:
+            entry.model = loader()
+        except Exception as e:
+            entry.failures += 1
+            entry.error = f"{type(e).__name__}: {e}"
+            entry.retry_at = now + min(_SERVER_RETRY_MAX_S, 0.5 * 2 ** (entry.failures - 1))
+            if notes is not None:
+                notes.append(f"{entry.key[0].capitalize()} model server unavailable: {entry.error}")
+            raise RuntimeError(f"model server unavailable: {entry.error}") from e
+        entry.fallback, entry.error, entry.failures, entry.retry_at = False, None, 0, 0.0
+        entry.load_ms = (time.perf_counter() - started) * 1000.0
+        entry.loaded_at = time.time()
+        self._ensure_sweeper()
+        return entry.model
+
+    def embeddings(self, notes: List[str] | None = None, *, use_server: bool = True) -> Embeddings:
+        provider = str(getattr(settings, "embeddings_provider", "mock"))
+        model_name = str(getattr(settings, "bge_m3_model_name", "BAAI/bge-m3"))
+        device = getattr(settings, "rag_device", None)
+        if _use_server(use_server):
+            # The model server owns the configured provider; this process only holds a client.
+            provider, model_name, device = "server", str(settings.model_server_socket), None
+        elif provider in ("mock", "hashing_ngram"):
+            model_name, device = provider, None
+        return self._get(
+            ("embeddings", provider, model_name, str(device or "")),
+            lambda: _load_embeddings(provider, model_name, device),
+            MockEmbeddings,
+            notes,
+        )
+
+    def reranker(self, notes: List[str] | None = None, *, use_server: bool = True) -> Reranker:
+        provider = str(getattr(settings, "rerank_provider", "mock"))
+        model_name = str(getattr(settings, "bge_rerank_model_name", "BAAI/bge-reranker-v2-m3"))
+        device = getattr(settings, "rag_device", None)
+        if _use_server(use_server):
+            provider, model_name, device = "server", str(settings.model_server_socket), None
+        elif provider == "mock":
+            model_name, device = "mock", None
+        return self._get(
+            ("reranker", provider, model_name, str(device or "")),
+            lambda: _load_reranker(provider, model_name, device),
+            MockReranker,
+            notes,
+        )
+
+    # ---- warm-up / readiness -------------------------------------------
+
+    def warm_up(self, notes: List[str] | None = None, *, use_server: bool = True) -> None:
+        """Load the configured models and run one tiny forward pass each."""
+        self._warming = True
+        try:
+            self.embeddings(notes, use_server=use_server).embed_query("warm-up")
+            self.reranker(notes, use_server=use_server).rerank(query="warm-up", texts=["warm-up"])
+        finally:
+            self._warming = False
+            self._warmed = True
+
+    def warm_up_in_background(self) -> threading.Thread:
+        self._warming = True
+        t = threading.Thread(target=self.warm_up, name="model-warmup", daemon=True)
+        t.start()
+        return t
+
+    def ready(self) -> bool:
+        if self._warming:
+            return False
+        if _use_server(True):
+            # Not ready while the model server cannot be reached (attempts follow the backoff).
+            try:
+                self.embeddings()
+                self.reranker()
+            except Exception:
+                return False
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            entries = list(self._entries.values())
+        models = []
+        for e in entries:
+            kind, provider, model_name, device = e.key
+            models.append(
+                {
+                    "kind": kind,
+                    "provider": provider,
+                    "model_name": model_name,
+                    "device": device or None,
+                    "loaded": e.model is not None,
+                    "fallback": e.fallback,
+                    "error": e.error,
+                    "load_ms": e.load_ms,
+                    "idle_s": (now - e.last_used) if e.last_used else None,
+                }
+            )
+        return {"ready": self.ready(), "warmed_up": self._warmed, "idle_unload_s": self.idle_unload_s, "models": models}
+
+    # ---- idle unload ---------------------------------------------------
+
+    def unload_idle(self, now: float | None = None) -> int:
+        if self.idle_unload_s <= 0:
+            return 0
+        now = time.time() if now is None else now
+        dropped = 0
+        with self._lock:
+            entries = list(self._entries.values())
+        for e in entries:
+            if e.model is None or now - e.last_used < self.idle_unload_s:
+                continue
+            with e.lock:
+                if e.model is not None and now - e.last_used >= self.idle_unload_s:
+                    # Callers still holding the instance keep it alive until they finish.
+                    e.model = None
+                    e.loaded_at = None
+                    dropped += 1
+        if dropped:
+            gc.collect()
+            try:
+                import torch  # type: ignore
+
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except Exception:
+                pass
+        return dropped
+
+    def _ensure_sweeper(self) -> None:
+        if self.idle_unload_s <= 0 or self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            interval = max(1.0, min(60.0, self.idle_unload_s / 2))
+
+            def sweep() -> None:
+                while True:
+                    time.sleep(interval)
+                    self.unload_idle()
+
+            self._sweeper = threading.Thread(target=sweep, name="model-idle-unload", daemon=True)
+            self._sweeper.start()
+
+
+model_registry = ModelRegistry(idle_unload_s=float(getattr(settings, "rag_model_idle_unload_s", 0.0)))
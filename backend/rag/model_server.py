@@ -0,0 +1,167 @@
+"""Local model server: one process owns the embedder and reranker for every uvicorn worker.
+
+Workers connect over a Unix socket (MODEL_SERVER_SOCKET) through rag.model_client. Requests
+arriving within MODEL_SERVER_BATCH_WAIT_MS of each other are merged into one model call.
+
+Usage (from backend/, same .env as the API):
+    python -m rag.model_server
+"""
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Connection, Listener
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.core.config import settings
+from rag.embeddings_mock import MockEmbeddings
+from rag.model_registry import model_registry
+from rag.rerank_mock import MockReranker
+
+
+class _MicroBatcher:
+    """
+    Collects requests for up to `wait_ms` after the first one (or until `max_items` texts are
+    pending) and runs them as a single call. `run` gets the request payloads and returns one
+    result per payload.
+    """
+
+    def __init__(self, name: str, run: Callable[[List[Any]], List[Any]], *, wait_ms: float, max_items: int) -> None:
+        self._run = run
+        self._wait_s = max(0.0, wait_ms) / 1000.0
+        self._max_items = max(1, int(max_items))
+        self._queue: "queue.Queue[Tuple[Any, int, Future]]" = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+        threading.Thread(target=self._loop, name=f"model-server-{name}", daemon=True).start()
+
+    def submit(self, payload: Any, size: int) -> Future:
+        fut: Future = Future()
+        self._queue.put((payload, size, fut))
+        return fut
+
+    def _loop(self) -> None:
+        while True:
+            items = [self._queue.get()]
+            pending = items[0][1]
+            deadline = time.monotonic() + self._wait_s
+            while pending < self._max_items:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                items.append(item)
+                pending += item[1]
+            try:
+                results = self._run([payload for payload, _, _ in items])
+            except Exception as e:
+                for _, _, fut in items:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(items)
+            for (_, _, fut), result in zip(items, results):
+                fut.set_result(result)
+
+
+def _embed_many(payloads: List[List[str]]) -> List[List[List[float]]]:
+    texts = [t for p in payloads for t in p]
+    vectors = model_registry.embeddings(use_server=False).embed_texts(texts) if texts else []
+    out, start = [], 0
+    for p in payloads:
+        out.append(vectors[start : start + len(p)])
+        start += len(p)
+    return out
+
+
+def _rerank_many(payloads: List[Tuple[str, List[str]]]) -> List[List[float]]:
+    reranker = model_registry.reranker(use_server=False)
+    rerank_pairs = getattr(reranker, "rerank_pairs", None)
+    if rerank_pairs is None:
+        # Rerankers without a pair API (mock) are called once per query.
+        return [reranker.rerank(query=q, texts=texts) for q, texts in payloads]
+    scores = rerank_pairs([(q, t) for q, texts in payloads for t in texts])
+    out, start = [], 0
+    for _, texts in payloads:
+        out.append(scores[start : start + len(texts)])
+        start += len(texts)
+    return out
+
+
+class ModelServer:
+    def __init__(self, socket_path: str, *, wait_ms: float, max_items: int) -> None:
+        self.socket_path = socket_path
+        self._embed = _MicroBatcher("embed", _embed_many, wait_ms=wait_ms, max_items=max_items)
+        self._rerank = _MicroBatcher("rerank", _rerank_many, wait_ms=wait_ms, max_items=max_items)
+
+    def _info(self) -> Dict[str, Any]:
+        embeddings = model_registry.embeddings(use_server=False)
+        reranker = model_registry.reranker(use_server=False)
+        return {
+            "embeddings_model": embeddings.model_name,
+            "reranker_model": reranker.model_name,
+            # Configured mocks and load-failure stand-ins alike; clients skip the cross-encoder path.
+            "embeddings_is_mock": isinstance(embeddings, MockEmbeddings),
+            "reranker_is_mock": isinstance(reranker, MockReranker),
+            "embed_batches": self._embed.batches,
+            "embed_requests": self._embed.requests,
+            "rerank_batches": self._rerank.batches,
+            "rerank_requests": self._rerank.requests,
+        }
+
+    def _handle(self, conn: Connection) -> None:
+        with conn:
+            while True:
+                try:
+                    req = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    op = req.get("op")
+                    if op == "embed":
+                        texts = list(req["texts"])
+                        result = self._embed.submit(texts, len(texts)).result()
+                    elif op == "rerank":
+                        texts = list(req["texts"])
+                        result = self._rerank.submit((str(req["query"]), texts), len(texts)).result()
+                    elif op == "info":
+                        result = self._info()
+                    else:
+                        raise ValueError(f"unknown op: {op}")
+                    conn.send({"ok": True, "result": result})
+                except Exception as e:
+                    conn.send({"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # stale socket from a previous run
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        with Listener(self.socket_path, family="AF_UNIX") as listener:
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._handle, args=(conn,), name="model-server-conn", daemon=True).start()
+
+
+def main() -> None:
+    socket_path = getattr(settings, "model_server_socket", None) or "data/model_server.sock"
+    server = ModelServer(
+        socket_path,
+        wait_ms=float(getattr(settings, "model_server_batch_wait_ms", 5.0)),
+        max_items=int(getattr(settings, "model_server_batch_max_items", 256)),
+    )
+    notes: List[str] = []
+    model_registry.warm_up(notes, use_server=False)
+    for note in notes:
+        print(note)
+    print(f"model server listening on {socket_path}: {server._info()}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
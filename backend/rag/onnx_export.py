@@ -0,0 +1,94 @@
+"""Export a local bge model directory to ONNX and optionally quantize it to int8.
+
+Writes <model>/onnx/model.onnx (fp32) and, with --quantize, <model>/onnx/model_int8.onnx
+(dynamic QInt8 weight quantization), the files EMBEDDINGS_PROVIDER=onnx_bge_m3 and
+RERANK_PROVIDER=onnx_bge load. Needs torch + transformers (export) and onnxruntime (quantize);
+none of them are needed at serving time except onnxruntime and the tokenizer.
+
+Usage (from backend/):
+    python -m rag.onnx_export --model model/bge-m3 --kind embeddings --quantize
+    python -m rag.onnx_export --model model/bge-reranker-v2-m3 --kind reranker --quantize
+"""
+from __future__ import annotations
+
+import argparse
+import os
+
+from rag.onnx_utils import FP32_FILE, INT8_FILE, ONNX_SUBDIR
+
+# Models over the 2 GB protobuf limit (bge-m3 fp32 is ~2.2 GB) keep weights in a side file.
+_EXTERNAL_DATA_BYTES = 1_800_000_000
+
+
+def export(model_dir: str, kind: str, *, opset: int = 17) -> str:
+    import torch  # type: ignore
+    from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer  # type: ignore
+
+    out_dir = os.path.join(model_dir, ONNX_SUBDIR)
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, FP32_FILE)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    if kind == "embeddings":
+        model = AutoModel.from_pretrained(model_dir)
+        sample = tokenizer(["示例文本", "另一段更长一些的示例文本"], padding=True, return_tensors="pt")
+        output_names = ["last_hidden_state"]
+        dynamic_axes = {"last_hidden_state": {0: "batch", 1: "seq"}}
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        sample = tokenizer(["查询", "查询"], ["候选段落", "另一个更长一些的候选段落"], padding=True, return_tensors="pt")
+        output_names = ["logits"]
+        dynamic_axes = {"logits": {0: "batch"}}
+    model.eval()
+
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    for name in input_names:
+        dynamic_axes[name] = {0: "batch", 1: "seq"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            out_path,
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    return out_path
+
+
+def quantize(fp32_path: str) -> str:
+    from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+
+    out_path = os.path.join(os.path.dirname(fp32_path), INT8_FILE)
+    quantize_dynamic(
+        fp32_path,
+        out_path,
+        weight_type=QuantType.QInt8,
+        use_external_data_format=_dir_bytes(os.path.dirname(fp32_path)) > _EXTERNAL_DATA_BYTES,
+    )
+    return out_path
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True, help="local HF model directory, e.g. model/bge-m3")
+    parser.add_argument("--kind", choices=["embeddings", "reranker"], required=True)
+    parser.add_argument("--quantize", action="store_true", help="also write the int8 model")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    fp32 = export(args.model, args.kind, opset=args.opset)
+    print(f"exported {fp32}")
+    if args.quantize:
+        print(f"quantized {quantize(fp32)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List
+
+# Layout written by `python -m rag.onnx_export`, next to the HF files in the model directory:
+#   <model_dir>/onnx/model.onnx        fp32 export
+#   <model_dir>/onnx/model_int8.onnx   dynamically quantized (QInt8 weights)
+ONNX_SUBDIR = "onnx"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+
+
+def resolve_onnx_file(model_dir: str, *, quantized: bool) -> str:
+    """The int8 model when requested and present, else the fp32 export."""
+    base = os.path.join(model_dir, ONNX_SUBDIR)
+    candidates = [INT8_FILE, FP32_FILE] if quantized else [FP32_FILE]
+    for name in candidates:
+        path = os.path.join(base, name)
+        if os.path.exists(path):
+            return path
+    raise RuntimeError(f"no ONNX export under {base}; run `python -m rag.onnx_export --model {model_dir}` first")
+
+
+def load_session(path: str, *, num_threads: int | None = None):
+    try:
+        import onnxruntime as ort  # type: ignore
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError("onnxruntime is required for onnx providers") from e
+
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads and num_threads > 0:
+        opts.intra_op_num_threads = int(num_threads)
+    return ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+
+
+def load_tokenizer(model_dir: str):
+    try:
+        from transformers import AutoTokenizer  # type: ignore
+    except Exception as e:  # pragma: no cover
+        raise RuntimeError("transformers is required for onnx providers (tokenizer)") from e
+    return AutoTokenizer.from_pretrained(model_dir)
+
+
+def session_inputs(session, encoded: Dict[str, Any]) -> Dict[str, Any]:
+    """Feed only the tensors the graph declares (XLM-R exports have no token_type_ids)."""
+    names: List[str] = [i.name for i in session.get_inputs()]
+    return {name: encoded[name].astype("int64") for name in names if name in encoded}
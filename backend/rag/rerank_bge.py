@@ -1,26 +1,48 @@
 from __future__ import annotations
 
-from typing import List, Sequence
+from typing import List, Sequence, Tuple
 
+from rag.batching import cap_torch_threads, estimate_tokens, token_budget_batches
 from rag.rerank_base import Reranker
 
 
 class BgeReranker(Reranker):
-    def __init__(self, *, model_name: str = "BAAI/bge-reranker-v2-m3", device: str | None = None) -> None:
+    def __init__(
+        self,
+        *,
+        model_name: str = "BAAI/bge-reranker-v2-m3",
+        device: str | None = None,
+        token_budget: int = 8192,
+        max_batch_size: int = 64,
+        num_threads: int | None = None,
+    ) -> None:
         try:
             from sentence_transformers import CrossEncoder  # type: ignore
         except Exception as e:  # pragma: no cover
             raise RuntimeError("sentence-transformers is required for local_bge reranker") from e
 
+        cap_torch_threads(num_threads)
         self._model_name = model_name
         self._model = CrossEncoder(model_name, device=device)
+        self._max_tokens = int(getattr(self._model, "max_length", 0) or 0) or None
+        self._token_budget = int(token_budget)
+        self._max_batch_size = int(max_batch_size)
 
     @property
     def model_name(self) -> str:
         return self._model_name
 
     def rerank(self, *, query: str, texts: Sequence[str]) -> List[float]:
-        pairs = [[query, t] for t in texts]
-        scores = self._model.predict(pairs, batch_size=16, show_progress_bar=False)
-        return [float(s) for s in scores]
-
+        return self.rerank_pairs([(query, t) for t in texts])
+
+    def rerank_pairs(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        """Score (query, text) pairs that may come from different queries (model server batches)."""
+        if not pairs:
+            return []
+        lengths = [estimate_tokens(q + t, self._max_tokens) for q, t in pairs]
+        out: List[float] = [0.0] * len(pairs)
+        for batch in token_budget_batches(lengths, token_budget=self._token_budget, max_batch_size=self._max_batch_size):
+            scores = self._model.predict([list(pairs[i]) for i in batch], batch_size=len(batch), show_progress_bar=False)
+            for i, s in zip(batch, scores):
+                out[i] = float(s)
+        return out
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import Session
+
+from rag.cache import LRUCache
+from rag.chunking import content_hash
+
+# Stay well below SQLite's default bound-parameter limit for IN (...) lookups.
+_LOOKUP_BATCH = 500
+
+
+class RerankScoreCache:
+    """
+    Cross-encoder scores keyed by (model, sha256(query), sha256(chunk text)), in the
+    `rerank_cache` table with an in-memory LRU in front. A chunk whose text changes gets a
+    new content hash, so stale scores are never returned; they simply age out.
+
+    ttl_s <= 0 keeps entries forever; max_rows <= 0 leaves the table unbounded. Expiry runs on
+    store() at most every expire_interval_s, or sooner once an approximate row count (the last
+    COUNT plus rows stored since) passes max_rows by a small slack, so the hot path normally
+    skips the COUNT and DELETE.
+    """
+
+    def __init__(self, *, memory_size: int, ttl_s: float, max_rows: int, expire_interval_s: float = 60.0) -> None:
+        self._memory = LRUCache(memory_size)  # key -> (score, stored_at epoch seconds)
+        self.ttl_s = float(ttl_s)
+        self.max_rows = int(max_rows)
+        self.expire_interval_s = float(expire_interval_s)
+        # Overshoot tolerated before a size-triggered expiry, so a full table is not counted per store.
+        self._row_slack = max(100, self.max_rows // 20)
+        self._lock = threading.Lock()
+        self._approx_rows: int | None = None  # None until the first expiry counts the table
+        self._last_expire = 0.0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_name: str, query: str, text: str) -> str:
+        return f"{model_name}:{content_hash(query)}:{content_hash(text)}"
+
+    def _fresh(self, stored_at: float, now: float) -> bool:
+        return self.ttl_s <= 0 or now - stored_at <= self.ttl_s
+
+    def lookup(self, db: Session, keys: Sequence[str]) -> Dict[str, float]:
+        now = time.time()
+        found: Dict[str, float] = {}
+        pending: List[str] = []
+        for k in dict.fromkeys(keys):
+            hit = self._memory.get(k)
+            if hit is not None and self._fresh(hit[1], now):
+                found[k] = hit[0]
+            else:
+                pending.append(k)
+        memory_hits = len(found)
+
+        # One IN query per batch for whatever the LRU did not have.
+        for start in range(0, len(pending), _LOOKUP_BATCH):
+            batch = pending[start : start + _LOOKUP_BATCH]
+            placeholders = ",".join([f":k{i}" for i in range(len(batch))])
+            params: Dict[str, Any] = {f"k{i}": k for i, k in enumerate(batch)}
+            where_ttl = ""
+            if self.ttl_s > 0:
+                where_ttl = " AND created_at >= :cutoff"
+                params["cutoff"] = now - self.ttl_s
+            rows = db.execute(
+                sql_text(f"SELECT cache_key, score, created_at FROM rerank_cache WHERE cache_key IN ({placeholders}){where_ttl}"),
+                params,
+            ).fetchall()
+            for cache_key, score, created_at in rows:
+                found[cache_key] = float(score)
+                self._memory.put(cache_key, (float(score), float(created_at)))
+
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.disk_hits += len(found) - memory_hits
+            self.misses += len(pending) - (len(found) - memory_hits)
+        return found
+
+    def store(self, db: Session, model_name: str, scores: Sequence[Tuple[str, float]]) -> None:
+        if not scores:
+            return
+        now = time.time()
+        db.execute(
+            sql_text(
+                "INSERT INTO rerank_cache(cache_key, model_name, score, created_at) VALUES(:k,:m,:s,:t) "
+                "ON CONFLICT(cache_key) DO UPDATE SET model_name = excluded.model_name, score = excluded.score, "
+                "created_at = excluded.created_at"
+            ),
+            [{"k": k, "m": model_name, "s": float(s), "t": now} for k, s in scores],
+        )
+        for k, s in scores:
+            self._memory.put(k, (float(s), now))
+        if self._expire_due(now, len(scores)):
+            self._expire(db, now)
+
+    def _expire_due(self, now: float, added: int) -> bool:
+        if self.ttl_s <= 0 and self.max_rows <= 0:
+            return False
+        with self._lock:
+            if self._approx_rows is not None:
+                # Upserts of existing keys are counted too; the next COUNT corrects the estimate.
+                self._approx_rows += added
+            due = (
+                self._approx_rows is None
+                or now - self._last_expire >= self.expire_interval_s
+                or (self.max_rows > 0 and self._approx_rows > self.max_rows + self._row_slack)
+            )
+            if due:
+                # Claim this round so concurrent stores do not run it too.
+                self._last_expire = now
+                self._approx_rows = self._approx_rows or 0
+            return due
+
+    def _expire(self, db: Session, now: float) -> None:
+        if self.ttl_s > 0:
+            db.execute(sql_text("DELETE FROM rerank_cache WHERE created_at < :cutoff"), {"cutoff": now - self.ttl_s})
+        if self.max_rows > 0:
+            rows = int(db.execute(sql_text("SELECT COUNT(1) FROM rerank_cache")).scalar() or 0)
+            with self._lock:
+                self._approx_rows = min(rows, self.max_rows)
+            excess = rows - self.max_rows
+            if excess <= 0:
+                return
+            # Oldest first; created_at is indexed.
+            db.execute(
+                sql_text(
+                    """
+                    DELETE FROM rerank_cache WHERE cache_key IN (
+                      SELECT cache_key FROM rerank_cache ORDER BY created_at ASC LIMIT :excess
+                    )
+                    """
+                ),
+                {"excess": excess},
+            )
+
+    def stats(self, db: Session) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            out: Dict[str, Any] = {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (hits / total) if total else 0.0,
+            }
+        out["rows"] = int(db.execute(sql_text("SELECT COUNT(1) FROM rerank_cache")).scalar() or 0)
+        out["memory_size"] = self._memory.stats()["size"]
+        return out
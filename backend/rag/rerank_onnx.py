@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import List, Sequence, Tuple
+
+from rag.batching import token_budget_batches
+from rag.onnx_utils import load_session, load_tokenizer, resolve_onnx_file, session_inputs
+from rag.rerank_base import Reranker
+
+
+class OnnxBgeReranker(Reranker):
+    """bge-reranker cross-encoder on ONNX Runtime; sigmoid(logit) like CrossEncoder.predict."""
+
+    def __init__(
+        self,
+        *,
+        model_dir: str = "model/bge-reranker-v2-m3",
+        quantized: bool = True,
+        max_length: int = 512,
+        token_budget: int = 8192,
+        max_batch_size: int = 64,
+        num_threads: int | None = None,
+    ) -> None:
+        try:
+            import numpy  # type: ignore  # noqa: F401
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError("numpy is required for onnx_bge") from e
+
+        self._path = resolve_onnx_file(model_dir, quantized=quantized)
+        self._session = load_session(self._path, num_threads=num_threads)
+        self._tokenizer = load_tokenizer(model_dir)
+        self._model_name = f"{model_dir}:onnx{'-int8' if self._path.endswith('_int8.onnx') else ''}"
+        self._max_length = int(max_length)
+        self._token_budget = int(token_budget)
+        self._max_batch_size = int(max_batch_size)
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    def rerank(self, *, query: str, texts: Sequence[str]) -> List[float]:
+        return self.rerank_pairs([(query, t) for t in texts])
+
+    def rerank_pairs(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        import numpy as np  # type: ignore
+
+        if not pairs:
+            return []
+        queries = [q for q, _ in pairs]
+        texts = [t for _, t in pairs]
+        ids = self._tokenizer(queries, texts, truncation=True, max_length=self._max_length)["input_ids"]
+        out: List[float] = [0.0] * len(pairs)
+        for batch in token_budget_batches(
+            [len(x) for x in ids], token_budget=self._token_budget, max_batch_size=self._max_batch_size
+        ):
+            encoded = self._tokenizer(
+                [queries[i] for i in batch],
+                [texts[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self._max_length,
+                return_tensors="np",
+            )
+            logits = self._session.run(None, session_inputs(self._session, encoded))[0].reshape(-1)
+            scores = 1.0 / (1.0 + np.exp(-logits))
+            for i, s in zip(batch, scores.tolist()):
+                out[i] = float(s)
+        return out
@@ -1,212 +1,385 @@
 from __future__ import annotations
 
+import contextvars
 import datetime as dt
 import json
-import os
+import threading
+import time
 import uuid
-from dataclasses import asdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from dataclasses import asdict, fields, replace
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
-from sqlalchemy import text as sql_text
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.db.models import RagChunk
 from app.db.session import SessionLocal
-from rag.chunking import chunk_novel_text
-from rag.embeddings_bge_m3 import BgeM3Embeddings
-from rag.embeddings_mock import MockEmbeddings
-from rag.rerank_bge import BgeReranker
+from app.db.unit_of_work import UnitOfWork
+from rag.cache import LRUCache
+from rag.chunking import chunk_novel_text, content_hash
+from rag.model_registry import model_registry
+from rag.rerank_cache import RerankScoreCache
 from rag.rerank_mock import MockReranker, rule_score
-from rag.types import Chunk, RetrievalDebug
+from rag.storage_base import ChunkStorage, get_chunk_storage
+from rag.types import Chunk, IndexPlan, RetrievalDebug, RetrievalTrace
+from rag.vector_codec import pack_vector, unpack_vector
+from rag.vector_store_base import VectorStore
+from rag.vector_store_chroma import ChromaVectorStore
+from rag.vector_store_numpy import NumpyVectorStore
+
+# Process-wide so every RAGService instance shares hits. Result entries are keyed on the project's
+# index generation, which index_document bumps, so they go stale exactly when the index changes.
+_query_embedding_cache = LRUCache(int(getattr(settings, "rag_query_cache_size", 512)))
+_result_cache = LRUCache(int(getattr(settings, "rag_result_cache_size", 256)))
+_rerank_score_cache = RerankScoreCache(
+    memory_size=int(getattr(settings, "rag_rerank_cache_memory_size", 4096)),
+    ttl_s=float(getattr(settings, "rag_rerank_cache_ttl_s", 7 * 24 * 3600.0)),
+    max_rows=int(getattr(settings, "rag_rerank_cache_max_rows", 200_000)),
+    expire_interval_s=float(getattr(settings, "rag_rerank_cache_expire_interval_s", 60.0)),
+)
+
+# One store per (backend, directory) per process: every RAGService shares its in-memory index
+# and locks, so writers in this process serialise on them instead of racing on the files.
+_vector_stores: Dict[Tuple[str, str], VectorStore] = {}
+_vector_stores_lock = threading.Lock()
+
+# Fallback notes ("... fallback to mock", channel timeouts) for the current request. The RAGService
+# is shared by concurrent requests, so the list lives in the request's context, not on the
+# instance; RAGNotesMiddleware starts a fresh one per request.
+rag_notes: contextvars.ContextVar[List[str] | None] = contextvars.ContextVar("rag_notes", default=None)
+
+_channel_pool: ThreadPoolExecutor | None = None
+_channel_pool_lock = threading.Lock()
+
+
+def _get_channel_pool() -> ThreadPoolExecutor:
+    # Shared by every RAGService in the process so concurrent requests stay bounded.
+    global _channel_pool
+    with _channel_pool_lock:
+        if _channel_pool is None:
+            _channel_pool = ThreadPoolExecutor(
+                max_workers=int(getattr(settings, "rag_channel_workers", 8)),
+                thread_name_prefix="rag-channel",
+            )
+        return _channel_pool
+
+
+def _vector_where(types: Sequence[str] | None, chapter_no_max_for_chapter: int | None) -> Dict[str, Any]:
+    """type IN types AND (type != chapter OR chapter_no <= cmax), in Chroma where syntax."""
+    clauses: List[Dict[str, Any]] = []
+    if types:
+        clauses.append({"type": {"$in": list(types)}})
+    if chapter_no_max_for_chapter is not None and (not types or "chapter" in types):
+        clauses.append({"$or": [{"type": {"$ne": "chapter"}}, {"chapter_no": {"$lte": int(chapter_no_max_for_chapter)}}]})
+    if not clauses:
+        return {}
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def _selectable(c: Chunk, *, types: Sequence[str] | None, chapter_no_max_for_chapter: int | None) -> bool:
+    if types and c.type not in types:
+        return False
+    if chapter_no_max_for_chapter is not None and c.type == "chapter":
+        try:
+            chapter_no = (c.metadata or {}).get("chapter_no")
+            if chapter_no and int(chapter_no) > chapter_no_max_for_chapter:
+                return False
+        except Exception:
+            pass
+    return True
+
+
+def _copy_trace(src: RetrievalTrace, dst: RetrievalTrace) -> None:
+    for f in fields(RetrievalTrace):
+        value = getattr(src, f.name)
+        if isinstance(value, list):
+            value = [replace(v) if isinstance(v, Chunk) else v for v in value]
+        elif isinstance(value, dict):
+            value = dict(value)
+        setattr(dst, f.name, value)
+
+
+def _timed(fn, *args, **kwargs) -> Tuple[Any, float]:
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - t0) * 1000.0
 
 
 class RAGService:
     def __init__(self) -> None:
-        self._chroma = None
+        self._storage: ChunkStorage | None = None
+        self._vector_store: VectorStore | None = None
         self._embeddings = None
         self._reranker = None
-        self._notes: List[str] = []
-
-    def _get_chroma(self):
-        if self._chroma is not None:
-            return self._chroma
-        try:
-            import chromadb  # type: ignore
-        except Exception as e:  # pragma: no cover
-            raise RuntimeError("chromadb is required") from e
-
-        persist_dir = getattr(settings, "chroma_persist_dir", "data/chroma")
-        os.makedirs(persist_dir, exist_ok=True)
-        self._chroma = chromadb.PersistentClient(path=persist_dir)
-        return self._chroma
 
-    def _collection(self, project_id: str):
-        client = self._get_chroma()
-        name = f"project_{project_id}"
-        return client.get_or_create_collection(name=name)
+    @property
+    def storage(self) -> ChunkStorage:
+        if self._storage is None:
+            self._storage = get_chunk_storage()
+        return self._storage
+
+    def _get_vector_store(self) -> VectorStore:
+        if self._vector_store is not None:
+            return self._vector_store
+        backend = getattr(settings, "vector_backend", "chroma")
+        with _vector_stores_lock:
+            if backend == "numpy":
+                key = ("numpy", str(getattr(settings, "vector_index_dir", "data/vectors")))
+                try:
+                    if key not in _vector_stores:
+                        _vector_stores[key] = NumpyVectorStore(persist_dir=key[1])
+                    self._vector_store = _vector_stores[key]
+                    return self._vector_store
+                except Exception:
+                    self._notes.append("Vector backend numpy load failed; fallback to chroma.")
+            key = ("chroma", str(getattr(settings, "chroma_persist_dir", "data/chroma")))
+            if key not in _vector_stores:
+                _vector_stores[key] = ChromaVectorStore(persist_dir=key[1])
+            self._vector_store = _vector_stores[key]
+        return self._vector_store
 
     def _get_embeddings(self):
+        # An explicitly assigned instance wins (benchmarks); otherwise the process-wide shared model.
         if self._embeddings is not None:
             return self._embeddings
-        provider = getattr(settings, "embeddings_provider", "mock")
-        if provider == "local_bge_m3":
-            try:
-                self._embeddings = BgeM3Embeddings(
-                    model_name=getattr(settings, "bge_m3_model_name", "BAAI/bge-m3"),
-                    device=getattr(settings, "rag_device", None),
-                )
-            except Exception:
-                self._embeddings = MockEmbeddings()
-                self._notes.append("Embeddings local_bge_m3 load failed; fallback to mock.")
-        else:
-            self._embeddings = MockEmbeddings()
-        return self._embeddings
+        return model_registry.embeddings(self._notes)
 
     def _get_reranker(self):
         if self._reranker is not None:
             return self._reranker
-        provider = getattr(settings, "rerank_provider", "mock")
-        if provider == "local_bge":
-            try:
-                self._reranker = BgeReranker(
-                    model_name=getattr(settings, "bge_rerank_model_name", "BAAI/bge-reranker-v2-m3"),
-                    device=getattr(settings, "rag_device", None),
-                )
-            except Exception:
-                self._reranker = MockReranker()
-                self._notes.append("Reranker local_bge load failed; fallback to mock.")
-        else:
-            self._reranker = MockReranker()
-        return self._reranker
-
-    def pop_notes(self) -> List[str]:
-        notes = self._notes[:]
-        self._notes.clear()
+        return model_registry.reranker(self._notes)
+
+    @property
+    def _notes(self) -> List[str]:
+        notes = rag_notes.get()
+        if notes is None:
+            # Outside a request (scripts, benchmarks): one list for this context.
+            notes = []
+            rag_notes.set(notes)
         return notes
 
-    def _embed_cached(self, db: Session, texts: List[str]) -> List[List[float]]:
+    def _submit_timed(self, fn, *args, **kwargs) -> Future:
+        """_timed(fn, ...) on the channel pool, in a copy of this context so notes reach the request's list."""
+        self._notes  # create the list here, not in the worker's copy
+        return _get_channel_pool().submit(contextvars.copy_context().run, _timed, fn, *args, **kwargs)
+
+    def pop_notes(self) -> List[str]:
+        """Notes recorded for the current request since the last pop."""
+        notes = self._notes
+        popped = notes[:]
+        notes.clear()
+        return popped
+
+    def _embed_cached(
+        self, db: Session, texts: List[str], *, pending: List[Dict[str, Any]] | None = None
+    ) -> List[List[float]]:
+        """Cached embeddings; new cache rows are written to `db`, or appended to `pending` if given."""
         model_name = self._get_embeddings().model_name
-        out: List[List[float]] = []
-        missing: List[Tuple[int, str, str]] = []
-        for idx, t in enumerate(texts):
-            cache_key = f"{model_name}:{uuid.uuid5(uuid.NAMESPACE_DNS, t)}"
-            row = db.execute(
-                sql_text("SELECT vector_json FROM embeddings_cache WHERE cache_key = :k"),
-                {"k": cache_key},
-            ).fetchone()
-            if row:
-                out.append(json.loads(row[0]))
-            else:
-                out.append([])
-                missing.append((idx, cache_key, t))
+        keys = [f"{model_name}:{uuid.uuid5(uuid.NAMESPACE_DNS, t)}" for t in texts]
+
+        found: Dict[str, List[float]] = {
+            cache_key: unpack_vector(blob, dim, dtype)
+            for cache_key, (dim, dtype, blob) in self.storage.get_embeddings(db, keys).items()
+        }
+
+        missing: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
 
         if missing:
-            vectors = self._get_embeddings().embed_texts([t for _, _, t in missing])
+            vectors = self._get_embeddings().embed_texts(list(missing.values()))
+            dtype = str(getattr(settings, "embeddings_cache_dtype", "float32"))
             now = dt.datetime.now(dt.timezone.utc).isoformat()
-            for (idx, cache_key, _), vec in zip(missing, vectors):
-                out[idx] = vec
-                db.execute(
-                    sql_text(
-                        "INSERT OR REPLACE INTO embeddings_cache(cache_key, model_name, vector_json, created_at) VALUES(:k,:m,:v,:t)"
-                    ),
-                    {"k": cache_key, "m": model_name, "v": json.dumps(vec), "t": now},
+            params = []
+            for cache_key, vec in zip(missing.keys(), vectors):
+                vec = [float(x) for x in vec]
+                found[cache_key] = vec
+                params.append(
+                    {"k": cache_key, "m": model_name, "d": len(vec), "dt": dtype, "v": pack_vector(vec, dtype), "t": now}
                 )
-        return out
-
-    def index_document(self, project_id: str, type: str, text: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+            if pending is not None:
+                pending.extend(params)
+            else:
+                self.storage.put_embeddings(db, params)
+        return [found[k] for k in keys]
+
+    def _embed_query_cached(self, query: str) -> List[float]:
+        embeddings = self._get_embeddings()
+        key = (embeddings.model_name, query)
+        vec = _query_embedding_cache.get(key)
+        if vec is None:
+            vec = embeddings.embed_query(query)
+            _query_embedding_cache.put(key, vec)
+        return vec
+
+    def plan_index(self, project_id: str, type: str, text: str, metadata: Dict[str, Any]) -> IndexPlan:
+        """Chunk, diff against the stored chunks and embed; reads only, nothing is written yet."""
         chunks = chunk_novel_text(
             text,
             max_chars=int(getattr(settings, "rag_max_chunk_chars", 1400)),
             overlap_ratio=float(getattr(settings, "rag_overlap_ratio", 0.2)),
         )
-        if not chunks:
-            return {"indexed_chunks": 0}
 
         source_id = str(metadata.get("source_id") or "")
         chapter_no = metadata.get("chapter_no")
+        characters = str(metadata.get("characters") or "")
+        locations = str(metadata.get("locations") or "")
+        pov = str(metadata.get("pov") or "")
+        plan = IndexPlan(project_id=project_id, type=type, source_id=source_id)
 
         with SessionLocal() as db:
-            # Remove prior chunks for this (project,type,source_id) to support updates.
+            # Diff against prior chunks for this (project,type,source_id): chunks whose content hash
+            # (and filterable metadata) is unchanged keep their id, embedding, keyword and vector entries.
+            old_by_key: Dict[Tuple[Any, ...], List[str]] = {}
             if source_id:
-                old_ids = [
-                    r[0]
-                    for r in db.execute(
-                        sql_text("SELECT id FROM rag_chunks WHERE project_id=:p AND type=:t AND source_id=:s"),
-                        {"p": project_id, "t": type, "s": source_id},
-                    ).fetchall()
-                ]
-                if old_ids:
-                    placeholders = ",".join([f":id{i}" for i in range(len(old_ids))])
-                    params = {f"id{i}": cid for i, cid in enumerate(old_ids)}
-                    db.execute(sql_text(f"DELETE FROM rag_chunks WHERE id IN ({placeholders})"), params)
-                    db.execute(sql_text(f"DELETE FROM rag_chunks_fts WHERE chunk_id IN ({placeholders})"), params)
-                    try:
-                        self._collection(project_id).delete(ids=old_ids)
-                    except Exception:
-                        pass
-
-            chunk_ids: List[str] = [str(uuid.uuid4()) for _ in chunks]
-            vectors = self._embed_cached(db, [c.text for c in chunks])
-
-            created_at = dt.datetime.now(dt.timezone.utc)
-            rows = []
-            for cid, c in zip(chunk_ids, chunks):
-                meta = dict(metadata)
-                meta.update(
-                    {
-                        "project_id": project_id,
-                        "type": type,
-                        "chapter_no": chapter_no,
-                        "chunk_id": cid,
-                        "created_at": created_at.isoformat(),
-                        "source_id": source_id,
-                        "characters": str(metadata.get("characters") or ""),
-                        "locations": str(metadata.get("locations") or ""),
-                        "pov": str(metadata.get("pov") or ""),
-                    }
-                )
-                rows.append(
-                    RagChunk(
-                        id=cid,
-                        project_id=project_id,
-                        type=type,
-                        created_at=created_at,
-                        source_id=source_id,
-                        chapter_no=chapter_no,
-                        characters=str(metadata.get("characters") or ""),
-                        locations=str(metadata.get("locations") or ""),
-                        pov=str(metadata.get("pov") or ""),
-                        text=c.text,
-                        snippet=c.snippet,
-                        metadata_json=json.dumps(meta, ensure_ascii=False),
-                    )
+                for cid, chash, cno, chars, locs, cpov in self.storage.existing_chunks(db, project_id, type, source_id):
+                    key = (chash or "", cno, chars or "", locs or "", cpov or "")
+                    old_by_key.setdefault(key, []).append(cid)
+
+            kept_ids: List[str] = []
+            added: List[Tuple[str, str, Any]] = []
+            for c in chunks:
+                chash = content_hash(c.text)
+                reuse = old_by_key.get((chash, chapter_no, characters, locations, pov))
+                if reuse:
+                    kept_ids.append(reuse.pop())
+                else:
+                    added.append((str(uuid.uuid4()), chash, c))
+            plan.removed_ids = [cid for ids in old_by_key.values() for cid in ids]
+
+            if added:
+                plan.vectors = self._embed_cached(db, [c.text for _, _, c in added], pending=plan.embedding_cache_rows)
+
+        created_at = dt.datetime.now(dt.timezone.utc)
+        for cid, chash, c in added:
+            meta = dict(metadata)
+            meta.update(
+                {
+                    "project_id": project_id,
+                    "type": type,
+                    "chapter_no": chapter_no,
+                    "chunk_id": cid,
+                    "created_at": created_at.isoformat(),
+                    "source_id": source_id,
+                    "characters": characters,
+                    "locations": locations,
+                    "pov": pov,
+                }
+            )
+            plan.rows.append(
+                RagChunk(
+                    id=cid,
+                    project_id=project_id,
+                    type=type,
+                    created_at=created_at,
+                    source_id=source_id,
+                    chapter_no=chapter_no,
+                    characters=characters,
+                    locations=locations,
+                    pov=pov,
+                    text=c.text,
+                    snippet=c.snippet,
+                    content_hash=chash,
+                    metadata_json=json.dumps(meta, ensure_ascii=False),
                 )
-
-            db.add_all(rows)
-            for cid, c in zip(chunk_ids, chunks):
-                db.execute(
-                    sql_text(
-                        "INSERT INTO rag_chunks_fts(chunk_id, project_id, type, chapter_no, text) VALUES(:id,:p,:t,:c,:x)"
-                    ),
-                    {"id": cid, "p": project_id, "t": type, "c": chapter_no, "x": c.text},
+            )
+            plan.ids.append(cid)
+            plan.metadatas.append(meta)
+            plan.documents.append(c.text)
+
+        plan.stats = {
+            "indexed_chunks": len(chunks),
+            "kept": len(kept_ids),
+            "added": len(added),
+            "removed": len(plan.removed_ids),
+        }
+        # Outside any transaction: the write that applies this plan may be a deferred UoW flush.
+        self.storage.prepare_index(plan)
+        return plan
+
+    def apply_index(self, db: Session, plan: IndexPlan) -> None:
+        """
+        SQL side of a plan (chunk rows, keyword index, embedding cache, generation bump, and the
+        vectors too if the storage keeps them); the caller commits. With a separate vector store
+        the replaced chunks stay until sync_vectors has upserted their successors.
+        """
+        self.storage.put_embeddings(db, plan.embedding_cache_rows)
+        if self.storage.stores_vectors:
+            self.storage.delete_chunks(db, plan.removed_ids)
+        if plan.rows:
+            self.storage.add_chunks(db, plan)
+        if plan.rows or plan.removed_ids:
+            self.storage.bump_index_generation(db, plan.project_id)
+
+    def sync_vectors(self, plan: IndexPlan) -> None:
+        """
+        Vector-store side of a plan, run after the SQL commit. Once the upsert succeeded the
+        replaced chunks are deleted (vector delete best-effort) and the index generation is
+        bumped again, since retrievals since the commit may have cached results without the new
+        vectors. If the upsert fails, the plan's new chunk rows are removed again and the old
+        ones kept, so SQL never lists chunks the vector store lacks and the source keeps its
+        previous chunks until the next index_document re-adds them. A no-op when the storage
+        keeps the vectors itself (they were committed with the rows).
+        """
+        if self.storage.stores_vectors:
+            return
+        ids = plan.ids
+        try:
+            store = self._get_vector_store()
+            if ids:
+                store.upsert(
+                    plan.project_id,
+                    ids=ids,
+                    embeddings=plan.vectors,
+                    metadatas=plan.metadatas,
+                    documents=plan.documents,
                 )
-
-            # Chroma upsert
+        except Exception as e:
+            with SessionLocal() as db:
+                self.storage.delete_chunks(db, ids)
+                self.storage.bump_index_generation(db, plan.project_id)
+                db.commit()
+            self._notes.append(
+                f"Vector upsert failed for {plan.type} ({len(ids)} chunks: {type(e).__name__}); rolled back, re-indexed on next write."
+            )
+            return
+        if plan.removed_ids:
             try:
-                metadatas = [json.loads(r.metadata_json) for r in rows]
-                self._collection(project_id).upsert(
-                    ids=chunk_ids,
-                    embeddings=vectors,
-                    metadatas=metadatas,
-                    documents=[c.text for c in chunks],
-                )
+                store.delete(plan.project_id, ids=plan.removed_ids)
             except Exception:
                 pass
-
+        if ids or plan.removed_ids:
+            with SessionLocal() as db:
+                self.storage.delete_chunks(db, plan.removed_ids)
+                self.storage.bump_index_generation(db, plan.project_id)
+                db.commit()
+
+    def index_document(
+        self, project_id: str, type: str, text: str, metadata: Dict[str, Any], *, uow: UnitOfWork | None = None
+    ) -> Dict[str, Any]:
+        """
+        Index one source document. With a unit of work the SQL writes wait for its flush and the
+        vector upsert runs after that commit; a later plan for the same source replaces an
+        unflushed earlier one (it was diffed against the same committed rows).
+        """
+        plan = self.plan_index(project_id, type, text, metadata)
+        if uow is not None:
+            uow.stage(
+                ("rag", project_id, type, plan.source_id or uuid.uuid4().hex),
+                write=lambda db: self.apply_index(db, plan),
+                after_commit=lambda: self.sync_vectors(plan),
+            )
+            return plan.stats
+        with SessionLocal() as db:
+            self.apply_index(db, plan)
             db.commit()
-
-        return {"indexed_chunks": len(chunks)}
+        self.sync_vectors(plan)
+        return plan.stats
 
     def _vector_retrieve(
         self,
@@ -217,36 +390,12 @@ class RAGService:
         top_k: int,
     ) -> List[Chunk]:
         try:
-            qvec = self._get_embeddings().embed_query(query)
-            res = self._collection(project_id).query(
-                query_embeddings=[qvec],
-                n_results=top_k,
-                where=where or None,
-                include=["documents", "metadatas", "distances"],
-            )
+            qvec = self._embed_query_cached(query)
+            hits = self._get_vector_store().query(project_id, embedding=qvec, top_k=top_k, where=where or None)
         except Exception:
             return []
 
-        out: List[Chunk] = []
-        ids = (res.get("ids") or [[]])[0]
-        docs = (res.get("documents") or [[]])[0]
-        metas = (res.get("metadatas") or [[]])[0]
-        dists = (res.get("distances") or [[]])[0]
-        for cid, doc, meta, dist in zip(ids, docs, metas, dists):
-            score = 1.0 / (1.0 + float(dist if dist is not None else 1.0))
-            out.append(
-                Chunk(
-                    id=str(cid),
-                    project_id=project_id,
-                    type=str((meta or {}).get("type", "")),
-                    text=str(doc),
-                    snippet=str(doc)[:240] + ("…" if len(str(doc)) > 240 else ""),
-                    score=score,
-                    channel="vector",
-                    metadata=dict(meta or {}),
-                )
-            )
-        return out
+        return [ChunkStorage.vector_chunk(project_id, hit.id, hit.document, hit.metadata, hit.distance) for hit in hits]
 
     def _keyword_retrieve(
         self,
@@ -258,91 +407,143 @@ class RAGService:
         chapter_no_max_for_chapter: int | None,
         top_k: int,
     ) -> List[Chunk]:
-        rows = []
+        ranked = self.storage.keyword_search(
+            db,
+            project_id=project_id,
+            query=query,
+            types=types,
+            chapter_no_max_for_chapter=chapter_no_max_for_chapter,
+            top_k=top_k,
+        )
+        return self.storage.load_chunks(db, project_id, ranked, channel="keyword")
+
+    def _retrieve_channels(
+        self,
+        *,
+        project_id: str,
+        query: str,
+        where: Dict[str, Any],
+        types: List[str] | None,
+        chapter_no_max_for_chapter: int | None,
+        top_k_v: int,
+        top_k_kw: int,
+        latency: Dict[str, Any] | None = None,
+    ) -> Tuple[List[Chunk], List[Chunk]]:
+        """Run the vector and keyword channels concurrently; a channel that misses its deadline contributes no hits."""
+        if self.storage.stores_vectors:
+            return self._retrieve_hybrid(
+                project_id=project_id,
+                query=query,
+                types=types,
+                chapter_no_max_for_chapter=chapter_no_max_for_chapter,
+                top_k_v=top_k_v,
+                top_k_kw=top_k_kw,
+                latency=latency,
+            )
+
+        def keyword_channel() -> List[Chunk]:
+            # Own session (and SQLite connection) per worker thread.
+            with SessionLocal() as db:
+                return self._keyword_retrieve(
+                    db,
+                    project_id=project_id,
+                    query=query,
+                    types=types,
+                    chapter_no_max_for_chapter=chapter_no_max_for_chapter,
+                    top_k=top_k_kw,
+                )
+
+        # Resolve (possibly load) the embedding model and vector store here so a cold start
+        # does not count against the channel deadline.
+        self._get_embeddings()
         try:
-            where = "project_id = :p AND rag_chunks_fts MATCH :q"
-            params: Dict[str, Any] = {"p": project_id, "q": query}
-            if types:
-                where += " AND type IN ({})".format(",".join([f":t{i}" for i in range(len(types))]))
-                for i, t in enumerate(types):
-                    params[f"t{i}"] = t
-
-            if chapter_no_max_for_chapter is not None:
-                where += " AND (type != 'chapter' OR chapter_no <= :cmax)"
-                params["cmax"] = int(chapter_no_max_for_chapter)
-
-            rows = db.execute(
-                sql_text(
-                    f"""
-                    SELECT chunk_id, type, chapter_no, bm25(rag_chunks_fts) AS rank
-                    FROM rag_chunks_fts
-                    WHERE {where}
-                    ORDER BY rank ASC
-                    LIMIT :k
-                    """
-                ),
-                {**params, "k": top_k},
-            ).fetchall()
+            self._get_vector_store()
         except Exception:
-            # Fallback (no FTS5): naive substring scoring over rag_chunks.
-            tokens = [t for t in query.replace("，", " ").replace(",", " ").split() if len(t) >= 2][:8]
-            if not tokens:
-                return []
-            where_sql = "project_id = :p"
-            params = {"p": project_id}
-            if types:
-                where_sql += " AND type IN ({})".format(",".join([f":t{i}" for i in range(len(types))]))
-                for i, t in enumerate(types):
-                    params[f"t{i}"] = t
-            if chapter_no_max_for_chapter is not None:
-                where_sql += " AND (type != 'chapter' OR chapter_no <= :cmax)"
-                params["cmax"] = int(chapter_no_max_for_chapter)
-            candidates = db.execute(
-                sql_text(f"SELECT id, type, chapter_no, text FROM rag_chunks WHERE {where_sql}"),
-                params,
-            ).fetchall()
-            scored = []
-            for cid, t, cno, txt in candidates:
-                hit = sum(txt.count(tok) for tok in tokens)
-                if hit > 0:
-                    scored.append((hit, cid, t, cno))
-            scored.sort(key=lambda x: x[0], reverse=True)
-            rows = [(cid, t, cno, 1.0 / (1.0 + hit)) for hit, cid, t, cno in scored[:top_k]]
-
-        if not rows:
-            return []
+            pass
 
-        chunk_ids = [r[0] for r in rows]
-        chunk_rows = db.execute(
-            sql_text(
-                "SELECT id, type, text, snippet, metadata_json FROM rag_chunks WHERE id IN ({})".format(
-                    ",".join([f":id{i}" for i in range(len(chunk_ids))])
-                )
-            ),
-            {f"id{i}": cid for i, cid in enumerate(chunk_ids)},
-        ).fetchall()
-        by_id = {r[0]: r for r in chunk_rows}
-
-        out: List[Chunk] = []
-        for cid, _, _, rank in rows:
-            row = by_id.get(cid)
-            if not row:
-                continue
-            score = 1.0 / (1.0 + float(rank if rank is not None else 1.0))
-            meta = json.loads(row[4] or "{}")
-            out.append(
-                Chunk(
-                    id=str(cid),
+        started = time.perf_counter()
+        futures = {
+            "vector": self._submit_timed(self._vector_retrieve, project_id=project_id, query=query, where=where, top_k=top_k_v),
+            "keyword": self._submit_timed(keyword_channel),
+        }
+        timeouts = {
+            "vector": float(getattr(settings, "rag_vector_timeout_s", 10.0)),
+            "keyword": float(getattr(settings, "rag_keyword_timeout_s", 5.0)),
+        }
+        hits: Dict[str, List[Chunk]] = {}
+        timings: Dict[str, Any] = {"timed_out": []}
+        for name, fut in futures.items():
+            remaining = max(0.0, timeouts[name] - (time.perf_counter() - started))
+            try:
+                hits[name], timings[f"{name}_ms"] = fut.result(timeout=remaining)
+            except FuturesTimeout:
+                hits[name], timings[f"{name}_ms"] = [], None
+                timings["timed_out"].append(name)
+                self._notes.append(f"RAG {name} channel timed out after {timeouts[name]:.1f}s; using the other channel only.")
+            except Exception:
+                hits[name], timings[f"{name}_ms"] = [], None
+
+        if latency is not None:
+            latency.update(timings)
+        return hits["vector"], hits["keyword"]
+
+    def _hybrid_query(
+        self,
+        *,
+        project_id: str,
+        query: str,
+        types: List[str] | None,
+        chapter_no_max_for_chapter: int | None,
+        top_k_v: int,
+        top_k_kw: int,
+    ) -> Tuple[List[Chunk], List[Chunk]]:
+        try:
+            qvec = self._embed_query_cached(query)
+        except Exception:
+            qvec = None
+        with SessionLocal() as db:
+            if qvec is None:
+                keyword_hits = self._keyword_retrieve(
+                    db,
                     project_id=project_id,
-                    type=str(row[1]),
-                    text=str(row[2]),
-                    snippet=str(row[3]),
-                    score=score,
-                    channel="keyword",
-                    metadata=meta,
+                    query=query,
+                    types=types,
+                    chapter_no_max_for_chapter=chapter_no_max_for_chapter,
+                    top_k=top_k_kw,
                 )
+                return [], keyword_hits
+            return self.storage.hybrid_search(
+                db,
+                project_id=project_id,
+                query=query,
+                embedding=qvec,
+                types=types,
+                chapter_no_max_for_chapter=chapter_no_max_for_chapter,
+                top_k_v=top_k_v,
+                top_k_kw=top_k_kw,
             )
-        return out
+
+    def _retrieve_hybrid(self, *, latency: Dict[str, Any] | None = None, **kwargs: Any) -> Tuple[List[Chunk], List[Chunk]]:
+        """Both channels as one database query (storage with in-database vectors); its time is reported for each."""
+        self._get_embeddings()
+        timeout = max(
+            float(getattr(settings, "rag_vector_timeout_s", 10.0)),
+            float(getattr(settings, "rag_keyword_timeout_s", 5.0)),
+        )
+        timings: Dict[str, Any] = {"timed_out": [], "vector_ms": None, "keyword_ms": None}
+        vector_hits: List[Chunk] = []
+        keyword_hits: List[Chunk] = []
+        try:
+            (vector_hits, keyword_hits), ms = self._submit_timed(self._hybrid_query, **kwargs).result(timeout=timeout)
+            timings["vector_ms"] = timings["keyword_ms"] = ms
+        except FuturesTimeout:
+            timings["timed_out"] = ["vector", "keyword"]
+            self._notes.append(f"RAG hybrid query timed out after {timeout:.1f}s; no retrieval hits.")
+        except Exception:
+            pass
+        if latency is not None:
+            latency.update(timings)
+        return vector_hits, keyword_hits
 
     def retrieve(
         self,
@@ -350,7 +551,154 @@ class RAGService:
         query: str,
         filters: Dict[str, Any] | None,
         top_k: int,
+        *,
+        trace: RetrievalTrace | None = None,
     ) -> List[Chunk]:
+        """
+        Hybrid retrieval + rerank. If `trace` is given it is filled from this same execution with the
+        per-channel hits, merged candidates, rerank scores, final selection and per-stage timings.
+        Results are cached per (project, index generation, query, filters, top_k).
+        """
+        started = time.perf_counter()
+        key = None
+        if _result_cache.maxsize > 0:
+            with SessionLocal() as db:
+                generation = self.storage.index_generation(db, project_id)
+            key = (
+                project_id,
+                generation,
+                query,
+                json.dumps(filters or {}, sort_keys=True, ensure_ascii=False, default=str),
+                int(top_k),
+            )
+            cached = _result_cache.get(key)
+            if cached is not None:
+                selected, cached_trace = cached
+                if trace is not None:
+                    _copy_trace(cached_trace, trace)
+                    trace.cache_hit = True
+                    trace.timings_ms = {"total_ms": (time.perf_counter() - started) * 1000.0}
+                return [replace(c) for c in selected]
+
+        run = RetrievalTrace()
+        selected = self._retrieve_uncached(project_id, query, filters, top_k, trace=run)
+        if key is not None and not run.timed_out and not run.rerank_stages.get("budget_exceeded"):
+            # Degraded (timed-out or partially reranked) results are not cached.
+            _result_cache.put(key, ([replace(c) for c in selected], run))
+        if trace is not None:
+            _copy_trace(run, trace)
+        return selected
+
+    def _rerank(
+        self, *, query: str, candidates: List[Chunk], target_chapter: int | None
+    ) -> Tuple[List[Tuple[float, Chunk]], Dict[str, Any]]:
+        """
+        Best-first (score, chunk) list plus per-stage candidate counts.
+
+        Stage 1 scores every candidate with rule_score (channel score, type weight, term hits,
+        chapter distance). With the mock reranker that is the final score. A cross-encoder then
+        only sees the top `rag_rerank_max_candidates` of stage 1, in batches, until
+        `rag_rerank_budget_ms` runs out; survivors it did not reach keep their stage-1 order
+        after the scored ones. Scores found in the rerank score cache skip the model and the budget.
+        """
+        reranker = self._get_reranker()
+        type_weights = getattr(settings, "rag_type_weights", None) or {
+            "style_guide": 1.8,
+            "world": 1.5,
+            "outline": 1.6,
+            "characters": 1.7,
+            "chapter_summary": 1.4,
+            "facts": 1.5,
+            "foreshadowing": 1.3,
+            "chapter": 1.0,
+        }
+        prior: List[Tuple[float, Chunk]] = []
+        for c in candidates:
+            meta = dict(c.metadata)
+            meta.setdefault("type", c.type)
+            meta.setdefault("chapter_no", meta.get("chapter_no"))
+            score = rule_score(
+                query=query,
+                text=c.text,
+                meta=meta,
+                base_score=c.score,
+                target_chapter=target_chapter,
+                type_weights=type_weights,
+            )
+            prior.append((score, c))
+        prior.sort(key=lambda x: x[0], reverse=True)
+
+        stages: Dict[str, Any] = {"candidates": len(candidates), "prefiltered": len(prior), "cross_encoder": 0}
+        if isinstance(reranker, MockReranker) or getattr(reranker, "is_mock", False) or not prior:
+            return prior, stages
+
+        max_n = int(getattr(settings, "rag_rerank_max_candidates", 24))
+        survivors = prior[:max_n] if max_n > 0 else prior
+        stages["prefiltered"] = len(survivors)
+
+        # Scores already computed for (model, query, chunk text) are reused; only the rest hit the model.
+        model_name = reranker.model_name
+        keys = {c.id: RerankScoreCache.key(model_name, query, c.text) for _, c in survivors}
+        try:
+            with SessionLocal() as db:
+                cached = _rerank_score_cache.lookup(db, list(keys.values()))
+        except Exception:
+            cached = {}
+        scored: List[Tuple[float, Chunk]] = []
+        todo: List[Chunk] = []
+        for _, c in survivors:
+            if keys[c.id] in cached:
+                scored.append((cached[keys[c.id]], c))
+            else:
+                todo.append(c)
+        stages["score_cache_hits"] = len(scored)
+
+        budget_ms = float(getattr(settings, "rag_rerank_budget_ms", 0) or 0)
+        batch_size = max(1, int(getattr(settings, "rag_rerank_batch_size", 16)))
+        started = time.perf_counter()
+        fresh: List[Tuple[float, Chunk]] = []
+        done = 0
+        while done < len(todo):
+            if done and budget_ms > 0 and (time.perf_counter() - started) * 1000.0 >= budget_ms:
+                stages["budget_exceeded"] = True
+                self._notes.append(
+                    f"Rerank budget {budget_ms:.0f}ms exceeded after {done}/{len(todo)} candidates; "
+                    "returning partial ranking."
+                )
+                break
+            batch = todo[done : done + batch_size]
+            try:
+                scores = reranker.rerank(query=query, texts=[c.text for c in batch])
+            except Exception as e:
+                self._notes.append(f"Rerank failed ({type(e).__name__}); keeping rule-based order.")
+                break
+            fresh.extend((float(s), c) for s, c in zip(scores, batch))
+            done += len(batch)
+
+        if fresh:
+            try:
+                with SessionLocal() as db:
+                    _rerank_score_cache.store(db, model_name, [(keys[c.id], s) for s, c in fresh])
+                    db.commit()
+            except Exception:
+                pass
+        scored.extend(fresh)
+        stages["cross_encoder"] = len(fresh)
+        scored.sort(key=lambda x: x[0], reverse=True)
+        # Cross-encoder and rule scores are not on the same scale, so unscored survivors go last.
+        prior_of = {c.id: p for p, c in survivors}
+        return [*scored, *((prior_of[c.id], c) for c in todo[done:])], stages
+
+    def _retrieve_uncached(
+        self,
+        project_id: str,
+        query: str,
+        filters: Dict[str, Any] | None,
+        top_k: int,
+        *,
+        trace: RetrievalTrace,
+    ) -> List[Chunk]:
+        started = time.perf_counter()
         types = (filters or {}).get("types")
         chapter_no = (filters or {}).get("chapter_no")
         chapter_only_before = (filters or {}).get("chapter_only_before", True)
@@ -358,27 +706,28 @@ class RAGService:
         if chapter_no and chapter_only_before:
             chapter_no_max_for_chapter = int(chapter_no) - 1
 
-        where: Dict[str, Any] = {}
-        if types:
-            where["type"] = {"$in": list(types)}
-        if chapter_no_max_for_chapter is not None:
-            # Only affects "chapter" type; implemented via rerank rule later for vector, and via WHERE for keyword.
-            pass
+        # Same predicate as the keyword channel's WHERE, pushed into the vector backend so top_k_v
+        # is not spent on future chapters.
+        where = _vector_where(types, chapter_no_max_for_chapter)
 
         topK_v = int((filters or {}).get("top_k_v", max(6, top_k)))
         topK_kw = int((filters or {}).get("top_k_kw", max(6, top_k)))
 
-        vector_hits = self._vector_retrieve(project_id=project_id, query=query, where=where, top_k=topK_v)
-
-        with SessionLocal() as db:
-            keyword_hits = self._keyword_retrieve(
-                db,
-                project_id=project_id,
-                query=query,
-                types=list(types) if types else None,
-                chapter_no_max_for_chapter=chapter_no_max_for_chapter,
-                top_k=topK_kw,
-            )
+        channel_timings: Dict[str, Any] = {}
+        vector_hits, keyword_hits = self._retrieve_channels(
+            project_id=project_id,
+            query=query,
+            where=where,
+            types=list(types) if types else None,
+            chapter_no_max_for_chapter=chapter_no_max_for_chapter,
+            top_k_v=topK_v,
+            top_k_kw=topK_kw,
+            latency=channel_timings,
+        )
+        channels_done = time.perf_counter()
+        # Snapshot before merge/rerank mutate score and channel in place.
+        trace.vector_results = [replace(c) for c in vector_hits]
+        trace.keyword_results = [replace(c) for c in keyword_hits]
 
         merged: Dict[str, Chunk] = {}
         for c in [*vector_hits, *keyword_hits]:
@@ -388,52 +737,17 @@ class RAGService:
                 merged[c.id].score = max(merged[c.id].score, c.score)
                 merged[c.id].channel = "vector+keyword"
 
-        candidates = list(merged.values())
+        # Never rerank chunks that could not be selected anyway (defensive: both channels already filter).
+        candidates = [
+            c for c in merged.values() if _selectable(c, types=types, chapter_no_max_for_chapter=chapter_no_max_for_chapter)
+        ]
+        trace.merged_candidates = [replace(c) for c in candidates]
 
         # Rerank
-        reranker = self._get_reranker()
-        texts = [c.text for c in candidates]
-        try:
-            rr_scores = reranker.rerank(query=query, texts=texts)
-        except Exception:
-            rr_scores = [c.score for c in candidates]
-
-        type_weights = getattr(settings, "rag_type_weights", None) or {
-            "style_guide": 1.8,
-            "world": 1.5,
-            "outline": 1.6,
-            "characters": 1.7,
-            "chapter_summary": 1.4,
-            "facts": 1.5,
-            "foreshadowing": 1.3,
-            "chapter": 1.0,
-        }
-        target_chapter = chapter_no
-        scored: List[Tuple[float, Chunk]] = []
-        for c, rr in zip(candidates, rr_scores):
-            meta = dict(c.metadata)
-            meta.setdefault("type", c.type)
-            meta.setdefault("chapter_no", meta.get("chapter_no"))
-            base = float(rr)
-            if isinstance(reranker, MockReranker):
-                base = rule_score(
-                    query=query,
-                    text=c.text,
-                    meta=meta,
-                    base_score=c.score,
-                    target_chapter=target_chapter,
-                    type_weights=type_weights,
-                )
-            # enforce chapter <= target-1 if needed
-            if chapter_no_max_for_chapter is not None and c.type == "chapter":
-                try:
-                    if meta.get("chapter_no") and int(meta["chapter_no"]) > chapter_no_max_for_chapter:
-                        base = -1e9
-                except Exception:
-                    pass
-            scored.append((base, c))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
+        scored, stages = self._rerank(query=query, candidates=candidates, target_chapter=chapter_no)
+        reranked = time.perf_counter()
+        trace.rerank_stages = stages
+        trace.rerank_scores = {c.id: float(score) for score, c in scored}
 
         # Category quotas
         quotas = getattr(settings, "rag_type_quotas", None) or {
@@ -449,8 +763,6 @@ class RAGService:
         selected: List[Chunk] = []
         used: Dict[str, int] = {k: 0 for k in quotas.keys()}
         for score, c in scored:
-            if score <= -1e8:
-                continue
             t = c.type
             limit = quotas.get(t, 2)
             if used.get(t, 0) >= limit:
@@ -462,6 +774,17 @@ class RAGService:
             if len(selected) >= top_k:
                 break
 
+        done = time.perf_counter()
+        trace.final_selected = [replace(c) for c in selected]
+        trace.timed_out = list(channel_timings.get("timed_out") or [])
+        trace.timings_ms = {
+            "vector_ms": channel_timings.get("vector_ms"),
+            "keyword_ms": channel_timings.get("keyword_ms"),
+            "channels_ms": (channels_done - started) * 1000.0,
+            "rerank_ms": (reranked - channels_done) * 1000.0,
+            "select_ms": (done - reranked) * 1000.0,
+            "total_ms": (done - started) * 1000.0,
+        }
         return selected
 
     def build_context(self, project_state: Dict[str, Any], retrieved_chunks: List[Chunk]) -> str:
@@ -503,46 +826,34 @@ class RAGService:
             "top_k_v": int(getattr(settings, "rag_top_k_v", 10)),
             "top_k_kw": int(getattr(settings, "rag_top_k_kw", 10)),
         }
-        # For preview, we want to expose intermediate channels too:
-        vector_hits = self._vector_retrieve(project_id=project_id, query=query, where={}, top_k=filters["top_k_v"])
-        with SessionLocal() as db:
-            keyword_hits = self._keyword_retrieve(
-                db,
-                project_id=project_id,
-                query=query,
-                types=None,
-                chapter_no_max_for_chapter=(chapter_no - 1) if chapter_no else None,
-                top_k=filters["top_k_kw"],
-            )
-        final_selected = self.retrieve(project_id, query, filters, top_k)
+        # One retrieval pass; the intermediate channels come from its trace.
+        trace = RetrievalTrace()
+        final_selected = self.retrieve(project_id, query, filters, top_k, trace=trace)
         context_string = self.build_context({}, final_selected)
-        merged = []
-        seen = set()
-        for c in [*vector_hits, *keyword_hits]:
-            if c.id in seen:
-                continue
-            seen.add(c.id)
-            merged.append(c)
         return RetrievalDebug(
             query=query,
-            vector_results=vector_hits,
-            keyword_results=keyword_hits,
-            merged_candidates=merged,
+            vector_results=trace.vector_results,
+            keyword_results=trace.keyword_results,
+            merged_candidates=trace.merged_candidates,
             final_selected=final_selected,
             context_string=context_string,
+            rerank_scores=trace.rerank_scores,
+            timings_ms=trace.timings_ms,
         )
 
     def stats(self, project_id: str) -> Dict[str, Any]:
+        """{type: {chunks, last_updated_at}} for the project's indexed chunks."""
         with SessionLocal() as db:
-            rows = db.execute(
-                sql_text(
-                    """
-                    SELECT type, COUNT(1) as cnt, MAX(created_at) as last_ts
-                    FROM rag_chunks
-                    WHERE project_id = :p
-                    GROUP BY type
-                    """
-                ),
-                {"p": project_id},
-            ).fetchall()
+            rows = self.storage.chunk_stats(db, project_id)
         return {r[0]: {"chunks": int(r[1]), "last_updated_at": r[2]} for r in rows}
+
+    def cache_stats(self, project_id: str) -> Dict[str, Any]:
+        with SessionLocal() as db:
+            generation = self.storage.index_generation(db, project_id)
+            rerank_scores = _rerank_score_cache.stats(db)
+        return {
+            "index_generation": generation,
+            "query_embeddings": _query_embedding_cache.stats(),
+            "results": _result_cache.stats(),
+            "rerank_scores": rerank_scores,  # process-wide, not per project
+        }
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy import text as sql_text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from rag.types import Chunk, IndexPlan
+
+# Stay well below SQLite's default bound-parameter limit for IN (...) lookups.
+_LOOKUP_BATCH = 500
+
+
+def _in_params(values: Sequence[Any], prefix: str) -> Tuple[str, Dict[str, Any]]:
+    placeholders = ",".join([f":{prefix}{i}" for i in range(len(values))])
+    return placeholders, {f"{prefix}{i}": v for i, v in enumerate(values)}
+
+
+def filter_sql(types: Sequence[str] | None, chapter_no_max_for_chapter: int | None, *, alias: str = "") -> Tuple[str, Dict[str, Any]]:
+    """`AND type IN types AND (type != chapter OR chapter_no <= cmax)`; same predicate as the vector where."""
+    col = f"{alias}." if alias else ""
+    sql, params = "", {}
+    if types:
+        placeholders, params = _in_params(list(types), "t")
+        sql += f" AND {col}type IN ({placeholders})"
+    if chapter_no_max_for_chapter is not None:
+        sql += f" AND ({col}type <> 'chapter' OR {col}chapter_no <= :cmax)"
+        params["cmax"] = int(chapter_no_max_for_chapter)
+    return sql, params
+
+
+class ChunkStorage(ABC):
+    """
+    Relational side of the RAG index: chunk rows, the keyword index, the embedding cache and
+    the per-project index generation. Plain SQL that runs unchanged on SQLite and PostgreSQL
+    lives here; backends supply the schema and the keyword (and optionally vector) index.
+    """
+
+    # True when vectors live next to the chunk rows (written in the same transaction, queried
+    # with hybrid_search) instead of in a separate VectorStore.
+    stores_vectors = False
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def init_schema(self, conn: Connection) -> None:
+        """Create the backend's tables (embeddings_cache, rag_index_generations, keyword index)."""
+        raise NotImplementedError
+
+    def prepare_index(self, plan: IndexPlan) -> None:
+        """Schema a plan needs (e.g. per-dimension vector indexes), set up before its write transaction."""
+
+    @abstractmethod
+    def _insert_index(self, db: Session, plan: IndexPlan) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _delete_index(self, db: Session, ids: Sequence[str]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def keyword_search(
+        self,
+        db: Session,
+        *,
+        project_id: str,
+        query: str,
+        types: Sequence[str] | None,
+        chapter_no_max_for_chapter: int | None,
+        top_k: int,
+    ) -> List[Tuple[str, float]]:
+        """(chunk id, score in (0, 1]) best first."""
+        raise NotImplementedError
+
+    def hybrid_search(
+        self,
+        db: Session,
+        *,
+        project_id: str,
+        query: str,
+        embedding: Sequence[float],
+        types: Sequence[str] | None,
+        chapter_no_max_for_chapter: int | None,
+        top_k_v: int,
+        top_k_kw: int,
+    ) -> Tuple[List[Chunk], List[Chunk]]:
+        """(vector chunks, keyword chunks) from one query; only backends with stores_vectors implement it."""
+        raise NotImplementedError
+
+    # --- chunks -------------------------------------------------------------
+
+    def existing_chunks(self, db: Session, project_id: str, type: str, source_id: str) -> List[Tuple[Any, ...]]:
+        """(id, content_hash, chapter_no, characters, locations, pov) of a source's stored chunks."""
+        return db.execute(
+            sql_text(
+                "SELECT id, content_hash, chapter_no, characters, locations, pov "
+                "FROM rag_chunks WHERE project_id=:p AND type=:t AND source_id=:s"
+            ),
+            {"p": project_id, "t": type, "s": source_id},
+        ).fetchall()
+
+    def add_chunks(self, db: Session, plan: IndexPlan) -> None:
+        db.add_all(plan.rows)
+        # Keyword/vector index rows may reference the chunk rows (FK), so insert those first.
+        db.flush()
+        self._insert_index(db, plan)
+
+    def delete_chunks(self, db: Session, ids: Sequence[str]) -> None:
+        if not ids:
+            return
+        self._delete_index(db, ids)
+        placeholders, params = _in_params(list(ids), "id")
+        db.execute(sql_text(f"DELETE FROM rag_chunks WHERE id IN ({placeholders})"), params)
+
+    def load_chunks(self, db: Session, project_id: str, ranked: Sequence[Tuple[str, float]], *, channel: str) -> List[Chunk]:
+        """Chunks for (id, score) pairs, in the given order; ids deleted meanwhile are skipped."""
+        if not ranked:
+            return []
+        placeholders, params = _in_params([cid for cid, _ in ranked], "id")
+        rows = db.execute(
+            sql_text(f"SELECT id, type, text, snippet, metadata_json FROM rag_chunks WHERE id IN ({placeholders})"),
+            params,
+        ).fetchall()
+        by_id = {r[0]: r for r in rows}
+        out: List[Chunk] = []
+        for cid, score in ranked:
+            row = by_id.get(cid)
+            if row:
+                out.append(self._row_chunk(project_id, row, score, channel))
+        return out
+
+    @staticmethod
+    def vector_chunk(project_id: str, cid: str, document: str, metadata: Dict[str, Any], distance: float) -> Chunk:
+        """A vector hit as a Chunk; `distance` is squared L2 (VectorHit convention)."""
+        return Chunk(
+            id=cid,
+            project_id=project_id,
+            type=str(metadata.get("type", "")),
+            text=document,
+            snippet=document[:240] + ("…" if len(document) > 240 else ""),
+            score=1.0 / (1.0 + distance),
+            channel="vector",
+            metadata=metadata,
+        )
+
+    @staticmethod
+    def _row_chunk(project_id: str, row: Sequence[Any], score: float, channel: str) -> Chunk:
+        return Chunk(
+            id=str(row[0]),
+            project_id=project_id,
+            type=str(row[1]),
+            text=str(row[2]),
+            snippet=str(row[3]),
+            score=float(score),
+            channel=channel,
+            metadata=json.loads(row[4] or "{}"),
+        )
+
+    def substring_search(
+        self,
+        db: Session,
+        *,
+        project_id: str,
+        query: str,
+        types: Sequence[str] | None,
+        chapter_no_max_for_chapter: int | None,
+        top_k: int,
+    ) -> List[Tuple[str, float]]:
+        """Naive substring scoring over rag_chunks, for when the keyword index is unavailable."""
+        tokens = [t for t in query.replace("，", " ").replace(",", " ").split() if len(t) >= 2][:8]
+        if not tokens:
+            return []
+        where, params = filter_sql(types, chapter_no_max_for_chapter)
+        candidates = db.execute(
+            sql_text(f"SELECT id, text FROM rag_chunks WHERE project_id = :p{where}"),
+            {**params, "p": project_id},
+        ).fetchall()
+        scored = []
+        for cid, txt in candidates:
+            hit = sum(txt.count(tok) for tok in tokens)
+            if hit > 0:
+                scored.append((hit, cid))
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [(cid, 1.0 / (1.0 + 1.0 / (1.0 + hit))) for hit, cid in scored[:top_k]]
+
+    def chunk_stats(self, db: Session, project_id: str) -> List[Tuple[Any, ...]]:
+        return db.execute(
+            sql_text(
+                """
+                SELECT type, COUNT(1) as cnt, MAX(created_at) as last_ts
+                FROM rag_chunks
+                WHERE project_id = :p
+                GROUP BY type
+                """
+            ),
+            {"p": project_id},
+        ).fetchall()
+
+    # --- embedding cache ----------------------------------------------------
+
+    def get_embeddings(self, db: Session, keys: Sequence[str]) -> Dict[str, Tuple[int, str, bytes]]:
+        """cache_key -> (dim, dtype, packed vector); one IN query per batch."""
+        found: Dict[str, Tuple[int, str, bytes]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), _LOOKUP_BATCH):
+            placeholders, params = _in_params(unique_keys[start : start + _LOOKUP_BATCH], "k")
+            rows = db.execute(
+                sql_text(f"SELECT cache_key, dim, dtype, vector_blob FROM embeddings_cache WHERE cache_key IN ({placeholders})"),
+                params,
+            ).fetchall()
+            for cache_key, dim, dtype, blob in rows:
+                found[cache_key] = (int(dim), str(dtype), bytes(blob))
+        return found
+
+    def put_embeddings(self, db: Session, rows: Sequence[Dict[str, Any]]) -> None:
+        """Rows with keys k (cache key), m (model), d (dim), dt (dtype), v (packed), t (iso time)."""
+        if not rows:
+            return
+        db.execute(
+            sql_text(
+                "INSERT INTO embeddings_cache(cache_key, model_name, dim, dtype, vector_blob, created_at) "
+                "VALUES(:k,:m,:d,:dt,:v,:t) "
+                "ON CONFLICT(cache_key) DO UPDATE SET model_name = excluded.model_name, dim = excluded.dim, "
+                "dtype = excluded.dtype, vector_blob = excluded.vector_blob, created_at = excluded.created_at"
+            ),
+            list(rows),
+        )
+
+    # --- index generation ---------------------------------------------------
+
+    def index_generation(self, db: Session, project_id: str) -> int:
+        row = db.execute(
+            sql_text("SELECT generation FROM rag_index_generations WHERE project_id = :p"),
+            {"p": project_id},
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def bump_index_generation(self, db: Session, project_id: str) -> None:
+        db.execute(
+            sql_text(
+                "INSERT INTO rag_index_generations(project_id, generation) VALUES(:p, 1) "
+                "ON CONFLICT(project_id) DO UPDATE SET generation = rag_index_generations.generation + 1"
+            ),
+            {"p": project_id},
+        )
+
+
+def get_chunk_storage(dialect: str | None = None) -> ChunkStorage:
+    """Storage for the configured database (DATABASE_URL, else SQLite at DB_PATH)."""
+    if dialect is None:
+        from app.db.session import engine
+
+        dialect = engine.dialect.name
+    if dialect == "postgresql":
+        from rag.storage_postgres import PostgresChunkStorage
+
+        return PostgresChunkStorage()
+    from rag.storage_sqlite import SqliteChunkStorage
+
+    return SqliteChunkStorage()
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+from typing import Dict, List, Sequence, Set, Tuple
+
+from sqlalchemy import text as sql_text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from rag.storage_base import ChunkStorage, _in_params, filter_sql
+from rag.types import Chunk, IndexPlan
+
+# Han, kana and hangul runs are indexed as overlapping character bigrams (plus lone characters),
+# everything else as lower-cased words. The lexemes are built here and passed to PostgreSQL as
+# tsvector/tsquery literals, so matching does not depend on the server's text search parser,
+# locale or installed extensions (pg_trgm, zhparser).
+_CJK_RUN = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+")
+_WORD = re.compile(r"[^\W_]+")
+_MAX_POSITION = 16383  # tsvector limits
+_MAX_POSITIONS_PER_TERM = 256
+_MAX_QUERY_TERMS = 64
+# HNSW indexes are limited to 2000 dimensions; larger embeddings fall back to exact scans.
+_HNSW_MAX_DIM = 2000
+
+
+def search_terms(text: str) -> List[str]:
+    """Lexemes of `text` in order: CJK bigrams (a lone character stays a unigram) and words."""
+    terms: List[str] = []
+    pos = 0
+    for m in _CJK_RUN.finditer(text):
+        terms.extend(w.lower() for w in _WORD.findall(text[pos : m.start()]))
+        run = m.group()
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i : i + 2] for i in range(len(run) - 1))
+        pos = m.end()
+    terms.extend(w.lower() for w in _WORD.findall(text[pos:]))
+    return terms
+
+
+def tsvector_literal(text: str) -> str:
+    positions: Dict[str, List[int]] = {}
+    for i, term in enumerate(search_terms(text), start=1):
+        bucket = positions.setdefault(term, [])
+        if len(bucket) < _MAX_POSITIONS_PER_TERM:
+            bucket.append(min(i, _MAX_POSITION))
+    # Terms contain only word characters, so quoting needs no escapes.
+    return " ".join(f"'{term}':{','.join(map(str, sorted(set(pos))))}" for term, pos in positions.items())
+
+
+def tsquery_literal(query: str) -> str:
+    """Any-term OR query; ts_rank_cd favours chunks matching more (and adjacent) terms."""
+    terms = list(dict.fromkeys(search_terms(query)))[:_MAX_QUERY_TERMS]
+    return " | ".join(f"'{t}'" for t in terms)
+
+
+def vector_literal(vec: Sequence[float]) -> str:
+    return "[" + ",".join(repr(float(x)) for x in vec) + "]"
+
+
+class PostgresChunkStorage(ChunkStorage):
+    """
+    PostgreSQL: `rag_chunk_index` holds, per chunk, a tsvector (GIN) and its pgvector embedding
+    (one HNSW partial index per dimension), so the vector upsert is part of the SQL transaction
+    and hybrid retrieval is a single statement.
+    """
+
+    stores_vectors = True
+
+    def __init__(self) -> None:
+        self._indexed_dims: Set[int] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return "postgres"
+
+    def init_schema(self, conn: Connection) -> None:
+        conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS vector")
+        conn.exec_driver_sql(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings_cache (
+              cache_key TEXT PRIMARY KEY,
+              model_name TEXT NOT NULL,
+              dim INTEGER NOT NULL,
+              dtype TEXT NOT NULL,
+              vector_blob BYTEA NOT NULL,
+              created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.exec_driver_sql(
+            """
+            CREATE TABLE IF NOT EXISTS rag_index_generations (
+              project_id TEXT PRIMARY KEY,
+              generation INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # project_id/type/chapter_no are copied from rag_chunks so both channels filter without a join.
+        conn.exec_driver_sql(
+            """
+            CREATE TABLE IF NOT EXISTS rag_chunk_index (
+              chunk_id VARCHAR(36) PRIMARY KEY REFERENCES rag_chunks(id) ON DELETE CASCADE,
+              project_id VARCHAR(36) NOT NULL,
+              type VARCHAR(50) NOT NULL,
+              chapter_no INTEGER,
+              tsv TSVECTOR NOT NULL,
+              embedding VECTOR NOT NULL
+            )
+            """
+        )
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_rag_chunk_index_project_type ON rag_chunk_index (project_id, type)")
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_rag_chunk_index_tsv ON rag_chunk_index USING gin (tsv)")
+
+    def prepare_index(self, plan: IndexPlan) -> None:
+        for dim in {len(v) for v in plan.vectors}:
+            self._ensure_vector_index(dim)
+
+    def _ensure_vector_index(self, dim: int) -> None:
+        """
+        HNSW index over embeddings of this dimension, created before the first write that needs
+        it, on its own autocommit connection: the build over existing rows must not hold locks
+        for the length of a request's transaction, nor vanish with its rollback.
+        """
+        if dim in self._indexed_dims or dim > _HNSW_MAX_DIM:
+            return
+        with self._lock:
+            if dim in self._indexed_dims:
+                return
+            from app.db.session import engine
+
+            name = f"ix_rag_chunk_index_hnsw_{dim}"
+            try:
+                with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    exists = conn.execute(
+                        sql_text("SELECT 1 FROM pg_indexes WHERE tablename = 'rag_chunk_index' AND indexname = :n"),
+                        {"n": name},
+                    ).first()
+                    if not exists:
+                        # Serialise with other processes creating the same index.
+                        conn.execute(sql_text("SELECT pg_advisory_lock(hashtext('rag_chunk_index_hnsw'))"))
+                        try:
+                            conn.execute(
+                                sql_text(
+                                    f"CREATE INDEX IF NOT EXISTS {name} ON rag_chunk_index "
+                                    f"USING hnsw ((embedding::vector({dim})) vector_l2_ops) WHERE vector_dims(embedding) = {dim}"
+                                )
+                            )
+                        finally:
+                            conn.execute(sql_text("SELECT pg_advisory_unlock(hashtext('rag_chunk_index_hnsw'))"))
+            except Exception:
+                # Retried by the next plan; queries of this dimension use exact scans meanwhile.
+                return
+            # Only once the index is committed (or already existed).
+            self._indexed_dims.add(dim)
+
+    def _insert_index(self, db: Session, plan: IndexPlan) -> None:
+        db.execute(
+            sql_text(
+                "INSERT INTO rag_chunk_index(chunk_id, project_id, type, chapter_no, tsv, embedding) "
+                "VALUES(:id, :p, :t, :c, CAST(:tsv AS tsvector), CAST(:v AS vector))"
+            ),
+            [
+                {
+                    "id": cid,
+                    "p": plan.project_id,
+                    "t": plan.type,
+                    "c": meta["chapter_no"],
+                    "tsv": tsvector_literal(doc),
+                    "v": vector_literal(vec),
+                }
+                for cid, meta, doc, vec in zip(plan.ids, plan.metadatas, plan.documents, plan.vectors)
+            ],
+        )
+
+    def _delete_index(self, db: Session, ids: Sequence[str]) -> None:
+        placeholders, params = _in_params(list(ids), "id")
+        db.execute(sql_text(f"DELETE FROM rag_chunk_index WHERE chunk_id IN ({placeholders})"), params)
+
+    def keyword_search(
+        self,
+        db: Session,
+        *,
+        project_id: str,
+        query: str,
+        types: Sequence[str] | None,
+        chapter_no_max_for_chapter: int | None,
+        top_k: int,
+    ) -> List[Tuple[str, float]]:
+        tsq = tsquery_literal(query)
+        if not tsq:
+            return []
+        where, params = filter_sql(types, chapter_no_max_for_chapter)
+        rows = db.execute(
+            sql_text(
+                f"""
+                SELECT chunk_id, ts_rank_cd(tsv, CAST(:q AS tsquery), 32) AS rank
+                FROM rag_chunk_index
+                WHERE project_id = :p AND tsv @@ CAST(:q AS tsquery){where}
+                ORDER BY rank DESC
+                LIMIT :k
+                """
+            ),
+            {**params, "p": project_id, "q": tsq, "k": top_k},
+        ).fetchall()
+        return [(str(cid), float(rank)) for cid, rank in rows]
+
+    def hybrid_search(
+        self,
+        db: Session,
+        *,
+        project_id: str,
+        query: str,
+        embedding: Sequence[float],
+        types: Sequence[str] | None,
+        chapter_no_max_for_chapter: int | None,
+        top_k_v: int,
+        top_k_kw: int,
+    ) -> Tuple[List[Chunk], List[Chunk]]:
+        dim = len(embedding)
+        where, params = filter_sql(types, chapter_no_max_for_chapter, alias="i")
+        params.update({"p": project_id, "qv": vector_literal(embedding), "kv": top_k_v})
+        # The ORDER BY expression and the dimension predicate match the partial HNSW index.
+        ctes = [
+            f"""
+            vec AS (
+              SELECT i.chunk_id, 'vector' AS channel,
+                     (i.embedding::vector({dim})) <-> CAST(:qv AS vector({dim})) AS score
+              FROM rag_chunk_index i
+              WHERE i.project_id = :p AND vector_dims(i.embedding) = {dim}{where}
+              ORDER BY (i.embedding::vector({dim})) <-> CAST(:qv AS vector({dim}))
+              LIMIT :kv
+            )
+            """
+        ]
+        selects = ["SELECT * FROM vec"]
+        tsq = tsquery_literal(query)
+        if tsq:
+            params.update({"q": tsq, "kk": top_k_kw})
+            ctes.append(
+                f"""
+                kw AS (
+                  SELECT i.chunk_id, 'keyword' AS channel, ts_rank_cd(i.tsv, CAST(:q AS tsquery), 32) AS score
+                  FROM rag_chunk_index i
+                  WHERE i.project_id = :p AND i.tsv @@ CAST(:q AS tsquery){where}
+                  ORDER BY score DESC
+                  LIMIT :kk
+                )
+                """
+            )
+            selects.append("SELECT * FROM kw")
+        rows = db.execute(
+            sql_text(
+                f"""
+                WITH {",".join(ctes)}
+                SELECT h.channel, h.chunk_id, h.score, c.type, c.text, c.snippet, c.metadata_json
+                FROM ({" UNION ALL ".join(selects)}) h
+                JOIN rag_chunks c ON c.id = h.chunk_id
+                """
+            ),
+            params,
+        ).fetchall()
+
+        vector_hits: List[Chunk] = []
+        keyword_hits: List[Chunk] = []
+        for channel, cid, score, ctype, text, snippet, metadata_json in rows:
+            if channel == "vector":
+                meta = json.loads(metadata_json or "{}")
+                # pgvector's <-> is plain L2; square it to match the VectorHit convention.
+                vector_hits.append(self.vector_chunk(project_id, str(cid), str(text), meta, float(score) ** 2))
+            else:
+                keyword_hits.append(self._row_chunk(project_id, (cid, ctype, text, snippet, metadata_json), score, "keyword"))
+        vector_hits.sort(key=lambda c: c.score, reverse=True)
+        keyword_hits.sort(key=lambda c: c.score, reverse=True)
+        return vector_hits, keyword_hits
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import text as sql_text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from rag.storage_base import ChunkStorage, _in_params, filter_sql
+from rag.types import IndexPlan
+
+EMBEDDINGS_CACHE_DDL = """
+CREATE TABLE IF NOT EXISTS embeddings_cache (
+  cache_key TEXT PRIMARY KEY,
+  model_name TEXT NOT NULL,
+  dim INTEGER NOT NULL,
+  dtype TEXT NOT NULL,
+  vector_blob BLOB NOT NULL,
+  created_at TEXT NOT NULL
+);
+"""
+
+
+class SqliteChunkStorage(ChunkStorage):
+    """SQLite: FTS5 (bm25) keyword index in `rag_chunks_fts`; vectors stay in Chroma/numpy."""
+
+    @property
+    def name(self) -> str:
+        return "sqlite"
+
+    def init_schema(self, conn: Connection) -> None:
+        conn.exec_driver_sql(EMBEDDINGS_CACHE_DDL)
+        # Bumped by every index_document that changes a project's chunks; keys the retrieval cache.
+        conn.exec_driver_sql(
+            """
+            CREATE TABLE IF NOT EXISTS rag_index_generations (
+              project_id TEXT PRIMARY KEY,
+              generation INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+        try:
+            conn.exec_driver_sql(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS rag_chunks_fts
+                USING fts5(
+                  chunk_id UNINDEXED,
+                  project_id UNINDEXED,
+                  type UNINDEXED,
+                  chapter_no UNINDEXED,
+                  text
+                );
+                """
+            )
+        except Exception:
+            # Allow running on SQLite builds without FTS5; keyword retrieval will fall back.
+            pass
+
+    def _insert_index(self, db: Session, plan: IndexPlan) -> None:
+        db.execute(
+            sql_text("INSERT INTO rag_chunks_fts(chunk_id, project_id, type, chapter_no, text) VALUES(:id,:p,:t,:c,:x)"),
+            [
+                {"id": cid, "p": plan.project_id, "t": plan.type, "c": meta["chapter_no"], "x": doc}
+                for cid, meta, doc in zip(plan.ids, plan.metadatas, plan.documents)
+            ],
+        )
+
+    def _delete_index(self, db: Session, ids: Sequence[str]) -> None:
+        placeholders, params = _in_params(list(ids), "id")
+        db.execute(sql_text(f"DELETE FROM rag_chunks_fts WHERE chunk_id IN ({placeholders})"), params)
+
+    def keyword_search(
+        self,
+        db: Session,
+        *,
+        project_id: str,
+        query: str,
+        types: Sequence[str] | None,
+        chapter_no_max_for_chapter: int | None,
+        top_k: int,
+    ) -> List[Tuple[str, float]]:
+        try:
+            where, params = filter_sql(types, chapter_no_max_for_chapter)
+            rows = db.execute(
+                sql_text(
+                    f"""
+                    SELECT chunk_id, bm25(rag_chunks_fts) AS rank
+                    FROM rag_chunks_fts
+                    WHERE project_id = :p AND rag_chunks_fts MATCH :q{where}
+                    ORDER BY rank ASC
+                    LIMIT :k
+                    """
+                ),
+                {**params, "p": project_id, "q": query, "k": top_k},
+            ).fetchall()
+        except Exception:
+            # No FTS5 (or a query FTS5 cannot parse).
+            return self.substring_search(
+                db,
+                project_id=project_id,
+                query=query,
+                types=types,
+                chapter_no_max_for_chapter=chapter_no_max_for_chapter,
+                top_k=top_k,
+            )
+        return [(str(cid), 1.0 / (1.0 + float(rank if rank is not None else 1.0))) for cid, rank in rows]
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import datetime as dt
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 
 
@@ -26,4 +26,37 @@ class RetrievalDebug:
     merged_candidates: List[Chunk]
     final_selected: List[Chunk]
     context_string: str
+    rerank_scores: Dict[str, float] = field(default_factory=dict)
+    timings_ms: Dict[str, Any] = field(default_factory=dict)
 
+
+@dataclass
+class RetrievalTrace:
+    """Intermediate results of one RAGService.retrieve call (filled when passed as `trace=`)."""
+
+    vector_results: List[Chunk] = field(default_factory=list)
+    keyword_results: List[Chunk] = field(default_factory=list)
+    merged_candidates: List[Chunk] = field(default_factory=list)
+    rerank_scores: Dict[str, float] = field(default_factory=dict)  # chunk id -> final rerank score
+    rerank_stages: Dict[str, Any] = field(default_factory=dict)  # candidates seen per cascade stage
+    final_selected: List[Chunk] = field(default_factory=list)
+    timings_ms: Dict[str, Any] = field(default_factory=dict)  # per stage; None for a timed-out channel
+    timed_out: List[str] = field(default_factory=list)
+    cache_hit: bool = False
+
+
+@dataclass
+class IndexPlan:
+    """Pending index_document writes for one source: SQL rows now, vector-store entries after commit."""
+
+    project_id: str
+    type: str
+    source_id: str
+    removed_ids: List[str] = field(default_factory=list)
+    rows: List[Any] = field(default_factory=list)  # new RagChunk rows; expired once committed
+    ids: List[str] = field(default_factory=list)  # ids, vectors, metadatas, documents align with rows
+    vectors: List[List[float]] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    documents: List[str] = field(default_factory=list)
+    embedding_cache_rows: List[Dict[str, Any]] = field(default_factory=list)
+    stats: Dict[str, Any] = field(default_factory=dict)
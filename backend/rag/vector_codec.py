@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import struct
+from typing import List, Sequence
+
+# struct format codes for the dtypes we persist; always little-endian so the
+# SQLite file stays portable between hosts.
+_FORMATS = {"float32": "f", "float16": "e"}
+
+
+def supported_dtypes() -> List[str]:
+    return list(_FORMATS.keys())
+
+
+def pack_vector(vec: Sequence[float], dtype: str = "float32") -> bytes:
+    code = _FORMATS.get(dtype)
+    if code is None:
+        raise ValueError(f"unsupported vector dtype: {dtype}")
+    return struct.pack(f"<{len(vec)}{code}", *vec)
+
+
+def unpack_vector(blob: bytes, dim: int, dtype: str = "float32") -> List[float]:
+    code = _FORMATS.get(dtype)
+    if code is None:
+        raise ValueError(f"unsupported vector dtype: {dtype}")
+    return list(struct.unpack(f"<{int(dim)}{code}", blob))
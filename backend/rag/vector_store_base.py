@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+
+@dataclass
+class VectorHit:
+    id: str
+    document: str
+    metadata: Dict[str, Any]
+    distance: float  # squared L2, same convention as Chroma's default space
+
+
+class VectorStore(ABC):
+    @abstractmethod
+    def upsert(
+        self,
+        project_id: str,
+        *,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: Sequence[Dict[str, Any]],
+        documents: Sequence[str],
+    ) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, project_id: str, *, ids: Sequence[str]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def query(
+        self,
+        project_id: str,
+        *,
+        embedding: Sequence[float],
+        top_k: int,
+        where: Dict[str, Any] | None = None,
+    ) -> List[VectorHit]:
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        raise NotImplementedError
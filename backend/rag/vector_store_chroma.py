@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Sequence
+
+from rag.vector_store_base import VectorHit, VectorStore
+
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, *, persist_dir: str = "data/chroma") -> None:
+        try:
+            import chromadb  # type: ignore
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError("chromadb is required") from e
+
+        os.makedirs(persist_dir, exist_ok=True)
+        self._client = chromadb.PersistentClient(path=persist_dir)
+        self._collections: Dict[str, Any] = {}
+
+    @property
+    def name(self) -> str:
+        return "chroma"
+
+    def _collection(self, project_id: str):
+        col = self._collections.get(project_id)
+        if col is None:
+            col = self._client.get_or_create_collection(name=f"project_{project_id}")
+            self._collections[project_id] = col
+        return col
+
+    def upsert(
+        self,
+        project_id: str,
+        *,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: Sequence[Dict[str, Any]],
+        documents: Sequence[str],
+    ) -> None:
+        self._collection(project_id).upsert(
+            ids=list(ids),
+            embeddings=[list(v) for v in embeddings],
+            # Chroma rejects None values (e.g. chapter_no of world/outline chunks); leave those keys out.
+            metadatas=[{k: v for k, v in m.items() if v is not None} for m in metadatas],
+            documents=list(documents),
+        )
+
+    def delete(self, project_id: str, *, ids: Sequence[str]) -> None:
+        self._collection(project_id).delete(ids=list(ids))
+
+    def query(
+        self,
+        project_id: str,
+        *,
+        embedding: Sequence[float],
+        top_k: int,
+        where: Dict[str, Any] | None = None,
+    ) -> List[VectorHit]:
+        res = self._collection(project_id).query(
+            query_embeddings=[list(embedding)],
+            n_results=top_k,
+            where=where or None,
+            include=["documents", "metadatas", "distances"],
+        )
+        ids = (res.get("ids") or [[]])[0]
+        docs = (res.get("documents") or [[]])[0]
+        metas = (res.get("metadatas") or [[]])[0]
+        dists = (res.get("distances") or [[]])[0]
+        return [
+            VectorHit(
+                id=str(cid),
+                document=str(doc),
+                metadata=dict(meta or {}),
+                distance=float(dist if dist is not None else 1.0),
+            )
+            for cid, doc, meta, dist in zip(ids, docs, metas, dists)
+        ]
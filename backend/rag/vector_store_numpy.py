@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence
+
+from rag.vector_store_base import VectorHit, VectorStore
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX: in-process locking only
+    fcntl = None  # type: ignore[assignment]
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class _ProjectIndex:
+    """
+    One project's flat index on disk:
+      vectors.f32  raw float32 rows (memory-mapped for queries)
+      rows.jsonl   one {"id","metadata","document"} line per row, same order
+      meta.json    {"dim": d}
+      .lock        flock()ed around every refresh + write, so workers sharing the directory
+                   never append to a file another worker is replacing
+    Appends write to the end of both files; deletes compact both files.
+    """
+
+    def __init__(self, path: str) -> None:
+        import numpy as np  # type: ignore
+
+        self._np = np
+        self.dir = path
+        self.vec_path = os.path.join(path, "vectors.f32")
+        self.rows_path = os.path.join(path, "rows.jsonl")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.lock = threading.RLock()
+        self._stamp: tuple | None = None
+        os.makedirs(path, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(path, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        with self.locked():
+            self._load()
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """This process's lock, then the cross-process file lock (held for the whole block)."""
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    # ---- loading -------------------------------------------------------
+
+    def _file_stamp(self) -> tuple | None:
+        try:
+            st = os.stat(self.rows_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _load(self) -> None:
+        np = self._np
+        os.makedirs(self.dir, exist_ok=True)
+        self.dim = 0
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = int(json.load(f).get("dim") or 0)
+
+        ids: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        documents: List[str] = []
+        if os.path.exists(self.rows_path):
+            with open(self.rows_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        row = json.loads(line)
+                    except Exception:
+                        break  # torn trailing write; everything after is dropped below
+                    ids.append(str(row["id"]))
+                    metadatas.append(dict(row.get("metadata") or {}))
+                    documents.append(str(row.get("document") or ""))
+
+        vec_bytes = os.path.getsize(self.vec_path) if os.path.exists(self.vec_path) else 0
+        vec_rows = vec_bytes // (4 * self.dim) if self.dim else 0
+        n = min(len(ids), vec_rows)
+        self.ids, self.metadatas, self.documents = ids[:n], metadatas[:n], documents[:n]
+        if n != len(ids) or vec_bytes != n * 4 * self.dim:
+            # Repair a partially written append so both files agree on the row count.
+            self._rewrite(np.array(self._open_matrix(n)))
+            return
+        self._rebuild_columns(self._open_matrix(n))
+        self._stamp = self._file_stamp()
+
+    def _open_matrix(self, n: int):
+        np = self._np
+        if n == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+
+    def _rebuild_columns(self, matrix) -> None:
+        np = self._np
+        self.matrix = matrix
+        self.row_of = {cid: i for i, cid in enumerate(self.ids)}
+        self.types = np.array([str(m.get("type", "")) for m in self.metadatas], dtype=str)
+        self.chapter_no = np.array([_as_float(m.get("chapter_no")) for m in self.metadatas], dtype=np.float64)
+        self.norms = np.einsum("ij,ij->i", matrix, matrix) if len(self.ids) else np.empty((0,), dtype=np.float32)
+
+    def refresh_if_stale(self) -> None:
+        # Another worker may have appended/compacted; reload when the sidecar changed. Call
+        # under locked(): a reload can repair (rewrite) files, and writes must see the latest rows.
+        if self._file_stamp() != self._stamp:
+            self._load()
+
+    def is_stale(self) -> bool:
+        return self._file_stamp() != self._stamp
+
+    # ---- writes --------------------------------------------------------
+
+    def _rewrite(self, matrix) -> None:
+        np = self._np
+        tmp_vec = self.vec_path + ".tmp"
+        tmp_rows = self.rows_path + ".tmp"
+        np.ascontiguousarray(matrix, dtype=np.float32).tofile(tmp_vec)
+        with open(tmp_rows, "w", encoding="utf-8") as f:
+            for cid, meta, doc in zip(self.ids, self.metadatas, self.documents):
+                f.write(json.dumps({"id": cid, "metadata": meta, "document": doc}, ensure_ascii=False) + "\n")
+        os.replace(tmp_vec, self.vec_path)
+        os.replace(tmp_rows, self.rows_path)
+        self._rebuild_columns(self._open_matrix(len(self.ids)))
+        self._stamp = self._file_stamp()
+
+    def append(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: Sequence[Dict[str, Any]],
+        documents: Sequence[str],
+    ) -> None:
+        np = self._np
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError("embeddings must be a (len(ids), dim) matrix")
+        if not self.dim:
+            self.dim = int(vectors.shape[1])
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim}, f)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"embedding dim {vectors.shape[1]} does not match index dim {self.dim}")
+
+        with open(self.vec_path, "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self.rows_path, "a", encoding="utf-8") as f:
+            for cid, meta, doc in zip(ids, metadatas, documents):
+                f.write(json.dumps({"id": str(cid), "metadata": dict(meta or {}), "document": str(doc)}, ensure_ascii=False) + "\n")
+
+        # Extend the columns for the new rows only; the existing ones are unchanged.
+        start = len(self.ids)
+        new_meta = [dict(m or {}) for m in metadatas]
+        self.ids.extend(str(cid) for cid in ids)
+        self.metadatas.extend(new_meta)
+        self.documents.extend(str(d) for d in documents)
+        self.row_of.update({cid: start + i for i, cid in enumerate(self.ids[start:])})
+        self.types = np.concatenate([self.types, np.array([str(m.get("type", "")) for m in new_meta], dtype=str)])
+        self.chapter_no = np.concatenate(
+            [self.chapter_no, np.array([_as_float(m.get("chapter_no")) for m in new_meta], dtype=np.float64)]
+        )
+        self.norms = np.concatenate([self.norms, np.einsum("ij,ij->i", vectors, vectors)])
+        self.matrix = self._open_matrix(len(self.ids))
+        self._stamp = self._file_stamp()
+
+    def delete(self, ids: Sequence[str]) -> int:
+        np = self._np
+        drop = {cid for cid in ids if cid in self.row_of}
+        if not drop:
+            return 0
+        keep = np.array([cid not in drop for cid in self.ids], dtype=bool)
+        matrix = np.asarray(self.matrix)[keep]
+        self.ids = [cid for cid, k in zip(self.ids, keep) if k]
+        self.metadatas = [m for m, k in zip(self.metadatas, keep) if k]
+        self.documents = [d for d, k in zip(self.documents, keep) if k]
+        self._rewrite(matrix)
+        return len(drop)
+
+    # ---- queries -------------------------------------------------------
+
+    def _column(self, field: str, numeric: bool):
+        np = self._np
+        if field == "type":
+            return self.types
+        if field == "chapter_no":
+            return self.chapter_no
+        if numeric:
+            return np.array([_as_float(m.get(field)) for m in self.metadatas], dtype=np.float64)
+        return np.array([m.get(field) for m in self.metadatas], dtype=object)
+
+    def _field_mask(self, field: str, cond: Any):
+        np = self._np
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        mask = np.ones(len(self.ids), dtype=bool)
+        for op, value in cond.items():
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                col = self._column(field, numeric=True)
+                v = float(value)
+                if op == "$gt":
+                    mask &= col > v
+                elif op == "$gte":
+                    mask &= col >= v
+                elif op == "$lt":
+                    mask &= col < v
+                else:
+                    mask &= col <= v
+            elif op in ("$eq", "$ne"):
+                col = self._column(field, numeric=isinstance(value, (int, float)) and not isinstance(value, bool))
+                mask &= (col == value) if op == "$eq" else (col != value)
+            elif op in ("$in", "$nin"):
+                values = list(value)
+                numeric = bool(values) and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+                hit = np.isin(self._column(field, numeric=numeric), values)
+                mask &= hit if op == "$in" else ~hit
+            else:
+                raise ValueError(f"unsupported where operator: {op}")
+        return mask
+
+    def mask(self, where: Dict[str, Any] | None):
+        np = self._np
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, cond in (where or {}).items():
+            if key == "$and":
+                for sub in cond:
+                    mask &= self.mask(sub)
+            elif key == "$or":
+                any_mask = np.zeros(len(self.ids), dtype=bool)
+                for sub in cond:
+                    any_mask |= self.mask(sub)
+                mask &= any_mask
+            else:
+                mask &= self._field_mask(key, cond)
+        return mask
+
+    def query(self, embedding: Sequence[float], top_k: int, where: Dict[str, Any] | None) -> List[VectorHit]:
+        np = self._np
+        if not self.ids or top_k <= 0:
+            return []
+        q = np.asarray(embedding, dtype=np.float32)
+        mask = self.mask(where)
+        if mask.all():
+            rows = None
+            dots = self.matrix @ q
+            norms = self.norms
+        else:
+            rows = np.flatnonzero(mask)
+            if rows.size == 0:
+                return []
+            dots = self.matrix[rows] @ q
+            norms = self.norms[rows]
+        dist = norms - 2.0 * dots + float(q @ q)
+
+        k = min(int(top_k), dist.shape[0])
+        part = np.argpartition(dist, k - 1)[:k]
+        order = part[np.argsort(dist[part], kind="stable")]
+        out: List[VectorHit] = []
+        for j in order:
+            i = int(j) if rows is None else int(rows[j])
+            out.append(
+                VectorHit(
+                    id=self.ids[i],
+                    document=self.documents[i],
+                    metadata=dict(self.metadatas[i]),
+                    distance=max(0.0, float(dist[j])),
+                )
+            )
+        return out
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact (brute-force) vector search over per-project memory-mapped float32 matrices."""
+
+    def __init__(self, *, persist_dir: str = "data/vectors") -> None:
+        try:
+            import numpy  # type: ignore  # noqa: F401
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError("numpy is required for VECTOR_BACKEND=numpy") from e
+
+        os.makedirs(persist_dir, exist_ok=True)
+        self._persist_dir = persist_dir
+        self._indexes: Dict[str, _ProjectIndex] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return "numpy"
+
+    def _index(self, project_id: str) -> _ProjectIndex:
+        with self._lock:
+            idx = self._indexes.get(project_id)
+            if idx is None:
+                idx = _ProjectIndex(os.path.join(self._persist_dir, f"project_{project_id}"))
+                self._indexes[project_id] = idx
+            return idx
+
+    def upsert(
+        self,
+        project_id: str,
+        *,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: Sequence[Dict[str, Any]],
+        documents: Sequence[str],
+    ) -> None:
+        if not ids:
+            return
+        idx = self._index(project_id)
+        with idx.locked():
+            idx.refresh_if_stale()
+            idx.delete(ids)
+            idx.append(ids, embeddings, metadatas, documents)
+
+    def delete(self, project_id: str, *, ids: Sequence[str]) -> None:
+        if not ids:
+            return
+        idx = self._index(project_id)
+        with idx.locked():
+            idx.refresh_if_stale()
+            idx.delete(ids)
+
+    def query(
+        self,
+        project_id: str,
+        *,
+        embedding: Sequence[float],
+        top_k: int,
+        where: Dict[str, Any] | None = None,
+    ) -> List[VectorHit]:
+        idx = self._index(project_id)
+        with idx.lock:
+            if idx.is_stale():
+                with idx.locked():
+                    idx.refresh_if_stale()
+            # The loaded snapshot stays valid without the file lock: compaction replaces the
+            # files (our memory map keeps the old inode) and appends only add rows past it.
+            return idx.query(embedding, top_k, where)
@@ -23,8 +23,10 @@ export function ChapterClient({ projectId, chapterNumber }: { projectId: string;
     const res = await api.getProject(projectId);
     setProject(res.data);
     setLogs(res.agent_logs || []);
-    const existing = res.data.chapters?.[String(chapterNumber)];
-    if (existing) setText(existing);
+    if (res.data.chapters?.[String(chapterNumber)]) {
+      const chapter = await api.getChapter(projectId, chapterNumber);
+      setText(chapter.data.text);
+    }
   }
 
   useEffect(() => {
@@ -5,13 +5,14 @@ import { useEffect, useMemo, useState } from "react";
 
 import { AgentLogs } from "@/components/AgentLogs";
 import { api } from "@/lib/api";
-import type { AgentLog, ProjectState, RagStats } from "@/lib/types";
+import type { AgentLog, ProjectState, RagCacheStats, RagStats } from "@/lib/types";
 
 export function ProjectClient({ projectId }: { projectId: string }) {
   const [project, setProject] = useState<ProjectState | null>(null);
   const [logs, setLogs] = useState<AgentLog[]>([]);
   const [tab, setTab] = useState<"main" | "kb">("main");
   const [ragStats, setRagStats] = useState<RagStats | null>(null);
+  const [ragCache, setRagCache] = useState<RagCacheStats | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [busy, setBusy] = useState<string | null>(null);
 
@@ -68,8 +69,9 @@ export function ProjectClient({ projectId }: { projectId: string }) {
     setBusy("rag_stats");
     setError(null);
     try {
-      const res = await api.ragStats(projectId);
-      setRagStats(res.data);
+      const [stats, cache] = await Promise.all([api.ragStats(projectId), api.ragCacheStats(projectId)]);
+      setRagStats(stats.data);
+      setRagCache(cache.data);
     } catch (e) {
       setError(String(e));
     } finally {
@@ -132,6 +134,8 @@ export function ProjectClient({ projectId }: { projectId: string }) {
         <div className="card">
           <div style={{ fontWeight: 700, marginBottom: 10 }}>知识库统计（RAG chunks）</div>
           <pre>{JSON.stringify(ragStats || {}, null, 2)}</pre>
+          <div style={{ fontWeight: 700, margin: "10px 0" }}>检索缓存</div>
+          <pre>{JSON.stringify(ragCache || {}, null, 2)}</pre>
           <div style={{ color: "var(--muted)", fontSize: 12, marginTop: 10 }}>
             提示：每次生成/扩写都会自动入库索引；扩写会先检索再写。
           </div>
@@ -162,7 +166,7 @@ export function ProjectClient({ projectId }: { projectId: string }) {
           {chapterNumbers.length ? (
             chapterNumbers.map((n) => (
               <Link key={n} href={`/projects/${projectId}/chapters/${n}`} className="card" style={{ padding: 10 }}>
-                第 {n} 章（已生成）
+                第 {n} 章（已生成 · {project?.chapters[n]?.length ?? 0} 字）
               </Link>
             ))
           ) : (
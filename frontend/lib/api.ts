@@ -1,4 +1,4 @@
-import type { APIResponse, ExpandChapterResult, ProjectState, RagPreview, RagStats } from "@/lib/types";
+import type { APIResponse, ChapterContent, ExpandChapterResult, ProjectState, RagCacheStats, RagPreview, RagStats } from "@/lib/types";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
 
@@ -26,6 +26,8 @@ export const api = {
 
   getProject: (id: string) => request<ProjectState>(`/projects/${id}`),
 
+  getChapter: (id: string, n: number) => request<ChapterContent>(`/projects/${id}/chapters/${n}`),
+
   generateOutline: (id: string, payload: { theme?: string; total_words?: number }) =>
     request<ProjectState>(`/projects/${id}/outline`, { method: "POST", body: JSON.stringify(payload) }),
 
@@ -40,6 +42,8 @@ export const api = {
 
   ragStats: (id: string) => request<RagStats>(`/projects/${id}/rag/stats`),
 
+  ragCacheStats: (id: string) => request<RagCacheStats>(`/projects/${id}/rag/cache`),
+
   ragPreview: (id: string, params: { chapter?: number; query?: string; top_k?: number }) => {
     const usp = new URLSearchParams();
     if (params.chapter) usp.set("chapter", String(params.chapter));
@@ -6,6 +6,15 @@ export type AgentLog = {
   output_preview?: string | null;
 };
 
+export type ChapterMeta = {
+  chapter_number: number;
+  length: number;
+  content_hash: string;
+  updated_at: string;
+};
+
+export type ChapterContent = ChapterMeta & { text: string };
+
 export type ProjectState = {
   id: string;
   genre: string;
@@ -17,7 +26,7 @@ export type ProjectState = {
   outline: string;
   characters: Record<string, unknown>;
   characters_text: string;
-  chapters: Record<string, string>;
+  chapters: Record<string, ChapterMeta>;
   created_at: string;
   updated_at: string;
 };
@@ -56,6 +65,14 @@ export type ExpandChapterResult = {
 
 export type RagStats = Record<string, { chunks: number; last_updated_at?: unknown }>;
 
+// Index generation of the project plus the process-wide retrieval cache counters.
+export type RagCacheStats = {
+  index_generation: number;
+  query_embeddings: Record<string, number>;
+  results: Record<string, number>;
+  rerank_scores: Record<string, number>;
+};
+
 export type RagPreview = {
   query: string;
   vector_results: RetrievedChunkSummary[];
@@ -64,4 +81,6 @@ export type RagPreview = {
   final_selected: RetrievedChunkSummary[];
   final_selected_grouped: Record<string, RetrievedChunkSummary[]>;
   context_string: string;
+  rerank_scores?: Record<string, number>;
+  timings_ms?: Record<string, number | null>;
 };